@@ -0,0 +1,526 @@
+# Benchmarks for the Request Filter extension. requestcollector.py is loaded
+# under CPython against the fake Burp, Java and Swing modules in
+# fakeburp.py and driven with synthetic traffic, so hot paths can be timed
+# without running Burp:
+#
+#   python benchmarks/benchmark.py --sizes 1000,10000 -o before.json
+#   python benchmarks/benchmark.py --sizes 1000,10000 --baseline before.json
+#
+# Results are written as JSON. With --baseline, each result is compared with
+# the same benchmark and size in an earlier run, and the exit status is 1 if
+# any of them got slower than --threshold allows.
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import fakeburp  # noqa: E402
+
+fakeburp.install()
+
+import requestcollector  # noqa: E402
+
+RESULTS_VERSION = 1
+
+# Body size limit set in the "Index bodies up to" field
+BODY_INDEX_BYTES = 64 * 1024
+
+WORDS = (
+    "alpha beta gamma delta account admin order invoice user profile search"
+    " cart item product report export token session config status event"
+).split()
+
+STATUS_CODES = [200] * 16 + [201, 204, 301, 302, 304, 400, 401, 403, 404, 404, 500, 503]
+
+
+# A URL distribution picks (method, protocol, host, port, path) for the
+# n-th synthetic request
+
+
+# REST API traffic over a few hosts: ID-bearing resources, searches and a
+# share of static files
+def apiDistribution(rng, n):
+    host = "api{}.example.com".format(rng.randint(1, 5))
+    kind = rng.random()
+    if kind < 0.15:
+        path = "/static/{}/{}.{}".format(
+            rng.choice(WORDS),
+            rng.randint(1, 400),
+            rng.choice(["js", "css", "png", "gif"]),
+        )
+        return "GET", "https", host, 443, path
+    if kind < 0.30:
+        path = "/api/v1/search?q={}&page={}".format(
+            rng.choice(WORDS), rng.randint(1, 20)
+        )
+        return "GET", "https", host, 443, path
+
+    resource = rng.choice(["users", "orders", "invoices", "products", "sessions"])
+    path = "/api/v{}/{}/{}".format(rng.randint(1, 2), resource, rng.randint(1, 100000))
+    if rng.random() < 0.3:
+        path += "/" + rng.choice(["items", "history", "settings"])
+    method = rng.choice(["GET"] * 6 + ["POST", "POST", "PUT", "DELETE"])
+    return method, "https", host, 443, path
+
+
+# Mostly unique URLs spread over many hosts and path shapes
+def uniformDistribution(rng, n):
+    host = "host{}.example.org".format(rng.randint(1, 50))
+    depth = rng.randint(1, 5)
+    path = "/" + "/".join(rng.choice(WORDS) for _ in range(depth))
+    path += "/{}.{}".format(n, rng.choice(["html", "php", "json", "js", "png"]))
+    method = rng.choice(["GET"] * 4 + ["POST", "PUT", "DELETE", "PATCH"])
+    return (
+        method,
+        rng.choice(["http", "https"]),
+        host,
+        8080 if n % 7 == 0 else 443,
+        path,
+    )
+
+
+# A few hundred endpoints requested over and over with Zipf-like
+# popularity, so most requests are duplicates
+def repeatedDistribution(rng, n):
+    rank = min(int(rng.paretovariate(1.1)), 300)
+    path = "/app/{}/{}".format(WORDS[rank % len(WORDS)], rank)
+    method = "POST" if rank % 5 == 0 else "GET"
+    return method, "https", "app.example.com", 443, path
+
+
+DISTRIBUTIONS = {
+    "api": apiDistribution,
+    "uniform": uniformDistribution,
+    "repeated": repeatedDistribution,
+}
+
+
+def _filler(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+# Build count synthetic request/response pairs, as Burp would deliver them
+def generateMessages(count, distribution, bodySize, responseSize, seed):
+    rng = random.Random(seed)
+    pickUrl = DISTRIBUTIONS[distribution]
+    messages = []
+    for n in range(count):
+        method, protocol, host, port, path = pickUrl(rng, n)
+
+        body = b""
+        if method in ("POST", "PUT", "PATCH"):
+            body = '{{"data": "{}"}}'.format(_filler(rng, bodySize)).encode("ascii")
+        request = (
+            "{} {} HTTP/1.1\r\n"
+            "Host: {}\r\n"
+            "User-Agent: Mozilla/5.0 (benchmark)\r\n"
+            "Accept: */*\r\n"
+            "Cookie: session={}\r\n"
+            "Content-Length: {}\r\n"
+            "\r\n".format(method, path, host, rng.randint(1, 1000), len(body))
+        ).encode("ascii") + body
+
+        response = None
+        if rng.random() < 0.97:
+            responseBody = _filler(
+                rng, rng.randint(responseSize // 2, responseSize * 3 // 2)
+            )
+            response = (
+                "HTTP/1.1 {} Status\r\n"
+                "Content-Type: application/json\r\n"
+                "Content-Length: {}\r\n"
+                "\r\n{}".format(
+                    rng.choice(STATUS_CODES), len(responseBody), responseBody
+                )
+            ).encode("ascii")
+
+        messages.append(
+            fakeburp.FakeRequestResponse(
+                request, response, fakeburp.FakeHttpService(host, port, protocol)
+            )
+        )
+    return messages
+
+
+# Filter settings timed by applyFilters, applied on top of the defaults
+FILTER_SCENARIOS = [
+    ("methods", {"methods": ["GET", "POST"]}),
+    ("uri", {"uri": "/api/v1/users"}),
+    ("query", {"query": "status:2xx AND NOT path:/static/ AND len>1000"}),
+    ("body", {"query": 'resp:"invoice token"'}),
+]
+
+
+def configureFilter(extender, methods=None, uri="", query=""):
+    for method, checkbox in extender._methodFilters.items():
+        checkbox.setSelected(methods is None or method in methods)
+    for checkbox in extender._fileTypeFilters.values():
+        checkbox.setSelected(True)
+    extender._includeFileTypes.setSelected(False)
+    for i, uriFilter in enumerate(extender._uriFilters):
+        uriFilter.setText(uri if i == 0 else "")
+    extender._queryField.setText(query)
+
+
+class _NullOutput(object):
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+# Load the extension against fresh fake callbacks, with its output silenced
+def createExtender():
+    extender = requestcollector.BurpExtender()
+    stdout = sys.stdout
+    sys.stdout = _NullOutput()
+    try:
+        extender.registerExtenderCallbacks(fakeburp.FakeCallbacks())
+    finally:
+        sys.stdout = stdout
+    return extender
+
+
+def waitForBodyIndex(extender):
+    while extender._bodyIndex.pendingCount():
+        time.sleep(0.001)
+
+
+class Runner(object):
+    def __init__(self, repeat, only):
+        self.repeat = repeat
+        self.only = only
+        self.results = []
+
+    def enabled(self, name):
+        return not self.only or name in self.only
+
+    # Time fn() repeat times. setup(), if given, runs untimed before each
+    # run; fn may return a dict of extra figures to record.
+    def measure(self, name, size, fn, setup=None):
+        if not self.enabled(name.split("[")[0]):
+            return None
+
+        runs = []
+        extra = {}
+        stdout = sys.stdout
+        for _ in range(self.repeat):
+            sys.stdout = _NullOutput()
+            try:
+                if setup is not None:
+                    setup()
+                fakeburp.resetTableStats()
+                start = time.perf_counter()
+                extra = fn() or {}
+                runs.append(time.perf_counter() - start)
+            finally:
+                sys.stdout = stdout
+        extra.update(fakeburp.tableStats)
+
+        runs.sort()
+        result = {
+            "benchmark": name,
+            "size": size,
+            "min": runs[0],
+            "median": runs[len(runs) // 2],
+            "runs": runs,
+            "perEntryUs": runs[0] * 1e6 / size if size else None,
+            "extra": extra,
+        }
+        self.results.append(result)
+        sys.stderr.write(
+            "{:<28} {:>8}  {:>10.1f} ms  {:>8.2f} us/entry\n".format(
+                name, size, result["min"] * 1000, result["perEntryUs"] or 0
+            )
+        )
+        return result
+
+
+def benchmarkSize(runner, size, args):
+    sys.stderr.write("Generating {} {} requests...\n".format(size, args.distribution))
+    messages = generateMessages(
+        size, args.distribution, args.body_size, args.response_size, args.seed
+    )
+
+    extenders = []
+
+    # Let the previous extender's body indexer finish, so it does not
+    # compete with the next run
+    def freshExtender():
+        for extender in extenders:
+            waitForBodyIndex(extender)
+            extender.extensionUnloaded()
+        del extenders[:]
+        extenders.append(createExtender())
+
+    # One message at a time, as the context menu and older callers do
+    def addEach():
+        extender = extenders[0]
+        for message in messages:
+            extender.addRequest(message)
+        return {"entries": extender._requestList.size()}
+
+    runner.measure("addRequest", size, addEach, freshExtender)
+
+    def addAll():
+        extender = extenders[0]
+        extender.addRequests(messages)
+        return {"entries": extender._requestList.size()}
+
+    runner.measure("addRequests", size, addAll, freshExtender)
+    if not extenders:
+        freshExtender()
+        stdout = sys.stdout
+        sys.stdout = _NullOutput()
+        try:
+            extenders[0].addRequests(messages)
+        finally:
+            sys.stdout = stdout
+    extender = extenders[0]
+    waitForBodyIndex(extender)
+
+    # Body indexing is opt-in; turn it on as the UI field does, so the
+    # filters below are also resolved through the index
+    extender._bodyIndex.maxBodyBytes = BODY_INDEX_BYTES
+
+    # Index every body on the background indexer, as after a limit change
+    def reindexBodies():
+        waitForBodyIndex(extender)
+        extender._bodyIndex.clear()
+
+    def indexBodies():
+        extender._bodyIndex.add(list(extender._requestList))
+        waitForBodyIndex(extender)
+
+    runner.measure("bodyIndex", size, indexBodies, reindexBodies)
+    if not runner.enabled("bodyIndex"):
+        indexBodies()
+
+    for scenario, settings in FILTER_SCENARIOS:
+
+        def applyFilters():
+            extender._applyFilters(force=True)
+            return {"matched": extender._filteredList.size()}
+
+        runner.measure(
+            "applyFilters[{}]".format(scenario),
+            size,
+            applyFilters,
+            lambda: configureFilter(extender, **settings),
+        )
+
+    # Export the default view: every method, static files excluded
+    configureFilter(extender)
+    extender._applyFilters(force=True)
+    exported = extender._filteredList.size()
+
+    runner.measure("updateTable", size, extender._updateTable)
+
+    def writeYaml():
+        written = [0]
+
+        def write(data):
+            written[0] += len(data)
+
+        for entry in extender._viewEntries():
+            extender._writeRequestYaml(entry, write)
+        return {"entries": exported, "bytes": written[0]}
+
+    runner.measure("writeRequestYaml", size, writeYaml)
+
+    # Into an empty directory, then again into the same directory
+    directory = [None]
+
+    def emptyDirectory():
+        if directory[0] is not None:
+            shutil.rmtree(directory[0], ignore_errors=True)
+        directory[0] = tempfile.mkdtemp(prefix="requestfilter-bench-", dir=args.tmpdir)
+        fakeburp.JFileChooser.nextSelection = directory[0]
+
+    def saveAllAsYaml():
+        extender.saveAllAsYaml()
+        return {"entries": exported, "files": len(os.listdir(directory[0]))}
+
+    def exportedDirectory():
+        emptyDirectory()
+        extender.saveAllAsYaml()
+
+    try:
+        runner.measure("saveAllAsYaml", size, saveAllAsYaml, emptyDirectory)
+        runner.measure("saveAllAsYaml[again]", size, saveAllAsYaml, exportedDirectory)
+    finally:
+        fakeburp.JFileChooser.nextSelection = None
+        if directory[0] is not None:
+            shutil.rmtree(directory[0], ignore_errors=True)
+
+    for extender in extenders:
+        extender.extensionUnloaded()
+
+
+# Compare results with a baseline run. Returns the regressions.
+def compareWithBaseline(results, baseline, threshold, minTime):
+    previous = dict(
+        ((result["benchmark"], result["size"]), result)
+        for result in baseline["results"]
+    )
+    regressions = []
+    sys.stderr.write(
+        "\n{:<28} {:>8}  {:>11} {:>11} {:>7}\n".format(
+            "benchmark", "size", "baseline ms", "current ms", "ratio"
+        )
+    )
+    for result in results:
+        old = previous.get((result["benchmark"], result["size"]))
+        if old is None:
+            continue
+        ratio = result["min"] / old["min"] if old["min"] else None
+        result["baselineMin"] = old["min"]
+        result["ratio"] = ratio
+
+        regressed = ratio is not None and ratio > threshold and result["min"] >= minTime
+        if regressed:
+            regressions.append(result)
+        sys.stderr.write(
+            "{:<28} {:>8}  {:>11.1f} {:>11.1f} {:>7}{}\n".format(
+                result["benchmark"],
+                result["size"],
+                old["min"] * 1000,
+                result["min"] * 1000,
+                "-" if ratio is None else "{:.2f}x".format(ratio),
+                "  REGRESSION" if regressed else "",
+            )
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark requestcollector.py against fake Burp/Java APIs."
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000,100000",
+        help="comma-separated numbers of requests (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--distribution",
+        choices=sorted(DISTRIBUTIONS),
+        default="api",
+        help="synthetic URL distribution (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--body-size",
+        type=int,
+        default=256,
+        help="request body bytes for POST/PUT/PATCH (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--response-size",
+        type=int,
+        default=2048,
+        help="mean response body bytes (default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="runs per benchmark; the fastest is compared (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--only",
+        default="",
+        help="comma-separated benchmarks to run, e.g. addRequests,applyFilters",
+    )
+    parser.add_argument("-o", "--output", help="write JSON results here, not stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="slowdown ratio that counts as a regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.005,
+        help="ignore regressions in runs faster than this many seconds"
+        " (default: %(default)s)",
+    )
+    parser.add_argument("--tmpdir", help="directory for export benchmarks")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    only = set(name.strip() for name in args.only.split(",") if name.strip())
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+
+    runner = Runner(max(args.repeat, 1), only)
+    for size in sizes:
+        benchmarkSize(runner, size, args)
+
+    output = {
+        "version": RESULTS_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "sizes": sizes,
+            "distribution": args.distribution,
+            "bodySize": args.body_size,
+            "responseSize": args.response_size,
+            "seed": args.seed,
+            "repeat": runner.repeat,
+        },
+        "results": runner.results,
+    }
+
+    regressions = []
+    if baseline is not None:
+        regressions = compareWithBaseline(
+            runner.results, baseline, args.threshold, args.min_time
+        )
+        output["baseline"] = {
+            "path": args.baseline,
+            "threshold": args.threshold,
+            "regressions": len(regressions),
+        }
+
+    text = json.dumps(output, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+    if regressions:
+        sys.stderr.write("{} regressions\n".format(len(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
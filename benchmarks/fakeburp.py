@@ -0,0 +1,772 @@
+# Lightweight stand-ins for the burp, java and javax.swing modules, so that
+# requestcollector.py can be loaded and driven under CPython by the
+# benchmarks. Call install() before importing requestcollector.
+#
+# Classes the extension relies on for behaviour (collections, atomics, files,
+# workers, executors, table model, form fields) are emulated. Everything else
+# in those packages resolves to an inert stub whose methods accept any
+# arguments and return another stub, so layout code runs without a display.
+#
+# Swing workers run synchronously on the calling thread, with published
+# chunks delivered straight to process(), and SwingUtilities runs runnables
+# immediately. Executors are backed by real threads, as in Burp.
+
+import array
+import concurrent.futures
+import os
+import sys
+import threading
+import types
+from urllib.parse import urlsplit
+
+# Visible rows a table renders after a model event
+VISIBLE_ROWS = 40
+
+# Work done by the fake JTable, reset by the benchmarks between phases
+tableStats = {"events": 0, "cellsRendered": 0}
+
+
+def resetTableStats():
+    tableStats["events"] = 0
+    tableStats["cellsRendered"] = 0
+
+
+class _StubType(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+
+# Inert object standing in for any Java class without emulated behaviour
+class _Stub(metaclass=_StubType):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __bool__(self):
+        return False
+
+    def __iter__(self):
+        return iter(())
+
+
+# Module whose unknown attributes are created on first use: interfaces as
+# plain classes the extension can implement, anything else as a stub class
+class _FakeModule(types.ModuleType):
+    def __init__(self, name, interfaces=False):
+        types.ModuleType.__init__(self, name)
+        self.__path__ = []
+        self._interfaces = interfaces
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if self._interfaces:
+            cls = type(name, (object,), {})
+        else:
+            cls = type(name, (_Stub,), {})
+        setattr(self, name, cls)
+        return cls
+
+
+# ---------------------------------------------------------------- java.lang
+
+
+class Runnable(object):
+    pass
+
+
+class Runtime(object):
+    @staticmethod
+    def getRuntime():
+        return Runtime()
+
+    def availableProcessors(self):
+        return os.cpu_count() or 1
+
+
+class ClassNotFoundException(Exception):
+    pass
+
+
+class Class(object):
+    # No JDBC drivers are available outside Burp
+    @staticmethod
+    def forName(name):
+        raise ClassNotFoundException(name)
+
+
+# ---------------------------------------------------------------- java.util
+
+
+class _SubList(list):
+    def __init__(self, parent, start, end):
+        list.__init__(self, list.__getitem__(parent, slice(start, end)))
+        self._parent = parent
+        self._start = start
+        self._end = end
+
+    def size(self):
+        return len(self)
+
+    def clear(self):
+        del self._parent[self._start : self._end]
+
+
+class ArrayList(list):
+    def add(self, *args):
+        if len(args) == 2:
+            self.insert(args[0], args[1])
+        else:
+            self.append(args[0])
+        return True
+
+    def get(self, index):
+        return list.__getitem__(self, index)
+
+    def set(self, index, value):
+        old = list.__getitem__(self, index)
+        list.__setitem__(self, index, value)
+        return old
+
+    def size(self):
+        return len(self)
+
+    def isEmpty(self):
+        return not self
+
+    def indexOf(self, value):
+        for i, item in enumerate(self):
+            if item is value:
+                return i
+        return -1
+
+    def subList(self, start, end):
+        return _SubList(self, start, end)
+
+
+# ----------------------------------------------------- java.util.concurrent
+
+
+class AtomicInteger(object):
+    def __init__(self, value=0):
+        self._lock = threading.Lock()
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+    def getAndIncrement(self):
+        with self._lock:
+            self._value += 1
+            return self._value - 1
+
+    def incrementAndGet(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    def addAndGet(self, delta):
+        with self._lock:
+            self._value += delta
+            return self._value
+
+
+AtomicLong = AtomicInteger
+
+
+class AtomicBoolean(object):
+    def __init__(self, value=False):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class TimeUnit(object):
+    MILLISECONDS = 0.001
+    SECONDS = 1.0
+
+
+class ArrayBlockingQueue(object):
+    def __init__(self, capacity):
+        import queue
+
+        self._empty = queue.Empty
+        self._full = queue.Full
+        self._queue = queue.Queue(capacity)
+
+    def offer(self, item):
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except self._full:
+            return False
+
+    def poll(self, timeout, unit):
+        try:
+            return self._queue.get(timeout=timeout * unit)
+        except self._empty:
+            return None
+
+    def drainTo(self, collection):
+        count = 0
+        while True:
+            try:
+                collection.add(self._queue.get_nowait())
+            except self._empty:
+                return count
+            count += 1
+
+    def size(self):
+        return self._queue.qsize()
+
+    def clear(self):
+        self.drainTo(ArrayList())
+
+
+class _Future(object):
+    def __init__(self, future):
+        self._future = future
+
+    def cancel(self, mayInterrupt):
+        return self._future.cancel()
+
+    def isDone(self):
+        return self._future.done()
+
+
+class _ExecutorService(object):
+    def __init__(self, threads):
+        self._executor = concurrent.futures.ThreadPoolExecutor(threads)
+        self._pending = set()
+
+    def submit(self, runnable):
+        future = self._executor.submit(runnable.run)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return _Future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def shutdownNow(self):
+        for future in list(self._pending):
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def awaitTermination(self, timeout, unit):
+        done, pending = concurrent.futures.wait(list(self._pending), timeout * unit)
+        return not pending
+
+
+class Executors(object):
+    @staticmethod
+    def newSingleThreadExecutor():
+        return _ExecutorService(1)
+
+    @staticmethod
+    def newFixedThreadPool(threads):
+        return _ExecutorService(threads)
+
+
+# ------------------------------------------------------------------ java.io
+
+
+class File(object):
+    def __init__(self, parent, child=None):
+        if isinstance(parent, File):
+            parent = parent.getPath()
+        self._path = parent if child is None else os.path.join(parent, child)
+
+    def getPath(self):
+        return self._path
+
+    def getName(self):
+        return os.path.basename(self._path)
+
+    def getAbsolutePath(self):
+        return os.path.abspath(self._path)
+
+    def exists(self):
+        return os.path.exists(self._path)
+
+    def isDirectory(self):
+        return os.path.isdir(self._path)
+
+    def mkdirs(self):
+        if os.path.isdir(self._path):
+            return False
+        os.makedirs(self._path)
+        return True
+
+    def list(self):
+        if not os.path.isdir(self._path):
+            return None
+        return os.listdir(self._path)
+
+    def length(self):
+        try:
+            return os.path.getsize(self._path)
+        except OSError:
+            return 0
+
+    def delete(self):
+        try:
+            os.remove(self._path)
+            return True
+        except OSError:
+            return False
+
+    def toString(self):
+        return self._path
+
+
+def _bytes(data):
+    if isinstance(data, array.array):
+        return data.tobytes()
+    return bytes(data)
+
+
+class FileOutputStream(object):
+    def __init__(self, target, append=False):
+        path = target.getPath() if isinstance(target, File) else target
+        self._file = open(path, "ab" if append else "wb")
+
+    def write(self, data, offset=0, length=None):
+        data = _bytes(data)
+        if offset or length is not None:
+            data = data[offset : len(data) if length is None else offset + length]
+        self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# Python file objects are already buffered
+class BufferedOutputStream(object):
+    def __init__(self, stream, size=8192):
+        self._stream = stream
+
+    def write(self, data, offset=0, length=None):
+        self._stream.write(data, offset, length)
+
+    def flush(self):
+        self._stream.flush()
+
+    def close(self):
+        self._stream.close()
+
+
+class ByteArrayOutputStream(object):
+    def __init__(self, size=32):
+        self._chunks = []
+
+    def write(self, data, offset=0, length=None):
+        data = _bytes(data)
+        if offset or length is not None:
+            data = data[offset : len(data) if length is None else offset + length]
+        self._chunks.append(data)
+
+    def toByteArray(self):
+        return array.array("b", b"".join(self._chunks))
+
+    def size(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def close(self):
+        pass
+
+
+# --------------------------------------------------------------- javax.swing
+
+
+class SwingUtilities(object):
+    @staticmethod
+    def invokeLater(runnable):
+        runnable.run()
+
+    @staticmethod
+    def invokeAndWait(runnable):
+        runnable.run()
+
+    @staticmethod
+    def isEventDispatchThread():
+        return True
+
+
+class SwingWorker(object):
+    def __init__(self):
+        self._cancelled = False
+
+    def execute(self):
+        try:
+            self.doInBackground()
+        finally:
+            self.done()
+
+    def publish(self, *chunks):
+        self.process(ArrayList(chunks))
+
+    def cancel(self, mayInterrupt):
+        self._cancelled = True
+        return True
+
+    def isCancelled(self):
+        return self._cancelled
+
+    def isDone(self):
+        return True
+
+
+class JCheckBox(_Stub):
+    def __init__(self, text="", selected=False):
+        self._text = text
+        self._selected = selected
+
+    def isSelected(self):
+        return self._selected
+
+    def setSelected(self, selected):
+        self._selected = selected
+
+    def getText(self):
+        return self._text
+
+
+class JTextField(_Stub):
+    def __init__(self, *args):
+        self._text = args[0] if args and isinstance(args[0], str) else ""
+
+    def getText(self):
+        return self._text
+
+    def setText(self, text):
+        self._text = text
+
+
+class JComboBox(_Stub):
+    def __init__(self, items=()):
+        self._items = list(items)
+        self._index = 0 if self._items else -1
+
+    def getSelectedIndex(self):
+        return self._index
+
+    def setSelectedIndex(self, index):
+        self._index = index
+
+    def getSelectedItem(self):
+        return self._items[self._index] if self._index >= 0 else None
+
+
+class ProgressMonitor(_Stub):
+    def isCanceled(self):
+        return False
+
+
+# Renders the visible rows of its model after every model event, like a
+# JTable in a viewport would
+class JTable(_Stub):
+    def __init__(self, model=None):
+        self._model = model
+        self._selectedRow = -1
+        if model is not None:
+            model._table = self
+
+    def getModel(self):
+        return self._model
+
+    def getRowCount(self):
+        return self._model.getRowCount()
+
+    def getSelectedRow(self):
+        return self._selectedRow
+
+    def setRowSelectionInterval(self, first, last):
+        self._selectedRow = first
+
+    def clearSelection(self):
+        self._selectedRow = -1
+
+    def _render(self, first, last):
+        tableStats["events"] += 1
+        last = min(last, VISIBLE_ROWS - 1, self._model.getRowCount() - 1)
+        columns = self._model.getColumnCount()
+        for row in range(max(first, 0), last + 1):
+            for column in range(columns):
+                self._model.getValueAt(row, column)
+            tableStats["cellsRendered"] += columns
+
+
+class AbstractTableModel(object):
+    _table = None
+
+    def _changed(self, first, last):
+        if self._table is not None:
+            self._table._render(first, last)
+
+    def fireTableDataChanged(self):
+        self._changed(0, VISIBLE_ROWS - 1)
+
+    def fireTableRowsInserted(self, first, last):
+        self._changed(first, last)
+
+    def fireTableRowsUpdated(self, first, last):
+        self._changed(first, last)
+
+    def fireTableRowsDeleted(self, first, last):
+        # Later rows move up into the viewport
+        self._changed(first, VISIBLE_ROWS - 1)
+
+
+class JFileChooser(_Stub):
+    APPROVE_OPTION = 0
+    CANCEL_OPTION = 1
+    FILES_ONLY = 0
+    DIRECTORIES_ONLY = 1
+
+    # Path returned by the next dialog; None cancels it
+    nextSelection = None
+
+    def __init__(self, *args):
+        self._selected = None
+
+    def _show(self):
+        if JFileChooser.nextSelection is None:
+            return self.CANCEL_OPTION
+        self._selected = File(JFileChooser.nextSelection)
+        return self.APPROVE_OPTION
+
+    def showSaveDialog(self, parent):
+        return self._show()
+
+    def showOpenDialog(self, parent):
+        return self._show()
+
+    def showDialog(self, parent, approveText):
+        return self._show()
+
+    def getSelectedFile(self):
+        return self._selected
+
+    def setSelectedFile(self, selected):
+        self._selected = selected
+
+
+# --------------------------------------------------------------------- burp
+
+
+class FakeUrl(object):
+    def __init__(self, protocol, host, port, path):
+        self._protocol = protocol
+        self._host = host
+        self._port = port
+        parts = urlsplit(path)
+        self._path = parts.path
+        self._query = parts.query or None
+
+    def getProtocol(self):
+        return self._protocol
+
+    def getHost(self):
+        return self._host
+
+    def getPort(self):
+        return self._port
+
+    def getPath(self):
+        return self._path
+
+    def getQuery(self):
+        return self._query
+
+    # Burp's URLs always carry an explicit port
+    def toString(self):
+        url = "{}://{}:{}{}".format(self._protocol, self._host, self._port, self._path)
+        if self._query is not None:
+            url += "?" + self._query
+        return url
+
+
+class FakeHttpService(object):
+    def __init__(self, host, port, protocol):
+        self._host = host
+        self._port = port
+        self._protocol = protocol
+
+    def getHost(self):
+        return self._host
+
+    def getPort(self):
+        return self._port
+
+    def getProtocol(self):
+        return self._protocol
+
+
+class FakeRequestInfo(object):
+    def __init__(self, method, url, bodyOffset):
+        self._method = method
+        self._url = url
+        self._bodyOffset = bodyOffset
+
+    def getMethod(self):
+        return self._method
+
+    def getUrl(self):
+        return self._url
+
+    def getBodyOffset(self):
+        return self._bodyOffset
+
+
+class FakeResponseInfo(object):
+    def __init__(self, statusCode):
+        self._statusCode = statusCode
+
+    def getStatusCode(self):
+        return self._statusCode
+
+
+# The subset of IExtensionHelpers used by the extension. Messages are parsed
+# the way Burp does, from the request line and the message's HTTP service.
+class FakeHelpers(object):
+    def analyzeRequest(self, reqRes):
+        request = _bytes(reqRes.getRequest())
+        bodyOffset = request.find(b"\r\n\r\n")
+        bodyOffset = len(request) if bodyOffset == -1 else bodyOffset + 4
+        requestLine = request.split(b"\r\n", 1)[0].decode("latin-1").split(" ")
+        service = reqRes.getHttpService()
+        url = FakeUrl(
+            service.getProtocol(), service.getHost(), service.getPort(), requestLine[1]
+        )
+        return FakeRequestInfo(requestLine[0], url, bodyOffset)
+
+    def analyzeResponse(self, response):
+        statusLine = _bytes(response).split(b"\r\n", 1)[0].split(b" ")
+        return FakeResponseInfo(int(statusLine[1]))
+
+    def buildHttpService(self, host, port, protocol):
+        return FakeHttpService(host, port, protocol)
+
+    def bytesToString(self, data):
+        return _bytes(data).decode("latin-1")
+
+    def stringToBytes(self, text):
+        return array.array("b", text.encode("latin-1"))
+
+
+class FakeCallbacks(_Stub):
+    def __init__(self):
+        self._helpers = FakeHelpers()
+
+    def getHelpers(self):
+        return self._helpers
+
+
+# Request/response pair as delivered by Burp, with Java byte arrays
+class FakeRequestResponse(object):
+    __slots__ = ("_request", "_response", "_httpService")
+
+    def __init__(self, request, response, httpService):
+        self._request = array.array("b", request)
+        self._response = array.array("b", response) if response is not None else None
+        self._httpService = httpService
+
+    def getRequest(self):
+        return self._request
+
+    def getResponse(self):
+        return self._response
+
+    def getHttpService(self):
+        return self._httpService
+
+
+def _interface(name):
+    return type(name, (object,), {})
+
+
+_MODULES = {
+    "burp": {},
+    "java": {},
+    "java.awt": {},
+    "java.awt.event": {
+        "ActionListener": _interface("ActionListener"),
+        "ItemListener": _interface("ItemListener"),
+        "MouseAdapter": _interface("MouseAdapter"),
+    },
+    "java.io": {
+        "BufferedOutputStream": BufferedOutputStream,
+        "ByteArrayOutputStream": ByteArrayOutputStream,
+        "File": File,
+        "FileOutputStream": FileOutputStream,
+    },
+    "java.lang": {
+        "Class": Class,
+        "ClassNotFoundException": ClassNotFoundException,
+        "Runnable": Runnable,
+        "Runtime": Runtime,
+    },
+    "java.util": {"ArrayList": ArrayList},
+    "java.util.concurrent": {
+        "ArrayBlockingQueue": ArrayBlockingQueue,
+        "Executors": Executors,
+        "TimeUnit": TimeUnit,
+    },
+    "java.util.concurrent.atomic": {
+        "AtomicInteger": AtomicInteger,
+        "AtomicBoolean": AtomicBoolean,
+        "AtomicLong": AtomicLong,
+    },
+    "javax": {},
+    "javax.swing": {
+        "JCheckBox": JCheckBox,
+        "JComboBox": JComboBox,
+        "JFileChooser": JFileChooser,
+        "JTable": JTable,
+        "JTextField": JTextField,
+        "ProgressMonitor": ProgressMonitor,
+        "SwingUtilities": SwingUtilities,
+        "SwingWorker": SwingWorker,
+    },
+    "javax.swing.event": {
+        "ChangeListener": _interface("ChangeListener"),
+        "ListSelectionListener": _interface("ListSelectionListener"),
+    },
+    "javax.swing.filechooser": {},
+    "javax.swing.table": {"AbstractTableModel": AbstractTableModel},
+}
+
+
+# Register the fake modules. Safe to call more than once.
+def install():
+    for name, members in _MODULES.items():
+        if name in sys.modules:
+            continue
+        module = _FakeModule(name, interfaces=(name == "burp"))
+        for memberName, member in members.items():
+            setattr(module, memberName, member)
+        sys.modules[name] = module
+
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
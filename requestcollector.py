@@ -1,15 +1,31 @@
+import collections
+import re
+import threading
+import time
+import zlib
+
 from burp import (
     IBurpExtender,
+    IBurpExtenderCallbacks,
     IContextMenuFactory,
     IContextMenuInvocation,
+    IExtensionStateListener,
+    IHttpListener,
     IHttpRequestResponse,
     ITab,
 )
-from java.awt import BorderLayout, Dimension, FlowLayout, GridLayout
-from java.awt.event import ActionListener, ItemListener
-from java.io import File, FileWriter
-from java.net import URL
-from java.util import ArrayList
+from java.awt import BorderLayout, Dimension, FlowLayout, Font, GridLayout
+from java.awt.event import ActionListener, ItemEvent, ItemListener, MouseAdapter
+from java.io import (
+    BufferedOutputStream,
+    ByteArrayOutputStream,
+    File,
+    FileOutputStream,
+)
+from java.lang import Class, Runnable, Runtime
+from java.util import ArrayList, Properties
+from java.util.concurrent import ArrayBlockingQueue, Executors, TimeUnit
+from java.util.concurrent.atomic import AtomicBoolean, AtomicInteger, AtomicLong
 from javax.swing import (
     BorderFactory,
     Box,
@@ -21,17 +37,494 @@ from javax.swing import (
     JFileChooser,
     JLabel,
     JMenuItem,
+    JOptionPane,
     JPanel,
+    JProgressBar,
+    ProgressMonitor,
     JScrollPane,
     JSplitPane,
+    JTabbedPane,
     JTable,
+    JTextArea,
     JTextField,
+    JToggleButton,
+    SwingUtilities,
+    SwingWorker,
+    Timer,
 )
-from javax.swing.event import ListSelectionListener
-from javax.swing.table import DefaultTableModel
+from javax.swing.event import ChangeListener, ListSelectionListener
+from javax.swing.filechooser import FileNameExtensionFilter
+from javax.swing.table import AbstractTableModel
+
+# Burp-independent engine; keep requestengine.py next to this file
+from requestengine import (
+    HTTP_METHODS,
+    STATIC_FILE_TYPES,
+    BodyIndex,
+    CategoryBitmapIndex,
+    CompiledFilter,
+    EndpointGroupIndex,
+    EntrySorter,
+    ExportManifest,
+    JsonLinesArchiveWriter,
+    LatencyHistogram,
+    Metrics,
+    QueryError,
+    RequestEntry,
+    UrlTokenIndex,
+    ZipArchiveWriter,
+    allocateFilenames,
+    appendMetrics,
+    contentHash,
+    endpointFilename,
+    exportKey,
+    filenameFromUrl,
+    iterCaptureItems,
+    requestFingerprint,
+    toByteString,
+    toJavaBytes,
+    urlEndpoint,
+    writeRequestYaml,
+    yamlFilenameFromUrl,
+)
+
+# Endpoint term appended to the query by the Show Requests button
+ENDPOINT_TERM_PATTERN = re.compile(r'(?:^|\s+AND\s+)endpoint="(?:[^"\\]|\\.)*"\s*$')
+
+
+# Request/response pair held zlib-compressed in memory. It exposes the same
+# getRequest/getResponse accessors as IHttpRequestResponse.
+class CompressedMessage(object):
+    __slots__ = ("_request", "_response", "size")
+
+    def __init__(self, request, response):
+        self._request = zlib.compress(toByteString(request), 1)
+        self._response = zlib.compress(toByteString(response), 1) if response else None
+        self.size = len(self._request) + len(self._response or b"")
+
+    def getRequest(self):
+        return toJavaBytes(zlib.decompress(self._request))
+
+    def getResponse(self):
+        if self._response is None:
+            return None
+        return toJavaBytes(zlib.decompress(self._response))
+
+
+# Request/response pair read from an imported capture file. It implements
+# IHttpRequestResponse so imports go through the same ingestion as messages
+# sent from Burp.
+class ImportedMessage(IHttpRequestResponse):
+    def __init__(self, request, response, httpService):
+        self._request = request
+        self._response = response
+        self._httpService = httpService
+        self._comment = None
+        self._highlight = None
+
+    def getRequest(self):
+        return self._request
+
+    def setRequest(self, message):
+        self._request = message
+
+    def getResponse(self):
+        return self._response
+
+    def setResponse(self, message):
+        self._response = message
+
+    def getComment(self):
+        return self._comment
+
+    def setComment(self, comment):
+        self._comment = comment
+
+    def getHighlight(self):
+        return self._highlight
+
+    def setHighlight(self, color):
+        self._highlight = color
+
+    def getHttpService(self):
+        return self._httpService
+
+    def setHttpService(self, httpService):
+        self._httpService = httpService
+
+
+# Storage for the raw messages behind the collected entries. Messages are
+# either compressed in memory or handed to Burp's temp files, and only the
+# entry metadata stays resident. The extender evicts the oldest entries
+# when maxEntries or maxBytes (0 means unlimited) is exceeded.
+class MessageStore(object):
+    MODE_COMPRESSED = 0
+    MODE_TEMP_FILES = 1
+
+    def __init__(self, callbacks, metrics):
+        self._callbacks = callbacks
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self.mode = self.MODE_COMPRESSED
+        self.maxEntries = 0
+        self.maxBytes = 0
+        self.count = 0
+        self.heldBytes = 0
+
+    # Wrap a message for storage. Safe to call from background threads.
+    def store(self, reqRes):
+        if self.mode == self.MODE_TEMP_FILES:
+            message = self._callbacks.saveBuffersToTempFiles(reqRes)
+            size = 0
+        else:
+            message = CompressedMessage(reqRes.getRequest(), reqRes.getResponse())
+            size = message.size
+
+        with self._lock:
+            self.count += 1
+            self.heldBytes += size
+        return message
+
+    # Move stored messages into the project database and free their temp
+    # files. Their bytes no longer count as held in memory, but the entries
+    # still count towards the cap.
+    def persist(self, entries, database):
+        database.insert(entries)
+
+        size = 0
+        for entry in entries:
+            if isinstance(entry.message, CompressedMessage):
+                size += entry.message.size
+            else:
+                self._deleteTempFiles(entry.message)
+            entry.message = DatabaseMessage(database, entry.id)
+
+        with self._lock:
+            self.heldBytes -= size
+
+    # Count messages that were loaded from the project database
+    def adopt(self, count):
+        with self._lock:
+            self.count += count
+
+    # Drop a stored message. Database rows are deleted by the extender.
+    def release(self, message):
+        if isinstance(message, CompressedMessage):
+            size = message.size
+        elif isinstance(message, DatabaseMessage):
+            size = 0
+        else:
+            size = 0
+            self._deleteTempFiles(message)
+
+        with self._lock:
+            self.count -= 1
+            self.heldBytes -= size
+
+    # Free the temp files behind a message saved in MODE_TEMP_FILES
+    def _deleteTempFiles(self, message):
+        try:
+            message.deleteTempFiles()
+        except Exception as e:
+            self._metrics.reportError("Error deleting temp files", e)
+
+    def isOverLimit(self):
+        return (self.maxEntries and self.count > self.maxEntries) or (
+            self.maxBytes and self.heldBytes > self.maxBytes
+        )
+
+
+# Message whose bytes are read on demand from the project database
+class DatabaseMessage(object):
+    __slots__ = ("_database", "_entryId")
+
+    def __init__(self, database, entryId):
+        self._database = database
+        self._entryId = entryId
 
+    def getRequest(self):
+        return self._database.readMessage(self._entryId, "request")
+
+    def getResponse(self):
+        return self._database.readMessage(self._entryId, "response")
+
+
+# Request and response bytes for the viewers, cut to the preview limit
+class MessagePreview(object):
+    __slots__ = ("request", "response", "requestLength", "responseLength")
+
+    def __init__(self, request, response, requestLength, responseLength):
+        self.request = request
+        self.response = response
+        self.requestLength = requestLength
+        self.responseLength = responseLength
+
+    def isTruncated(self):
+        return len(self.request) < self.requestLength or (
+            self.response is not None and len(self.response) < self.responseLength
+        )
+
+
+# Recently shown and prefetched previews, so stepping through neighbouring
+# rows does not read or decompress messages on the EDT. Safe to use from
+# the prefetch thread and the EDT at the same time.
+class MessagePreviewCache(object):
+    DEFAULT_LIMIT_BYTES = 256 * 1024
+    CAPACITY = 64
+
+    def __init__(self):
+        self.limitBytes = self.DEFAULT_LIMIT_BYTES
+        self._lock = threading.Lock()
+        self._previews = collections.OrderedDict()
+
+    def __contains__(self, entry):
+        return entry.id in self._previews
+
+    # Preview of an entry, loaded and cached on a miss. None once the
+    # entry has been evicted.
+    def get(self, entry):
+        with self._lock:
+            preview = self._previews.pop(entry.id, None)
+            if preview is not None:
+                self._previews[entry.id] = preview
+                return preview
+
+        preview = self._load(entry)
+        if preview is not None:
+            with self._lock:
+                self._previews[entry.id] = preview
+                while len(self._previews) > self.CAPACITY:
+                    self._previews.popitem(last=False)
+        return preview
+
+    def clear(self):
+        with self._lock:
+            self._previews.clear()
+
+    def _load(self, entry):
+        message = entry.message
+        if message is None:
+            return None
+
+        request = message.getRequest()
+        response = message.getResponse()
+        requestLength = len(request)
+        responseLength = len(response) if response else 0
+        if self.limitBytes > 0:
+            if requestLength > self.limitBytes:
+                request = request[: self.limitBytes]
+            if responseLength > self.limitBytes:
+                response = response[: self.limitBytes]
+        return MessagePreview(request, response, requestLength, responseLength)
+
+
+# Persistent project store in a local SQLite database, opened through the
+# sqlite-jdbc driver (add its jar to Burp's Java environment). Metadata
+# rows are loaded into memory and filtered with the in-memory indexes; raw
+# messages are kept as blobs that are only read when needed.
+class RequestDatabase(object):
+    DRIVER_CLASS = "org.sqlite.JDBC"
+    METADATA_COLUMNS = [
+        "id",
+        "method",
+        "url",
+        "host",
+        "path",
+        "status",
+        "length",
+        "bodyOffset",
+        "fingerprint",
+        "hits",
+    ]
+    SCHEMA = [
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "CREATE TABLE IF NOT EXISTS requests ("
+        " id INTEGER PRIMARY KEY, method TEXT, url TEXT, host TEXT, path TEXT,"
+        " extension TEXT, status INTEGER, length INTEGER, bodyOffset INTEGER,"
+        " fingerprint TEXT, hits INTEGER, request BLOB, response BLOB)",
+    ]
+
+    def __init__(self, path):
+        driver = Class.forName(self.DRIVER_CLASS).newInstance()
+        self.path = path
+        self._connection = driver.connect("jdbc:sqlite:" + path, Properties())
+        self._lock = threading.Lock()
+
+        statement = self._connection.createStatement()
+        try:
+            for sql in self.SCHEMA:
+                statement.execute(sql)
+        finally:
+            statement.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # Run a statement with parameters inside one transaction per batch
+    def _executeBatch(self, sql, rows):
+        with self._lock:
+            self._connection.setAutoCommit(False)
+            statement = self._connection.prepareStatement(sql)
+            try:
+                for row in rows:
+                    for i, value in enumerate(row):
+                        statement.setObject(i + 1, value)
+                    statement.addBatch()
+                statement.executeBatch()
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+            finally:
+                statement.close()
+                self._connection.setAutoCommit(True)
+
+    def _query(self, sql, params):
+        with self._lock:
+            statement = self._connection.prepareStatement(sql)
+            try:
+                for i, value in enumerate(params):
+                    statement.setObject(i + 1, value)
+                resultSet = statement.executeQuery()
+                columnCount = resultSet.getMetaData().getColumnCount()
+                rows = []
+                while resultSet.next():
+                    rows.append(
+                        [resultSet.getObject(i + 1) for i in range(columnCount)]
+                    )
+                return rows
+            finally:
+                statement.close()
+
+    def insert(self, entries):
+        self._executeBatch(
+            "INSERT OR REPLACE INTO requests (id, method, url, host, path,"
+            " extension, status, length, bodyOffset, fingerprint, hits, request,"
+            " response) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    entry.id,
+                    entry.method,
+                    entry.url,
+                    entry.host,
+                    entry.path,
+                    entry.extension,
+                    entry.status,
+                    entry.length,
+                    entry.bodyOffset,
+                    entry.fingerprint,
+                    entry.hits,
+                    entry.message.getRequest(),
+                    entry.message.getResponse(),
+                )
+                for entry in entries
+            ],
+        )
+
+    def updateHits(self, entries):
+        self._executeBatch(
+            "UPDATE requests SET hits = ? WHERE id = ?",
+            [(entry.hits, entry.id) for entry in entries],
+        )
+
+    def delete(self, entryIds):
+        self._executeBatch(
+            "DELETE FROM requests WHERE id = ?", [(entryId,) for entryId in entryIds]
+        )
+
+    def deleteAll(self):
+        self._executeBatch("DELETE FROM requests", [()])
+
+    def readMessage(self, entryId, column):
+        rows = self._query(
+            "SELECT {} FROM requests WHERE id = ?".format(column), [entryId]
+        )
+        return rows[0][0] if rows else None
+
+    def maxId(self):
+        rows = self._query("SELECT MAX(id) FROM requests", [])
+        return -1 if rows[0][0] is None else rows[0][0]
+
+    # Metadata rows with an id above afterId, in id order
+    def loadPage(self, afterId, pageSize):
+        return self._query(
+            "SELECT {} FROM requests WHERE id > ? ORDER BY id LIMIT ?".format(
+                ", ".join(self.METADATA_COLUMNS)
+            ),
+            [afterId, pageSize],
+        )
+
+    # Rebuild a collected entry from a metadata row
+    def entryFromRow(self, row):
+        entryId, method, url, host, path, status, length, bodyOffset = row[:8]
+        entry = RequestEntry(
+            entryId,
+            DatabaseMessage(self, entryId),
+            method,
+            url,
+            host,
+            path,
+            status,
+            length,
+            bodyOffset,
+            row[8],
+        )
+        entry.hits = row[9] or 1
+        return entry
+
+
+# Body index that indexes queued entries on a single background thread as
+# they are collected
+class BackgroundBodyIndex(BodyIndex):
+    def __init__(self, metrics):
+        BodyIndex.__init__(self, metrics)
+        self._executor = Executors.newSingleThreadExecutor()
+
+    # Queue entries for indexing. Bodies are never read back from the
+    # project database: entries stored there are indexed from the messages
+    # they were parsed from (sources maps entry IDs to them), and are left
+    # unindexed without one. Runs on the EDT.
+    def add(self, entries, sources=None):
+        if not self.isEnabled() or not entries:
+            return
+
+        queued = []
+        messages = []
+        unindexed = []
+        for entry in entries:
+            message = entry.message
+            if isinstance(message, DatabaseMessage):
+                message = sources.get(entry.id) if sources else None
+                if message is None:
+                    unindexed.append(entry)
+                    continue
+            queued.append(entry)
+            messages.append(message)
+
+        self.skip(unindexed)
+        if queued:
+            self.queue(queued)
+            self._executor.submit(
+                BodyIndexRunnable(self, queued, messages, self._metrics)
+            )
+
+    def shutdown(self):
+        self._executor.shutdownNow()
+
+
+class BurpExtender(IBurpExtender, ITab, IContextMenuFactory, IExtensionStateListener):
+    # Quiet period after a selection change before the viewers render, and
+    # the number of rows prefetched on each side of the selection
+    VIEWER_DEBOUNCE_MS = 120
+    PREFETCH_ROWS = 3
+
+    # Refresh period of the visible stats panel and default period of
+    # stats dumps to a file
+    STATS_REFRESH_MS = 1000
+    STATS_DUMP_INTERVAL_S = 10
 
-class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
     # Implement IBurpExtender
     def registerExtenderCallbacks(self, callbacks):
         # Keep a reference to our callbacks object
@@ -44,9 +537,52 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         self._requestList = ArrayList()
         self._filteredList = ArrayList()
 
+        # Optional table sort order over the filtered entries
+        self._sorter = EntrySorter()
+
+        # Filtered entries grouped by endpoint template, maintained only while
+        # the Endpoints tab is shown
+        self._endpointIndex = EndpointGroupIndex()
+        self._endpointsActive = False
+        self._nextEntryId = AtomicInteger()
+
+        # Phase timings and counters shown in the stats panel
+        self._metrics = Metrics()
+        self._statsDumpPath = None
+
+        # Raw messages live in the store; evictedCount counts entries dropped
+        # from the front of the request list by the retention policy
+        self._store = MessageStore(callbacks, self._metrics)
+        self._evictedCount = 0
+
+        # First collected entry for each request fingerprint
+        self._fingerprints = {}
+
+        # URL token index over the collected entries, used by URI filters
+        self._urlIndex = UrlTokenIndex()
+
+        # Bitmaps over method, extension, status class and host
+        self._bitmapIndex = CategoryBitmapIndex()
+
+        # Trigram index over bodies, used by body and resp query terms
+        self._bodyIndex = BackgroundBodyIndex(self._metrics)
+
+        # Viewer previews, filled around the selection by a prefetch thread
+        self._previewCache = MessagePreviewCache()
+        self._prefetchExecutor = Executors.newSingleThreadExecutor()
+        self._prefetchFuture = None
+        self._viewerEntry = None
+
+        # Optional persistent project database
+        self._database = None
+
         # Create UI
         self._initUI()
 
+        # Filter that was last applied; new requests are only tested against it
+        self._activeFilter = self._captureFilter()
+        self._filterWorker = None
+
         # Register context menu
         callbacks.registerContextMenuFactory(self)
 
@@ -56,6 +592,10 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         # Get helpers
         self._helpers = callbacks.getHelpers()
 
+        # Live capture is off until enabled from the tab
+        self._liveCapture = LiveCapture(self)
+        callbacks.registerExtensionStateListener(self)
+
         print("Request Filter plugin loaded!")
 
     # Initialize UI components
@@ -76,9 +616,7 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
 
         # Create method checkboxes
         self._methodFilters = {}
-        methodNames = ["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS", "PATCH"]
-
-        for method in methodNames:
+        for method in HTTP_METHODS:
             checkbox = JCheckBox(method, True)  # All selected by default
             self._methodFilters[method] = checkbox
             methodPanel.add(checkbox)
@@ -91,13 +629,12 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
 
         # Create file type checkboxes
         self._fileTypeFilters = {}
-        fileTypes = ["js", "gif", "jpg", "png", "css"]
 
         # Add checkbox to include/exclude these file types
         self._includeFileTypes = JCheckBox("Include", False)  # Default is to exclude
         fileTypePanel.add(self._includeFileTypes)
 
-        for fileType in fileTypes:
+        for fileType in STATIC_FILE_TYPES:
             checkbox = JCheckBox(fileType, True)  # All selected by default
             self._fileTypeFilters[fileType] = checkbox
             fileTypePanel.add(checkbox)
@@ -129,33 +666,168 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         self._filterButton.addActionListener(FilterListener(self))
         uriPanel.add(self._filterButton)
 
+        # Progress of the background filter run, hidden while idle
+        self._filterProgress = JProgressBar()
+        self._filterProgress.setStringPainted(True)
+        self._filterProgress.setVisible(False)
+        uriPanel.add(self._filterProgress)
+
         filterPanel.add(uriPanel)
 
+        # Structured query panel
+        queryPanel = JPanel(FlowLayout(FlowLayout.LEFT))
+        queryPanel.add(JLabel("Query:"))
+
+        self._queryField = JTextField(60)
+        self._queryField.setToolTipText(
+            "<html>Combine terms with AND, OR, NOT and parentheses, e.g.<br>"
+            "host:api.* AND status:5xx AND NOT path:/static/ AND len&gt;10000"
+            " AND header:Authorization<br>"
+            "Fields: method, host, path, url, ext, status, len, hits, header,"
+            " body, resp, endpoint<br>"
+            "Operators: field:text (substring or * glob), field=text, field~regex,"
+            " field&gt;n, field&lt;=n, field!=n</html>"
+        )
+        self._queryField.addActionListener(FilterListener(self))
+        queryPanel.add(self._queryField)
+
+        filterPanel.add(queryPanel)
+
+        # Live capture panel
+        livePanel = JPanel(FlowLayout(FlowLayout.LEFT))
+
+        self._liveCaptureCheckbox = JCheckBox("Live capture", False)
+        self._liveCaptureCheckbox.setToolTipText(
+            "Collect completed requests as they pass through Burp"
+        )
+        self._liveCaptureCheckbox.addItemListener(LiveCaptureToggleListener(self))
+        livePanel.add(self._liveCaptureCheckbox)
+
+        self._liveScope = JComboBox(["Proxy only", "All tools"])
+        self._liveScope.addActionListener(LiveScopeListener(self))
+        livePanel.add(self._liveScope)
+
+        self._liveStatusLabel = JLabel("")
+        livePanel.add(self._liveStatusLabel)
+
+        self._dedupCheckbox = JCheckBox("Deduplicate", False)
+        self._dedupCheckbox.setToolTipText(
+            "Count repeated requests on the first copy instead of adding them"
+        )
+        livePanel.add(self._dedupCheckbox)
+
+        filterPanel.add(livePanel)
+
+        # Storage and retention panel
+        storagePanel = JPanel(FlowLayout(FlowLayout.LEFT))
+        storagePanel.add(JLabel("Storage:"))
+
+        storageListener = StorageSettingsListener(self)
+
+        self._storageMode = JComboBox(["Compressed in memory", "Burp temp files"])
+        self._storageMode.addActionListener(storageListener)
+        storagePanel.add(self._storageMode)
+
+        storagePanel.add(JLabel("Keep at most"))
+        self._maxEntriesField = JTextField(7)
+        self._maxEntriesField.setToolTipText("Empty for no limit, press Enter to apply")
+        self._maxEntriesField.addActionListener(storageListener)
+        storagePanel.add(self._maxEntriesField)
+        storagePanel.add(JLabel("requests or"))
+
+        self._maxMegabytesField = JTextField(5)
+        self._maxMegabytesField.setToolTipText(
+            "Empty for no limit, press Enter to apply"
+        )
+        self._maxMegabytesField.addActionListener(storageListener)
+        storagePanel.add(self._maxMegabytesField)
+        storagePanel.add(JLabel("MB"))
+
+        storagePanel.add(JLabel("Index bodies up to"))
+        self._maxIndexedBodyField = JTextField(4)
+        self._maxIndexedBodyField.setToolTipText(
+            "Off when empty or 0; try 64. Larger bodies, and every request once"
+            " the index is full, are searched without the index. Press Enter"
+            " to apply."
+        )
+        self._maxIndexedBodyField.addActionListener(storageListener)
+        storagePanel.add(self._maxIndexedBodyField)
+        storagePanel.add(JLabel("KB"))
+
+        self._databaseButton = JButton("Open Project DB...")
+        self._databaseButton.setToolTipText(
+            "Keep the collection in a SQLite file (needs the sqlite-jdbc jar)"
+        )
+        self._databaseButton.addActionListener(DatabaseListener(self))
+        storagePanel.add(self._databaseButton)
+
+        self._storageStatusLabel = JLabel("")
+        storagePanel.add(self._storageStatusLabel)
+
+        filterPanel.add(storagePanel)
+
         self._mainPanel.add(filterPanel, BorderLayout.NORTH)
 
-        # Create table to hold request data
-        self._tableModel = DefaultTableModel()
-        self._tableModel.addColumn("ID")
-        self._tableModel.addColumn("Method")
-        self._tableModel.addColumn("URL")
-        self._tableModel.addColumn("Status")
-        self._tableModel.addColumn("Length")
+        # Create table that reads rows from the filtered entries
+        self._tableModel = RequestTableModel(self)
 
         self._table = JTable(self._tableModel)
         self._table.getSelectionModel().addListSelectionListener(
             TableSelectionListener(self)
         )
 
+        # Click a column header to sort, shift-click to add a sort column
+        self._table.getTableHeader().addMouseListener(SortHeaderListener(self))
+
         # Set column widths
         self._table.getColumnModel().getColumn(0).setPreferredWidth(50)
         self._table.getColumnModel().getColumn(1).setPreferredWidth(80)
         self._table.getColumnModel().getColumn(2).setPreferredWidth(350)
         self._table.getColumnModel().getColumn(3).setPreferredWidth(80)
         self._table.getColumnModel().getColumn(4).setPreferredWidth(80)
+        self._table.getColumnModel().getColumn(5).setPreferredWidth(50)
 
         # Add table to a scroll pane
         tableScrollPane = JScrollPane(self._table)
 
+        # Endpoints tab: one row per endpoint template of the filtered requests
+        self._endpointModel = EndpointTableModel(self)
+        self._endpointTable = JTable(self._endpointModel)
+        self._endpointTable.getSelectionModel().addListSelectionListener(
+            EndpointSelectionListener(self)
+        )
+        self._endpointTable.getColumnModel().getColumn(0).setPreferredWidth(60)
+        self._endpointTable.getColumnModel().getColumn(1).setPreferredWidth(150)
+        self._endpointTable.getColumnModel().getColumn(2).setPreferredWidth(300)
+        self._endpointTable.getColumnModel().getColumn(3).setPreferredWidth(70)
+        self._endpointTable.getColumnModel().getColumn(4).setPreferredWidth(160)
+        self._endpointTable.getColumnModel().getColumn(5).setPreferredWidth(300)
+
+        endpointToolbar = JPanel(FlowLayout(FlowLayout.LEFT))
+        showRequestsButton = JButton("Show Requests")
+        showRequestsButton.setToolTipText(
+            "Filter the Requests tab to the selected endpoint"
+        )
+        showRequestsButton.addActionListener(ShowEndpointRequestsListener(self))
+        endpointToolbar.add(showRequestsButton)
+        saveEndpointsButton = JButton("Save One per Endpoint as YAML")
+        saveEndpointsButton.setToolTipText(
+            "Save the sample request of every endpoint, named after its template"
+        )
+        saveEndpointsButton.addActionListener(SaveEndpointsListener(self))
+        endpointToolbar.add(saveEndpointsButton)
+        self._endpointStatusLabel = JLabel("")
+        endpointToolbar.add(self._endpointStatusLabel)
+
+        endpointPanel = JPanel(BorderLayout())
+        endpointPanel.add(endpointToolbar, BorderLayout.NORTH)
+        endpointPanel.add(JScrollPane(self._endpointTable), BorderLayout.CENTER)
+
+        self._tableTabs = JTabbedPane()
+        self._tableTabs.addTab("Requests", tableScrollPane)
+        self._tableTabs.addTab("Endpoints", endpointPanel)
+        self._tableTabs.addChangeListener(TableTabListener(self))
+
         # Create details panel for request/response
         detailsPanel = JPanel(BorderLayout())
 
@@ -180,6 +852,10 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         # Add to details panel
         detailsPanel.add(viewerSplitPane, BorderLayout.CENTER)
 
+        # Selection changes only render once navigation pauses
+        self._viewerTimer = Timer(self.VIEWER_DEBOUNCE_MS, ViewerTimerListener(self))
+        self._viewerTimer.setRepeats(False)
+
         # Create navigation buttons
         navPanel = JPanel(FlowLayout(FlowLayout.CENTER))
 
@@ -193,11 +869,33 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         nextButton.addActionListener(NavigationListener(self, 1))
         navPanel.add(nextButton)
 
+        navPanel.add(Box.createHorizontalStrut(20))
+
+        # Large messages are shown truncated until loaded in full
+        navPanel.add(JLabel("Preview up to"))
+        self._previewLimitField = JTextField(
+            str(MessagePreviewCache.DEFAULT_LIMIT_BYTES // 1024), 5
+        )
+        self._previewLimitField.setToolTipText(
+            "Empty or 0 always shows full messages, press Enter to apply"
+        )
+        self._previewLimitField.addActionListener(PreviewLimitListener(self))
+        navPanel.add(self._previewLimitField)
+        navPanel.add(JLabel("KB"))
+
+        self._loadFullButton = JButton("Load Full Message")
+        self._loadFullButton.setEnabled(False)
+        self._loadFullButton.addActionListener(LoadFullMessageListener(self))
+        navPanel.add(self._loadFullButton)
+
+        self._viewerStatusLabel = JLabel("")
+        navPanel.add(self._viewerStatusLabel)
+
         detailsPanel.add(navPanel, BorderLayout.SOUTH)
 
         # Create a split pane for table and details
         mainSplitPane = JSplitPane(
-            JSplitPane.VERTICAL_SPLIT, tableScrollPane, detailsPanel
+            JSplitPane.VERTICAL_SPLIT, self._tableTabs, detailsPanel
         )
         mainSplitPane.setResizeWeight(0.5)  # Equal resizing for both components
         mainSplitPane.setDividerLocation(300)  # Initial divider position
@@ -205,12 +903,68 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         # Add the split pane to the center of the main panel
         self._mainPanel.add(mainSplitPane, BorderLayout.CENTER)
 
+        # Collapsible stats panel on the right, hidden by default
+        self._statsPanel = JPanel(BorderLayout())
+        self._statsPanel.setBorder(BorderFactory.createTitledBorder("Performance"))
+        self._statsText = JTextArea(24, 74)
+        self._statsText.setEditable(False)
+        self._statsText.setFont(Font(Font.MONOSPACED, Font.PLAIN, 11))
+        self._statsPanel.add(JScrollPane(self._statsText), BorderLayout.CENTER)
+
+        statsDumpPanel = JPanel(FlowLayout(FlowLayout.LEFT))
+        statsDumpPanel.add(JLabel("Every"))
+        self._statsDumpIntervalField = JTextField(str(self.STATS_DUMP_INTERVAL_S), 4)
+        statsDumpPanel.add(self._statsDumpIntervalField)
+        statsDumpPanel.add(JLabel("s"))
+        self._statsDumpButton = JButton("Dump to File...")
+        self._statsDumpButton.setToolTipText(
+            "Append a JSON snapshot of the stats to a file periodically"
+        )
+        self._statsDumpButton.addActionListener(StatsDumpListener(self))
+        statsDumpPanel.add(self._statsDumpButton)
+        self._statsPanel.add(statsDumpPanel, BorderLayout.SOUTH)
+
+        self._statsPanel.setVisible(False)
+        self._mainPanel.add(self._statsPanel, BorderLayout.EAST)
+
+        # The panel is only refreshed while it is shown
+        self._statsTimer = Timer(self.STATS_REFRESH_MS, StatsTimerListener(self))
+        self._statsDumpTimer = Timer(
+            self.STATS_DUMP_INTERVAL_S * 1000, StatsDumpTimerListener(self)
+        )
+
+        # Options shown next to the directory choosers of the Save All exports
+        self._incrementalExportCheckbox = JCheckBox("Only write new or changed files")
+        self._incrementalExportCheckbox.setToolTipText(
+            "<html>Keep a manifest in the directory and skip requests whose file"
+            " is unchanged<br>since the last export, instead of adding -1, -2"
+            " ... copies</html>"
+        )
+        self._removeStaleCheckbox = JCheckBox("Delete files of requests not exported")
+        self._removeStaleCheckbox.setToolTipText(
+            "Remove files an earlier incremental export wrote for requests that"
+            " are no longer in the list"
+        )
+        self._exportOptionsPanel = JPanel()
+        self._exportOptionsPanel.setLayout(
+            BoxLayout(self._exportOptionsPanel, BoxLayout.Y_AXIS)
+        )
+        self._exportOptionsPanel.add(self._incrementalExportCheckbox)
+        self._exportOptionsPanel.add(self._removeStaleCheckbox)
+
         # Create action panel
         actionPanel = JPanel()
         actionPanel.setLayout(BoxLayout(actionPanel, BoxLayout.X_AXIS))
 
         actionPanel.add(Box.createHorizontalGlue())
 
+        # Import button
+        self._importButton = JButton("Import HAR / Burp XML...")
+        self._importButton.addActionListener(ImportListener(self))
+        actionPanel.add(self._importButton)
+
+        actionPanel.add(Box.createHorizontalStrut(10))
+
         # Save button
         self._saveButton = JButton("Save Selected as HTTP File")
         self._saveButton.addActionListener(SaveListener(self))
@@ -239,256 +993,648 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
 
         actionPanel.add(Box.createHorizontalStrut(10))
 
+        # Save All as Archive button
+        self._saveArchiveButton = JButton("Save All as Archive")
+        self._saveArchiveButton.addActionListener(SaveArchiveListener(self))
+        actionPanel.add(self._saveArchiveButton)
+
+        actionPanel.add(Box.createHorizontalStrut(10))
+
         # Clear button
         self._clearButton = JButton("Clear All")
         self._clearButton.addActionListener(ClearListener(self))
         actionPanel.add(self._clearButton)
 
+        actionPanel.add(Box.createHorizontalStrut(10))
+
+        # Stats panel toggle
+        self._statsButton = JToggleButton("Stats")
+        self._statsButton.setToolTipText("Show timings and counters")
+        self._statsButton.addActionListener(StatsToggleListener(self))
+        actionPanel.add(self._statsButton)
+
         actionPanel.add(Box.createHorizontalGlue())
 
         self._mainPanel.add(actionPanel, BorderLayout.SOUTH)
 
-    # Check if URL has one of the specified file extensions
-    def _hasFileExtension(self, url, extensions):
-        for ext in extensions:
-            if url.lower().endswith("." + ext.lower()):
-                return True
-        return False
-
-    # Filter requests based on current filter settings
-    def _applyFilters(self):
-        self._filteredList.clear()
+    # Capture the filter widgets once and compile them into a predicate
+    def _captureFilter(self):
+        methods = [
+            method
+            for method, checkbox in self._methodFilters.items()
+            if checkbox.isSelected()
+        ]
+        fileTypes = [
+            ext
+            for ext, checkbox in self._fileTypeFilters.items()
+            if checkbox.isSelected()
+        ]
+        uriPatterns = [uriFilter.getText().strip() for uriFilter in self._uriFilters]
+
+        return CompiledFilter(
+            methods,
+            fileTypes,
+            self._includeFileTypes.isSelected(),
+            uriPatterns,
+            self._queryField.getText(),
+        )
 
-        for reqRes in self._requestList:
-            try:
-                # Parse the request
-                request = reqRes.getRequest()
-                requestInfo = self._helpers.analyzeRequest(reqRes)
+    # Filter requests based on current filter settings. The collection is
+    # only re-scanned when the settings differ from the active filter.
+    def _applyFilters(self, force=False):
+        try:
+            requestFilter = self._captureFilter()
+        except QueryError as e:
+            JOptionPane.showMessageDialog(
+                self._mainPanel, str(e), "Invalid query", JOptionPane.ERROR_MESSAGE
+            )
+            return
 
-                # Get HTTP method
-                method = requestInfo.getMethod()
+        if requestFilter == self._activeFilter and not force:
+            return
 
-                # Get URL
-                url = requestInfo.getUrl().toString()
+        self._startFilterRun(requestFilter)
 
-                # Apply method filter - check if current method is selected
-                if method in self._methodFilters:
-                    if not self._methodFilters[method].isSelected():
-                        continue
-                else:
-                    # If method not in our predefined list, skip if not a selected "OTHER" checkbox
-                    # (could add an "OTHER" checkbox in the future)
-                    continue
+    # Re-scan the collection on a background worker, cancelling any run
+    # that is still in progress
+    def _startFilterRun(self, requestFilter):
+        self._cancelFilterRun()
+        self._activeFilter = requestFilter
 
-                # Apply file type filters
-                selectedFileTypes = [
-                    ext
-                    for ext, checkbox in self._fileTypeFilters.items()
-                    if checkbox.isSelected()
-                ]
-
-                isFileTypeMatch = self._hasFileExtension(url, selectedFileTypes)
-
-                # If include is checked, we want to keep file type matches
-                # If include is not checked, we want to exclude file type matches
-                if self._includeFileTypes.isSelected():
-                    # Include mode - skip if not a file type match
-                    if selectedFileTypes and not isFileTypeMatch:
-                        continue
-                else:
-                    # Exclude mode - skip if it is a file type match
-                    if isFileTypeMatch:
-                        continue
+        # Only entries selected by the bitmaps and, for URI filters with
+        # whole tokens, the URL index need to be tested
+        entries = [
+            self._requestList.get(position - self._evictedCount)
+            for position in self._bitmapIndex.positions(
+                self._bitmapIndex.select(requestFilter)
+            )
+        ]
+        urlIds = self._urlIndex.candidateIds(requestFilter.uriPatterns)
+        if urlIds is not None:
+            entries = [entry for entry in entries if entry.id in urlIds]
+
+        worker = FilterWorker(self, requestFilter, entries)
+        worker.endOffset = self._evictedCount + self._requestList.size()
+        self._filterWorker = worker
+
+        self._filterProgress.setMaximum(max(worker.total, 1))
+        self._filterProgress.setValue(0)
+        self._filterProgress.setVisible(True)
+
+        worker.execute()
+
+    # Cancel the in-flight filter run, if any
+    def _cancelFilterRun(self):
+        if self._filterWorker is not None:
+            self._filterWorker.cancel(False)
+            self._filterWorker = None
+            self._filterProgress.setVisible(False)
+
+    # Called on the EDT with a chunk of matches from a filter run. The first
+    # chunk replaces the visible list, later chunks are appended to it.
+    def _publishFilterChunk(self, worker, entries, processed):
+        if worker is not self._filterWorker:
+            return
 
-                # Apply URI filters if any are not empty
-                matchesUriFilter = False
+        if not worker.swapped:
+            worker.swapped = True
+            self._resetFilteredList()
 
-                # If all URI filters are empty, consider it a match
-                if all(filter.getText().strip() == "" for filter in self._uriFilters):
-                    matchesUriFilter = True
-                else:
-                    # Check each non-empty filter - ANY match passes (OR logic)
-                    for uriFilter in self._uriFilters:
-                        filterText = uriFilter.getText().strip()
-                        if filterText and filterText in url:
-                            matchesUriFilter = True
-                            break
-
-                if not matchesUriFilter:
-                    continue
+        # Skip entries evicted while the run was in progress
+        self._addFilteredEntries(
+            [entry for entry in entries if entry.message is not None]
+        )
+        self._filterProgress.setValue(processed)
 
-                # If we got here, request passed all filters
-                self._filteredList.add(reqRes)
-            except Exception as e:
-                print("Error filtering request: {}".format(e))
+    # Called on the EDT when a filter run has completed
+    def _finishFilterRun(self, worker):
+        if worker is not self._filterWorker:
+            return
 
-        # Update the table
-        self._updateTable()
+        self._filterWorker = None
+        self._filterProgress.setVisible(False)
+        self._metrics.record("filter", time.time() - worker.startTime)
 
-    # Update the table with filtered requests
-    def _updateTable(self):
-        # Clear the table
-        while self._tableModel.getRowCount() > 0:
-            self._tableModel.removeRow(0)
+        if not worker.swapped:
+            worker.swapped = True
+            self._resetFilteredList()
 
-        # Add filtered requests to table
-        for i, reqRes in enumerate(self._filteredList):
-            try:
-                # Parse the request
-                request = reqRes.getRequest()
-                requestInfo = self._helpers.analyzeRequest(reqRes)
+        # Requests added while the run was in progress were not in its snapshot
+        addedEntries = self._requestList.subList(
+            max(worker.endOffset - self._evictedCount, 0), self._requestList.size()
+        )
+        self._addFilteredEntries(
+            [entry for entry in addedEntries if self._activeFilter.matches(entry)]
+        )
 
-                # Get method
-                method = requestInfo.getMethod()
+        if worker.rescan:
+            self._startFilterRun(self._activeFilter)
 
-                # Get URL
-                url = requestInfo.getUrl().toString()
+    # Empty the filtered list, its sort order and endpoint groups
+    def _resetFilteredList(self):
+        self._filteredList.clear()
+        self._sorter.reset()
+        self._endpointIndex.clear()
+        self._updateTable()
+        self._endpointModel.fireTableDataChanged()
+        self._updateEndpointStatus()
 
-                # Get response info if available
-                responseStatus = ""
-                responseLength = ""
+    # Append entries that passed the active filter to the list and the table
+    def _addFilteredEntries(self, entries):
+        if not entries:
+            return
 
-                response = reqRes.getResponse()
-                if response:
-                    responseInfo = self._helpers.analyzeResponse(response)
-                    responseStatus = str(responseInfo.getStatusCode())
-                    responseLength = str(len(response))
+        startTime = time.time()
+        firstRow = self._filteredList.size()
+        for entry in entries:
+            self._filteredList.add(entry)
 
-                # Add row to table
-                self._tableModel.addRow(
-                    [str(i), method, url, responseStatus, responseLength]
+        insertedRows = self._sorter.add(entries)
+        if insertedRows is None:
+            self._tableModel.fireTableRowsInserted(
+                firstRow, self._filteredList.size() - 1
+            )
+        else:
+            # Ascending single-run events keep the later rows' indexes valid
+            for first, last in self._rowRuns(insertedRows):
+                self._tableModel.fireTableRowsInserted(first, last)
+
+        if self._endpointsActive:
+            # Counts of existing groups change, new groups are appended
+            groupCount = len(self._endpointIndex)
+            newGroups = self._endpointIndex.add(entries)
+            if groupCount:
+                self._endpointModel.fireTableRowsUpdated(0, groupCount - 1)
+            if newGroups:
+                self._endpointModel.fireTableRowsInserted(
+                    groupCount, groupCount + newGroups - 1
                 )
-            except Exception as e:
-                print("Error updating table: {}".format(e))
+            self._updateEndpointStatus()
+        self._metrics.record("table", time.time() - startTime)
+
+    # Group ascending row indexes into (first, last) runs of adjacent rows
+    def _rowRuns(self, rows):
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        return runs
 
-    # Extract filename from URL
-    def _getFilenameFromUrl(self, urlString):
-        try:
-            # Try to parse as URL
-            url = URL(urlString)
+    # Drop entries from their endpoint groups and the Endpoints table
+    def _removeEndpointEntries(self, entries):
+        if not self._endpointsActive:
+            return
+
+        removedRows = self._endpointIndex.remove(entries)
+        for first, last in reversed(self._rowRuns(removedRows)):
+            self._endpointModel.fireTableRowsDeleted(first, last)
+        if len(self._endpointIndex):
+            self._endpointModel.fireTableRowsUpdated(0, len(self._endpointIndex) - 1)
+        self._updateEndpointStatus()
+
+    # Build the endpoint groups when their tab is shown and drop them when it
+    # is hidden, so filtering doesn't pay for groups nobody looks at
+    def setEndpointsActive(self, active):
+        if active == self._endpointsActive:
+            return
 
-            # Get path
-            path = url.getPath()
+        self._endpointsActive = active
+        self._endpointIndex.clear()
+        if active:
+            self._endpointIndex.add(list(self._filteredList))
+        self._endpointModel.fireTableDataChanged()
+        self._updateEndpointStatus()
+
+    def _updateEndpointStatus(self):
+        self._endpointStatusLabel.setText(
+            "{} endpoints in {} requests".format(
+                len(self._endpointIndex), self._filteredList.size()
+            )
+        )
 
-            # Split path and get last part
-            pathParts = path.split("/")
+    # Update the table with filtered requests
+    def _updateTable(self):
+        startTime = time.time()
+        self._tableModel.fireTableDataChanged()
+        self._metrics.record("table", time.time() - startTime)
+
+    # The entry shown in a table row, following the sort order
+    def _entryAtRow(self, row):
+        if self._sorter.view is not None:
+            return self._sorter.view[row]
+        return self._filteredList.get(row)
+
+    # Filtered entries in the order the table shows them
+    def _viewEntries(self):
+        if self._sorter.view is not None:
+            return list(self._sorter.view)
+        return list(self._filteredList)
+
+    # Sort the table by a column. A click cycles the column through
+    # ascending, descending and unsorted; with addColumn the column is
+    # added to, or toggled within, the current sort keys instead.
+    def sortByColumn(self, column, addColumn=False):
+        sortKeys = list(self._sorter.sortKeys)
+        position = [index for index, key in enumerate(sortKeys) if key[0] == column]
+
+        if addColumn:
+            if position:
+                sortKeys[position[0]] = (column, not sortKeys[position[0]][1])
+            else:
+                sortKeys.append((column, True))
+        elif sortKeys == [(column, True)]:
+            sortKeys = [(column, False)]
+        elif sortKeys == [(column, False)]:
+            sortKeys = []
+        else:
+            sortKeys = [(column, True)]
+
+        # Keep the selected entry selected in its new row
+        row = self._table.getSelectedRow()
+        selectedEntry = self._entryAtRow(row) if row != -1 else None
 
-            # Find last non-empty part
-            filename = "request"
-            for part in reversed(pathParts):
-                if part:
-                    filename = part
-                    break
+        self._sorter.setSortKeys(sortKeys, self._filteredList)
+        self._updateTable()
+        self._updateSortHeaders()
 
-            # Remove query parameters if present
-            if "?" in filename:
-                filename = filename.split("?")[0]
+        if selectedEntry is not None:
+            if self._sorter.view is not None:
+                newRow = self._sorter.view.index(selectedEntry)
+            else:
+                newRow = self._filteredList.indexOf(selectedEntry)
+            self._table.setRowSelectionInterval(newRow, newRow)
+            self._table.scrollRectToVisible(self._table.getCellRect(newRow, 0, True))
 
-            # Add .http extension if needed
-            if not filename.endswith(".http"):
-                filename += ".http"
+    # Show the sort direction and priority in the column headers
+    def _updateSortHeaders(self):
+        columnModel = self._table.getColumnModel()
+        for column, name in enumerate(RequestTableModel.COLUMNS):
+            for priority, (sortColumn, ascending) in enumerate(self._sorter.sortKeys):
+                if sortColumn == column:
+                    name = u"{} {}{}".format(
+                        name,
+                        u"\u25b2" if ascending else u"\u25bc",
+                        priority + 1 if len(self._sorter.sortKeys) > 1 else "",
+                    )
+            columnModel.getColumn(column).setHeaderValue(name)
+        self._table.getTableHeader().repaint()
 
-            return filename
-        except:
-            # If URL parsing fails, return a default name
-            return "request.http"
+    # Extract filename from URL
+    def _getFilenameFromUrl(self, urlString):
+        return filenameFromUrl(urlString)
 
     # Generate YAML filename from URL: <host>_<last_2_or_3_path_segments>.yaml
     def _getYamlFilenameFromUrl(self, urlString):
-        try:
-            url = URL(urlString)
-            host = url.getHost()
-            path = url.getPath()
-
-            # Get non-empty path segments
-            segments = [s for s in path.split("/") if s]
-
-            # Take last 2 or 3 segments depending on how many are available
-            if len(segments) >= 3:
-                pathPart = "_".join(segments[-3:])
-            elif len(segments) >= 1:
-                pathPart = (
-                    "_".join(segments[-2:]) if len(segments) >= 2 else segments[0]
-                )
-            else:
-                pathPart = "root"
+        return yamlFilenameFromUrl(urlString)
 
-            # Clean up special characters in path segments
-            pathPart = pathPart.replace("?", "").replace("&", "").replace("=", "_")
+    # Stream a collected request entry as YAML through write(bytes)
+    def _writeRequestYaml(self, entry, write):
+        writeRequestYaml(entry, write)
 
-            filename = "{}_{}".format(host, pathPart)
+    # Parse a request/response once and wrap it with its cached metadata.
+    # Safe to call from background threads.
+    def _createEntry(self, reqRes):
+        requestInfo = self._helpers.analyzeRequest(reqRes)
+        url = requestInfo.getUrl()
+        method = requestInfo.getMethod()
+        bodyOffset = requestInfo.getBodyOffset()
 
-            # Ensure it ends with .yaml
-            if not filename.endswith(".yaml"):
-                filename += ".yaml"
+        fingerprint = requestFingerprint(
+            method,
+            url.getProtocol(),
+            url.getHost(),
+            url.getPort(),
+            url.getPath(),
+            url.getQuery(),
+            toByteString(reqRes.getRequest()[bodyOffset:]),
+        )
 
-            return filename
-        except:
-            return "request.yaml"
+        status = None
+        length = None
+        response = reqRes.getResponse()
+        if response:
+            status = self._helpers.analyzeResponse(response).getStatusCode()
+            length = len(response)
+
+        return RequestEntry(
+            self._nextEntryId.getAndIncrement(),
+            self._store.store(reqRes),
+            method,
+            url.toString(),
+            url.getHost(),
+            url.getPath(),
+            status,
+            length,
+            bodyOffset,
+            fingerprint,
+        )
 
-    # Convert a Burp request/response object to a YAML-formatted string
-    def _requestToYaml(self, reqRes):
-        requestInfo = self._helpers.analyzeRequest(reqRes)
-        requestBytes = reqRes.getRequest()
+    # Parse messages into entries and test them against a filter. With a
+    # project DB open, also returns the parsed messages by entry ID, so the
+    # body index can read them instead of the database (None otherwise).
+    # Safe to call from background threads.
+    def _parseEntries(self, messages, requestFilter):
+        startTime = time.time()
+        database = self._database
+        entries = []
+        matchedEntries = []
+        sources = None
+        if database is not None and self._bodyIndex.isEnabled():
+            sources = {}
+        for reqRes in messages:
+            try:
+                entry = self._createEntry(reqRes)
+                entries.append(entry)
+                if sources is not None:
+                    sources[entry.id] = reqRes
+                if requestFilter.matches(entry):
+                    matchedEntries.append(entry)
+            except Exception as e:
+                self._metrics.reportError("Error parsing request", e)
 
-        method = requestInfo.getMethod()
-        url = requestInfo.getUrl()
-        host = url.getHost()
-        path = url.getPath()
-        query = url.getQuery()
+        if database is not None and entries:
+            try:
+                self._store.persist(entries, database)
+            except Exception as e:
+                self._metrics.reportError("Error saving requests to the project DB", e)
+
+        self._metrics.count("requestsParsed", len(entries))
+        self._metrics.record("parse", time.time() - startTime)
+        return entries, matchedEntries, sources
+
+    # Add parsed entries to the collection on the EDT. Only the new entries
+    # are tested against the active filter, so the cost is O(batch).
+    def _ingestEntries(
+        self, entries, matchedEntries, requestFilter, deduplicate=None, sources=None
+    ):
+        startTime = time.time()
+        if deduplicate is None:
+            deduplicate = self._dedupCheckbox.isSelected()
+        duplicateEntries = []
+        hitEntries = []
+
+        addedEntries = []
+        for entry in entries:
+            firstEntry = self._fingerprints.get(entry.fingerprint)
+            if firstEntry is None:
+                self._fingerprints[entry.fingerprint] = entry
+            elif deduplicate:
+                # Count the duplicate on the first copy and drop it
+                firstEntry.hits += 1
+                self._store.release(entry.message)
+                entry.message = None
+                duplicateEntries.append(entry)
+                hitEntries.append(firstEntry)
+                continue
+            self._requestList.add(entry)
+            self._urlIndex.add(entry)
+            addedEntries.append(entry)
+        self._bitmapIndex.add(
+            addedEntries,
+            self._evictedCount + self._requestList.size() - len(addedEntries),
+        )
+        self._bodyIndex.add(addedEntries, sources)
+
+        if duplicateEntries:
+            self._updateDatabase(duplicateEntries, hitEntries)
+            self._sorter.invalidateHits()
+            entries = [entry for entry in entries if entry.message is not None]
+            matchedEntries = [
+                entry for entry in matchedEntries if entry.message is not None
+            ]
+            self._table.repaint()
+
+        # The filter may have been re-applied since the entries were tested
+        if requestFilter is not self._activeFilter:
+            matchedEntries = [
+                entry for entry in entries if self._activeFilter.matches(entry)
+            ]
+
+        if hitEntries and self._activeFilter.usesHits:
+            # Entries already tested got more hits, so the view needs a fresh
+            # scan. Duplicates during a run are rescanned once after it.
+            if self._filterWorker is None:
+                self._startFilterRun(self._activeFilter)
+            else:
+                self._filterWorker.rescan = True
+        elif self._filterWorker is None:
+            # A running filter run picks up new requests when it finishes
+            self._addFilteredEntries(matchedEntries)
+
+        self._enforceRetention()
+        self._metrics.record("ingest", time.time() - startTime)
+
+    # Open or close the persistent project database
+    def toggleDatabase(self):
+        if self._database is not None:
+            self.closeDatabase()
+            return
+
+        fileChooser = JFileChooser()
+        fileChooser.setDialogTitle("Open or Create Project DB")
+        fileChooser.setFileFilter(
+            FileNameExtensionFilter(
+                "SQLite database (*.db, *.sqlite)", ["db", "sqlite"]
+            )
+        )
+        if fileChooser.showSaveDialog(self._mainPanel) != JFileChooser.APPROVE_OPTION:
+            return
 
-        if query:
-            path = "{}?{}".format(path, query)
+        # The database replaces the current collection
+        if not self._requestList.isEmpty() and (
+            JOptionPane.showConfirmDialog(
+                self._mainPanel,
+                "Opening a project DB replaces the requests collected so far.",
+                "Open Project DB",
+                JOptionPane.OK_CANCEL_OPTION,
+            )
+            != JOptionPane.OK_OPTION
+        ):
+            return
 
-        # Extract headers (skip the first line which is the request line)
-        headers = requestInfo.getHeaders()
-        headerLines = []
-        for i in range(1, headers.size()):
-            headerLines.append(headers.get(i))
+        self.openDatabase(fileChooser.getSelectedFile().getAbsolutePath())
 
-        # Extract body
-        bodyOffset = requestInfo.getBodyOffset()
-        bodyBytes = requestBytes[bodyOffset:]
-        body = self._helpers.bytesToString(bodyBytes).strip() if bodyBytes else ""
-
-        # Build YAML content
-        yamlLines = []
-        yamlLines.append("method: {}".format(method))
-        yamlLines.append("host: {}".format(host))
-        yamlLines.append('path: "{}"'.format(path))
-
-        # Add protocol
-        protocol = url.getProtocol()
-        yamlLines.append("protocol: {}".format(protocol))
-
-        # Add port if non-standard
-        port = url.getPort()
-        if port != -1 and port != 80 and port != 443:
-            yamlLines.append("port: {}".format(port))
-
-        # Add headers
-        yamlLines.append("headers:")
-        for headerLine in headerLines:
-            colonIdx = headerLine.find(":")
-            if colonIdx > 0:
-                key = headerLine[:colonIdx].strip()
-                value = headerLine[colonIdx + 1 :].strip()
-                # Escape quotes in values
-                value = value.replace('"', '\\"')
-                yamlLines.append('  {}: "{}"'.format(key, value))
-
-        # Add body if present
-        if body:
-            yamlLines.append("body: |")
-            for line in body.split("\n"):
-                yamlLines.append("  {}".format(line))
-
-        return "\n".join(yamlLines) + "\n"
+    # Open a project database and load its requests in the background
+    def openDatabase(self, path):
+        try:
+            database = RequestDatabase(path)
+        except Exception as e:
+            JOptionPane.showMessageDialog(
+                self._mainPanel,
+                "Could not open {}: {}\nThe project DB needs the sqlite-jdbc jar"
+                " in Burp's Java environment.".format(path, e),
+            )
+            return
+
+        self._clearCollection()
+        self._database = database
+        self._nextEntryId.set(database.maxId() + 1)
+        self._databaseButton.setText("Close Project DB")
+        self._databaseButton.setToolTipText(path)
+
+        DatabaseLoadWorker(self, database).execute()
+
+    # Close the project database; its requests stay on disk
+    def closeDatabase(self):
+        database = self._database
+        self._database = None
+        self._clearCollection()
+        database.close()
+        self._databaseButton.setText("Open Project DB...")
+        self._databaseButton.setToolTipText(None)
+
+    # Read the storage settings from the UI and apply the new limits
+    def _configureStore(self):
+        self._store.mode = self._storageMode.getSelectedIndex()
+        try:
+            text = self._maxEntriesField.getText().strip()
+            self._store.maxEntries = int(text) if text else 0
+            text = self._maxMegabytesField.getText().strip()
+            self._store.maxBytes = int(float(text) * 1024 * 1024) if text else 0
+            text = self._maxIndexedBodyField.getText().strip()
+            maxBodyBytes = int(float(text) * 1024) if text else 0
+        except ValueError:
+            print("Invalid storage limit, expected a number")
+            maxBodyBytes = self._bodyIndex.maxBodyBytes
+        self._enforceRetention()
+
+        # Re-index the collection when the body size limit changes
+        if maxBodyBytes != self._bodyIndex.maxBodyBytes:
+            self._bodyIndex.clear()
+            self._bodyIndex.maxBodyBytes = maxBodyBytes
+            self._bodyIndex.add(list(self._requestList))
+
+    # Mirror dropped entries and changed hit counts into the project database
+    def _updateDatabase(self, deletedEntries, hitEntries=()):
+        if self._database is None:
+            return
+        try:
+            if deletedEntries:
+                self._database.delete([entry.id for entry in deletedEntries])
+            if hitEntries:
+                self._database.updateHits(hitEntries)
+        except Exception as e:
+            self._metrics.reportError("Error updating the project DB", e)
+
+    # Evict the oldest entries from memory until the store is within its
+    # limits
+    def _enforceRetention(self):
+        evictCount = 0
+        evictedEntries = []
+        while self._store.isOverLimit() and evictCount < self._requestList.size():
+            entry = self._requestList.get(evictCount)
+            evictedEntries.append(entry)
+            self._urlIndex.remove(entry)
+            self._store.release(entry.message)
+            entry.message = None
+            if self._fingerprints.get(entry.fingerprint) is entry:
+                del self._fingerprints[entry.fingerprint]
+            evictCount += 1
+
+        if evictCount:
+            self._bodyIndex.remove(evictedEntries)
+            self._requestList.subList(0, evictCount).clear()
+            self._evictedCount += evictCount
+            self._bitmapIndex.evict(self._evictedCount)
+            # Evicted rows stay in the project database; the limits only
+            # bound what is held in memory
+
+            # Filtered entries keep ingestion order, so evicted ones are a prefix
+            filteredCount = 0
+            while (
+                filteredCount < self._filteredList.size()
+                and self._filteredList.get(filteredCount).message is None
+            ):
+                filteredCount += 1
+            if filteredCount:
+                evictedRows = self._filteredList.subList(0, filteredCount)
+                self._removeEndpointEntries(list(evictedRows))
+                evictedRows.clear()
+                removedRows = self._sorter.removeEvicted()
+                if removedRows is None:
+                    self._tableModel.fireTableRowsDeleted(0, filteredCount - 1)
+                else:
+                    # Descending events keep the earlier rows' indexes valid
+                    for first, last in reversed(self._rowRuns(removedRows)):
+                        self._tableModel.fireTableRowsDeleted(first, last)
+
+        self._storageStatusLabel.setText(
+            "Holding {} requests, {:.1f} MB in memory".format(
+                self._requestList.size(), self._store.heldBytes / (1024.0 * 1024.0)
+            )
+        )
+
+    # Remove every collected request, including those in the project database
+    def clearRequests(self):
+        if self._database is not None:
+            try:
+                self._database.deleteAll()
+            except Exception as e:
+                self._metrics.reportError("Error clearing the project DB", e)
+        self._clearCollection()
+
+    # Drop the in-memory collection
+    def _clearCollection(self):
+        self._cancelFilterRun()
+        for entry in self._requestList:
+            self._store.release(entry.message)
+            entry.message = None
+        self._evictedCount += self._requestList.size()
+        self._bitmapIndex.clear(self._evictedCount)
+        self._fingerprints.clear()
+        self._urlIndex.clear()
+        self._bodyIndex.clear()
+        self._requestList.clear()
+        self._resetFilteredList()
+        self._previewCache.clear()
+        self._showMessage(None)
 
     # Add a request to the list
     def addRequest(self, reqRes):
-        self._requestList.add(reqRes)
-        self._applyFilters()
+        self.addRequests([reqRes])
+
+    # Add a batch of requests, then update the table once. Parse and ingest
+    # times are recorded for the stats panel rather than logged.
+    def addRequests(self, messages):
+        requestFilter = self._activeFilter
+        entries, matchedEntries, sources = self._parseEntries(messages, requestFilter)
+        self._ingestEntries(entries, matchedEntries, requestFilter, sources=sources)
+        return len(entries)
+
+    # Add requests sent from the context menu and log the bulk ingestion
+    def sendToFilter(self, messages):
+        startTime = time.time()
+        count = self.addRequests(messages)
+        elapsedMs = (time.time() - startTime) * 1000
+        print("Ingested {} requests in {:.0f} ms".format(count, elapsedMs))
+
+    # Turn live capture on or off
+    def setLiveCapture(self, enabled):
+        if enabled:
+            self._liveCapture.start(self._liveScope.getSelectedIndex() == 1)
+        else:
+            self._liveCapture.stop()
+        self._updateLiveStatus()
+
+    # Pass the live capture scope to the capture, which reads it on Burp's
+    # traffic threads rather than querying the combo box off the EDT
+    def updateLiveScope(self):
+        self._liveCapture.allTools = self._liveScope.getSelectedIndex() == 1
+
+    # Show live capture counters next to the checkbox
+    def _updateLiveStatus(self):
+        if not self._liveCapture.isRunning():
+            self._liveStatusLabel.setText("")
+            return
+        self._liveStatusLabel.setText(
+            "Captured: {}  Queued: {}  Dropped: {}".format(
+                self._liveCapture.captured.get(),
+                self._liveCapture.queued(),
+                self._liveCapture.dropped.get(),
+            )
+        )
 
     # Save the selected request as a file
     def saveSelectedRequest(self):
@@ -497,14 +1643,11 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         if row == -1:
             return
 
-        # Get the request response object
-        reqRes = self._filteredList.get(row)
-
-        # Get URL
-        url = self._tableModel.getValueAt(row, 2)
+        # Get the collected entry
+        entry = self._entryAtRow(row)
 
         # Generate filename
-        filename = self._getFilenameFromUrl(url)
+        filename = self._getFilenameFromUrl(entry.url)
 
         # Create file chooser
         fileChooser = JFileChooser()
@@ -518,12 +1661,14 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
 
             try:
                 # Write raw request to file
-                fw = FileWriter(file)
-                fw.write(self._helpers.bytesToString(reqRes.getRequest()))
-                fw.close()
+                out = BufferedOutputStream(FileOutputStream(file))
+                try:
+                    out.write(entry.message.getRequest())
+                finally:
+                    out.close()
                 print("Request saved to {}".format(file.getAbsolutePath()))
             except Exception as e:
-                print("Error saving request: {}".format(e))
+                self._metrics.reportError("Error saving request", e)
 
     # Save all filtered requests to a directory
     def saveAllRequests(self):
@@ -535,76 +1680,51 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         fileChooser = JFileChooser()
         fileChooser.setFileSelectionMode(JFileChooser.DIRECTORIES_ONLY)
         fileChooser.setDialogTitle("Select Directory to Save All Requests")
+        fileChooser.setAccessory(self._exportOptionsPanel)
 
         # Show dialog
         result = fileChooser.showSaveDialog(self._mainPanel)
 
         if result == JFileChooser.APPROVE_OPTION:
-            directory = fileChooser.getSelectedFile()
-
-            # Create directory if it doesn't exist
-            if not directory.exists():
-                directory.mkdirs()
-
-            # Save each request
-            savedCount = 0
-            errorCount = 0
-
-            for i in range(self._filteredList.size()):
-                try:
-                    # Get request response
-                    reqRes = self._filteredList.get(i)
-
-                    # Get URL
-                    url = self._tableModel.getValueAt(i, 2)
-
-                    # Generate filename based on URL
-                    filename = self._getFilenameFromUrl(url)
-
-                    # Handle duplicate filenames by adding a number
-                    baseFilename = filename
-                    counter = 1
-                    outputFile = File(directory, filename)
-
-                    while outputFile.exists():
-                        # If file already exists, add a counter before the extension
-                        nameParts = baseFilename.rsplit(".", 1)
-                        if len(nameParts) > 1:
-                            filename = "{}-{}{}".format(
-                                nameParts[0], counter, nameParts[1]
-                            )
-                        else:
-                            filename = "{}-{}".format(baseFilename, counter)
-
-                        outputFile = File(directory, filename)
-                        counter += 1
-
-                    # Write request to file
-                    fw = FileWriter(outputFile)
-                    fw.write(self._helpers.bytesToString(reqRes.getRequest()))
-                    fw.close()
-
-                    savedCount += 1
-                except Exception as e:
-                    print("Error saving request {}: {}".format(i, e))
-                    errorCount += 1
-
-            print(
-                "Saved {} requests to {}. Errors: {}".format(
-                    savedCount, directory.getAbsolutePath(), errorCount
-                )
+            self._exportAll(
+                fileChooser.getSelectedFile(),
+                lambda entry: self._getFilenameFromUrl(entry.url),
+                lambda entry, out: out.write(entry.message.getRequest()),
+                "requests",
+                "http",
             )
 
+    # Write every filtered entry, or the given entries, to its own file on a
+    # background worker. filenameFunc(entry) names each file. With the
+    # incremental option, kind selects the export's records in the manifest.
+    def _exportAll(self, directory, filenameFunc, writeFunc, label, kind, entries=None):
+        # Create directory if it doesn't exist
+        if not directory.exists():
+            directory.mkdirs()
+
+        if entries is None:
+            entries = self._viewEntries()
+        incremental = self._incrementalExportCheckbox.isSelected()
+        ExportWorker(
+            self,
+            directory,
+            entries,
+            filenameFunc,
+            writeFunc,
+            label,
+            kind if incremental else None,
+            incremental and self._removeStaleCheckbox.isSelected(),
+        ).execute()
+
     # Save the selected request as a YAML file
     def saveSelectedAsYaml(self):
         row = self._table.getSelectedRow()
         if row == -1:
             return
 
-        reqRes = self._filteredList.get(row)
-        url = self._tableModel.getValueAt(row, 2)
+        entry = self._entryAtRow(row)
 
-        filename = self._getYamlFilenameFromUrl(url)
+        filename = self._getYamlFilenameFromUrl(entry.url)
 
         fileChooser = JFileChooser()
         fileChooser.setSelectedFile(File(filename))
@@ -615,12 +1735,15 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
             file = fileChooser.getSelectedFile()
 
             try:
-                yamlContent = self._requestToYaml(reqRes)
-                fw = FileWriter(file)
-                fw.write(yamlContent)
-                fw.close()
+                out = BufferedOutputStream(FileOutputStream(file))
+                try:
+                    self._writeRequestYaml(
+                        entry, lambda data: out.write(toJavaBytes(data))
+                    )
+                finally:
+                    out.close()
             except Exception as e:
-                print("Error saving YAML request: {}".format(e))
+                self._metrics.reportError("Error saving YAML request", e)
 
     # Save all filtered requests as YAML files to a directory
     def saveAllAsYaml(self):
@@ -630,57 +1753,74 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         fileChooser = JFileChooser()
         fileChooser.setFileSelectionMode(JFileChooser.DIRECTORIES_ONLY)
         fileChooser.setDialogTitle("Select Directory to Save All YAML Requests")
+        fileChooser.setAccessory(self._exportOptionsPanel)
 
         result = fileChooser.showSaveDialog(self._mainPanel)
 
         if result == JFileChooser.APPROVE_OPTION:
-            directory = fileChooser.getSelectedFile()
+            self._exportAll(
+                fileChooser.getSelectedFile(),
+                lambda entry: self._getYamlFilenameFromUrl(entry.url),
+                lambda entry, out: self._writeRequestYaml(
+                    entry, lambda data: out.write(toJavaBytes(data))
+                ),
+                "YAML requests",
+                "yaml",
+            )
+
+    # Save all filtered requests into a single ZIP or JSON Lines archive
+    def saveAllAsArchive(self):
+        if self._filteredList.isEmpty():
+            return
 
-            if not directory.exists():
-                directory.mkdirs()
+        fileChooser = JFileChooser()
+        fileChooser.setDialogTitle("Save All Requests as Archive")
+        fileChooser.addChoosableFileFilter(
+            FileNameExtensionFilter("ZIP archive (*.zip)", ["zip"])
+        )
+        fileChooser.addChoosableFileFilter(
+            FileNameExtensionFilter("JSON Lines (*.jsonl)", ["jsonl"])
+        )
+        fileChooser.setSelectedFile(File("requests.zip"))
 
-            savedCount = 0
-            errorCount = 0
+        result = fileChooser.showSaveDialog(self._mainPanel)
 
-            for i in range(self._filteredList.size()):
-                try:
-                    reqRes = self._filteredList.get(i)
-                    url = self._tableModel.getValueAt(i, 2)
-
-                    filename = self._getYamlFilenameFromUrl(url)
-
-                    # Handle duplicate filenames
-                    baseFilename = filename
-                    counter = 1
-                    outputFile = File(directory, filename)
-
-                    while outputFile.exists():
-                        nameParts = baseFilename.rsplit(".", 1)
-                        if len(nameParts) > 1:
-                            filename = "{}-{}.{}".format(
-                                nameParts[0], counter, nameParts[1]
-                            )
-                        else:
-                            filename = "{}-{}".format(baseFilename, counter)
-
-                        outputFile = File(directory, filename)
-                        counter += 1
-
-                    yamlContent = self._requestToYaml(reqRes)
-                    fw = FileWriter(outputFile)
-                    fw.write(yamlContent)
-                    fw.close()
-
-                    savedCount += 1
-                except Exception as e:
-                    print("Error saving YAML request {}: {}".format(i, e))
-                    errorCount += 1
+        if result == JFileChooser.APPROVE_OPTION:
+            path = fileChooser.getSelectedFile().getAbsolutePath()
 
-            print(
-                "Saved {} YAML requests to {}. Errors: {}".format(
-                    savedCount, directory.getAbsolutePath(), errorCount
-                )
-            )
+            # The extension picks the format, ZIP is the default
+            if path.lower().endswith(".jsonl"):
+                writerClass = JsonLinesArchiveWriter
+            else:
+                writerClass = ZipArchiveWriter
+                if not path.lower().endswith(".zip"):
+                    path += ".zip"
+
+            ArchiveExportWorker(self, path, writerClass, self._viewEntries()).execute()
+
+    # Import the requests of a HAR file or a Burp "Save items" XML export
+    def importCapture(self):
+        fileChooser = JFileChooser()
+        fileChooser.setDialogTitle("Import HAR or Burp XML")
+        fileChooser.setFileFilter(
+            FileNameExtensionFilter("HAR or Burp XML (*.har, *.xml)", ["har", "xml"])
+        )
+        if fileChooser.showOpenDialog(self._mainPanel) == JFileChooser.APPROVE_OPTION:
+            self.importFile(fileChooser.getSelectedFile().getAbsolutePath())
+
+    # Import a capture file on a background worker
+    def importFile(self, path):
+        ImportWorker(self, path).execute()
+
+    # Wrap one imported item as an IHttpRequestResponse. Safe to call from
+    # background threads.
+    def _importedMessage(self, url, request, response):
+        protocol, host, port = urlEndpoint(url)
+        return ImportedMessage(
+            toJavaBytes(request),
+            toJavaBytes(response),
+            self._helpers.buildHttpService(host, port, protocol),
+        )
 
     # Add a new URI filter field
     def addUriFilter(self):
@@ -692,20 +1832,286 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
             filterPanel = self._mainPanel.getComponent(0)
             uriPanel = filterPanel.getComponent(2)
 
-            # Insert before the + button and Apply button
-            uriPanel.add(newFilter, uriPanel.getComponentCount() - 2)
+            # Insert before the + button, Apply button and progress bar
+            uriPanel.add(newFilter, uriPanel.getComponentCount() - 3)
 
             # Refresh UI
             uriPanel.revalidate()
             uriPanel.repaint()
 
+    # Render the selection once the debounce timer fires
+    def _scheduleViewerUpdate(self):
+        self._viewerTimer.restart()
+
+    # Show the selected entry in the viewers, truncated to the preview limit
+    def _showSelectedEntry(self):
+        row = self._table.getSelectedRow()
+        if row == -1:
+            return
+
+        if self._showPreview(self._entryAtRow(row)):
+            self._prefetchAround(row)
+
+    # Show an entry's preview in the viewers; False if it has no message
+    def _showPreview(self, entry):
+        preview = self._previewCache.get(entry)
+        if preview is None:
+            return False
+
+        self._showMessage(entry, preview.request, preview.response)
+        if preview.isTruncated():
+            self._viewerStatusLabel.setText(
+                "Showing the first {} KB of a {:.1f} KB request and {:.1f} KB"
+                " response".format(
+                    self._previewCache.limitBytes // 1024,
+                    preview.requestLength / 1024.0,
+                    preview.responseLength / 1024.0,
+                )
+            )
+            self._loadFullButton.setEnabled(True)
+        return True
+
+    # Show the sample request of the selected endpoint
+    def _showSelectedEndpoint(self):
+        row = self._endpointTable.getSelectedRow()
+        if row != -1:
+            self._showPreview(self._endpointIndex.groups[row].sample)
+
+    # Filter the Requests tab to the selected endpoint
+    def showEndpointRequests(self):
+        row = self._endpointTable.getSelectedRow()
+        if row == -1:
+            return
+        endpoint = self._endpointIndex.groups[row].key
+        term = 'endpoint="{}"'.format(
+            endpoint.replace("\\", "\\\\").replace('"', '\\"')
+        )
+
+        # Narrow the current query, replacing an endpoint term added earlier
+        query = ENDPOINT_TERM_PATTERN.sub("", self._queryField.getText()).strip()
+        self._queryField.setText("{} AND {}".format(query, term) if query else term)
+        self._tableTabs.setSelectedIndex(0)
+        self._applyFilters()
+
+    # Save the sample request of every endpoint as YAML to a directory
+    def saveOnePerEndpoint(self):
+        if not len(self._endpointIndex):
+            return
+
+        fileChooser = JFileChooser()
+        fileChooser.setFileSelectionMode(JFileChooser.DIRECTORIES_ONLY)
+        fileChooser.setDialogTitle("Select Directory to Save One Request per Endpoint")
+        fileChooser.setAccessory(self._exportOptionsPanel)
+
+        result = fileChooser.showSaveDialog(self._mainPanel)
+
+        if result == JFileChooser.APPROVE_OPTION:
+            self._exportAll(
+                fileChooser.getSelectedFile(),
+                lambda entry: endpointFilename(entry.endpoint, ".yaml"),
+                lambda entry, out: self._writeRequestYaml(
+                    entry, lambda data: out.write(toJavaBytes(data))
+                ),
+                "endpoint requests",
+                "endpoint-yaml",
+                [group.sample for group in self._endpointIndex.groups],
+            )
+
+    # Show the full messages of the entry in the viewers
+    def loadFullMessage(self):
+        entry = self._viewerEntry
+        if entry is None or entry.message is None:
+            return
+        self._showMessage(
+            entry, entry.message.getRequest(), entry.message.getResponse()
+        )
+
+    def _showMessage(self, entry, request=None, response=None):
+        startTime = time.time()
+        self._viewerEntry = entry
+        self._requestViewer.setMessage(request, True)
+        self._responseViewer.setMessage(response or None, False)
+        self._viewerStatusLabel.setText("")
+        self._loadFullButton.setEnabled(False)
+        self._metrics.record("viewer", time.time() - startTime)
+
+    # Load previews of the rows around the selection in the background,
+    # dropping any prefetch still queued for an earlier selection
+    def _prefetchAround(self, row):
+        if self._prefetchFuture is not None:
+            self._prefetchFuture.cancel(False)
+
+        entries = []
+        for distance in range(1, self.PREFETCH_ROWS + 1):
+            for neighbour in (row + distance, row - distance):
+                if 0 <= neighbour < self._filteredList.size():
+                    entry = self._entryAtRow(neighbour)
+                    if entry not in self._previewCache:
+                        entries.append(entry)
+
+        if entries:
+            self._prefetchFuture = self._prefetchExecutor.submit(
+                PrefetchRunnable(self._previewCache, entries, self._metrics)
+            )
+
+    # Read the preview limit from the UI
+    def _configurePreview(self):
+        try:
+            text = self._previewLimitField.getText().strip()
+            limitBytes = int(float(text) * 1024) if text else 0
+        except ValueError:
+            print("Invalid preview limit, expected a number")
+            return
+
+        if limitBytes != self._previewCache.limitBytes:
+            self._previewCache.limitBytes = limitBytes
+            self._previewCache.clear()
+            self._showSelectedEntry()
+
+    # Show or hide the stats panel
+    def setStatsVisible(self, visible):
+        self._statsPanel.setVisible(visible)
+        if visible:
+            self._refreshStats()
+            self._statsTimer.start()
+        else:
+            self._statsTimer.stop()
+        self._mainPanel.revalidate()
+
+    # Metrics with the current size of the collection
+    def _statsSnapshot(self):
+        return self._metrics.snapshot(
+            {
+                "entries": self._requestList.size(),
+                "filteredRows": self._filteredList.size(),
+                "storedMessages": self._store.count,
+                "bytesHeld": self._store.heldBytes,
+                "bodyIndexPending": self._bodyIndex.pendingCount(),
+                "bodyIndexPostings": self._bodyIndex.postingCount(),
+                "liveQueued": self._liveCapture.queued(),
+            }
+        )
+
+    def _refreshStats(self):
+        self._statsText.setText(self._formatStats(self._statsSnapshot()))
+        self._statsText.setCaretPosition(0)
+
+    # Render a snapshot as a phase table, a latency histogram per phase and
+    # the counters
+    def _formatStats(self, snapshot):
+        lines = [
+            "{:<8}{:>7}{:>9}{:>9}{:>9}{:>9}".format(
+                "Phase", "runs", "mean", "p50", "p95", "max"
+            )
+        ]
+        for phase in Metrics.PHASES:
+            stats = snapshot["phases"][phase]
+            lines.append(
+                "{:<8}{:>7}{}".format(
+                    phase,
+                    stats["count"],
+                    "".join(
+                        "{:>9}".format(
+                            "-" if stats[key] is None else "{:.1f}".format(stats[key])
+                        )
+                        for key in ("meanMs", "p50Ms", "p95Ms", "maxMs")
+                    ),
+                )
+            )
+        lines.append(
+            "ms; mean and max since loading, percentiles over the last"
+            " {} runs".format(LatencyHistogram.WINDOW)
+        )
+
+        bucketLabels = [
+            str(bound) if bound < 1000 else "{}s".format(bound // 1000)
+            for bound in snapshot["boundsMs"]
+        ]
+        bucketLabels.append(">")
+        lines.append("")
+        lines.append(
+            "{:<8}{}".format(
+                "<= ms", "".join("{:>5}".format(label) for label in bucketLabels)
+            )
+        )
+        for phase in Metrics.PHASES:
+            lines.append(
+                "{:<8}{}".format(
+                    phase,
+                    "".join(
+                        "{:>5}".format(count or ".")
+                        for count in snapshot["phases"][phase]["buckets"]
+                    ),
+                )
+            )
+
+        gauges = snapshot["gauges"]
+        counters = snapshot["counters"]
+        megabyte = 1024.0 * 1024.0
+        lines.append("")
+        for label, value in (
+            ("Requests held", gauges["entries"]),
+            ("Filtered rows", gauges["filteredRows"]),
+            ("Stored messages", gauges["storedMessages"]),
+            ("MB held in memory", "{:.1f}".format(gauges["bytesHeld"] / megabyte)),
+            ("Body index queue", gauges["bodyIndexPending"]),
+            ("Body index postings", gauges["bodyIndexPostings"]),
+            ("Live capture queue", gauges["liveQueued"]),
+            ("Requests parsed", counters["requestsParsed"]),
+            ("Requests exported", counters["requestsExported"]),
+            ("MB exported", "{:.1f}".format(counters["bytesExported"] / megabyte)),
+            ("Errors", counters["errors"]),
+        ):
+            lines.append("{:<20}{:>12}".format(label, value))
+        return "\n".join(lines)
+
+    # Start appending stats snapshots to a file, or stop if already dumping
+    def toggleStatsDump(self):
+        if self._statsDumpPath is not None:
+            self.stopStatsDump()
+            return
+
+        try:
+            intervalSeconds = float(self._statsDumpIntervalField.getText().strip())
+        except ValueError:
+            print("Invalid stats dump interval, expected a number of seconds")
+            return
+
+        fileChooser = JFileChooser()
+        fileChooser.setDialogTitle("Append Stats Snapshots to File")
+        fileChooser.setSelectedFile(File("request-filter-stats.jsonl"))
+        if fileChooser.showSaveDialog(self._mainPanel) != JFileChooser.APPROVE_OPTION:
+            return
+
+        self._statsDumpPath = fileChooser.getSelectedFile().getAbsolutePath()
+        intervalMs = max(int(intervalSeconds * 1000), 1000)
+        self._statsDumpTimer.setDelay(intervalMs)
+        self._statsDumpTimer.setInitialDelay(intervalMs)
+        self._statsDumpTimer.start()
+        self._statsDumpButton.setText("Stop Dumping")
+        self._dumpStats()
+
+    def stopStatsDump(self):
+        self._statsDumpTimer.stop()
+        self._statsDumpPath = None
+        self._statsDumpButton.setText("Dump to File...")
+
+    def _dumpStats(self):
+        if self._statsDumpPath is None:
+            return
+        try:
+            appendMetrics(self._statsDumpPath, self._statsSnapshot())
+        except Exception as e:
+            self._metrics.reportError("Error writing stats", e)
+            self.stopStatsDump()
+
     # Navigate to next/previous request
     def navigateRequest(self, direction):
         # Get current selection
         row = self._table.getSelectedRow()
         if row == -1:
             # If nothing selected, select first row if navigating forward
-            if direction > 0 and self._tableModel.getRowCount() > 0:
+            if direction > 0 and self._table.getRowCount() > 0:
                 self._table.setRowSelectionInterval(0, 0)
             return
 
@@ -713,7 +2119,7 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         newRow = row + direction
 
         # Check bounds
-        if 0 <= newRow < self._tableModel.getRowCount():
+        if 0 <= newRow < self._table.getRowCount():
             # Select new row
             self._table.setRowSelectionInterval(newRow, newRow)
 
@@ -727,6 +2133,15 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
     def getUiComponent(self):
         return self._mainPanel
 
+    # Implement IExtensionStateListener
+    def extensionUnloaded(self):
+        self.stopStatsDump()
+        self._statsTimer.stop()
+        self._liveCapture.stop()
+        self._bodyIndex.shutdown()
+        self._viewerTimer.stop()
+        self._prefetchExecutor.shutdownNow()
+
     # Implement IContextMenuFactory
     def createMenuItems(self, invocation):
         # Create a list to hold menu items
@@ -749,6 +2164,762 @@ class BurpExtender(IBurpExtender, ITab, IContextMenuFactory):
         return menuItems
 
 
+# Table model that reads rows lazily from the filtered entries
+class RequestTableModel(AbstractTableModel):
+    COLUMNS = ["ID", "Method", "URL", "Status", "Length", "Hits"]
+
+    def __init__(self, extender):
+        self._extender = extender
+
+    def getRowCount(self):
+        return self._extender._filteredList.size()
+
+    def getColumnCount(self):
+        return len(self.COLUMNS)
+
+    def getColumnName(self, column):
+        return self.COLUMNS[column]
+
+    def getValueAt(self, row, column):
+        entry = self._extender._entryAtRow(row)
+        if column == 0:
+            return entry.id
+        if column == 1:
+            return entry.method
+        if column == 2:
+            return entry.url
+        # Response info is empty if there was no response
+        if column == 3:
+            return "" if entry.status is None else entry.status
+        if column == 4:
+            return "" if entry.length is None else entry.length
+        if column == 5:
+            return entry.hits
+        return ""
+
+
+# Table model with one row per endpoint group of the filtered entries
+class EndpointTableModel(AbstractTableModel):
+    COLUMNS = ["Method", "Host", "Endpoint", "Requests", "Statuses", "Sample URL"]
+
+    def __init__(self, extender):
+        self._extender = extender
+
+    def getRowCount(self):
+        return len(self._extender._endpointIndex)
+
+    def getColumnCount(self):
+        return len(self.COLUMNS)
+
+    def getColumnName(self, column):
+        return self.COLUMNS[column]
+
+    def getValueAt(self, row, column):
+        group = self._extender._endpointIndex.groups[row]
+        if column == 0:
+            return group.method
+        if column == 1:
+            return group.host
+        if column == 2:
+            return group.template
+        if column == 3:
+            return len(group)
+        if column == 4:
+            return group.statusSummary()
+        if column == 5:
+            return group.sample.url
+        return ""
+
+
+# Matches from one chunk of a filter run and the number of entries scanned
+class FilterChunk(object):
+    __slots__ = ("entries", "processed")
+
+    def __init__(self, entries, processed):
+        self.entries = entries
+        self.processed = processed
+
+
+# Background filter run over a snapshot of the collected entries. Matches
+# are published in chunks and only touch the table on the EDT.
+class FilterWorker(SwingWorker):
+    CHUNK_SIZE = 2000
+
+    def __init__(self, extender, requestFilter, entries):
+        SwingWorker.__init__(self)
+        self._extender = extender
+        self._filter = requestFilter
+        self._entries = entries
+        self.total = len(entries)
+        self.swapped = False  # set on the EDT once the visible list is replaced
+        self.rescan = False  # set on the EDT when hit counts changed meanwhile
+        self.startTime = time.time()
+
+    def doInBackground(self):
+        try:
+            matches = self._filter.matches
+
+            # Body searches only verify the candidates from the body index
+            candidateIds = self._filter.query.candidateIds(self._extender._bodyIndex)
+            if candidateIds is not None:
+                verify = matches
+                matches = lambda entry: entry.id in candidateIds and verify(entry)
+
+            for start in range(0, self.total, self.CHUNK_SIZE):
+                if self.isCancelled():
+                    return None
+
+                end = min(start + self.CHUNK_SIZE, self.total)
+                self.publish(
+                    FilterChunk(
+                        [entry for entry in self._entries[start:end] if matches(entry)],
+                        end,
+                    )
+                )
+        except Exception as e:
+            self._extender._metrics.reportError("Error filtering requests", e)
+        return None
+
+    def process(self, chunks):
+        for chunk in chunks:
+            self._extender._publishFilterChunk(self, chunk.entries, chunk.processed)
+
+    def done(self):
+        if not self.isCancelled():
+            self._extender._finishFilterRun(self)
+
+
+# Live capture of completed request/response pairs. Burp's traffic threads
+# only offer messages to a bounded queue and never block; when the queue is
+# full the newest message is dropped and counted. A consumer thread parses
+# and filters the queued messages and hands them to the EDT in coalesced
+# batches, at most MAX_REFRESHES_PER_SECOND times per second.
+class LiveCapture(IHttpListener):
+    QUEUE_CAPACITY = 10000
+    MAX_REFRESHES_PER_SECOND = 4
+    POLL_TIMEOUT_MS = 250
+
+    def __init__(self, extender):
+        self._extender = extender
+        self._queue = ArrayBlockingQueue(self.QUEUE_CAPACITY)
+        self._thread = None
+        self._running = False
+        self.allTools = False  # capture from every tool, not only the proxy
+        self.captured = AtomicLong()
+        self.dropped = AtomicLong()
+
+    def isRunning(self):
+        return self._running
+
+    def queued(self):
+        return self._queue.size()
+
+    def start(self, allTools):
+        self.allTools = allTools
+        if self._running:
+            return
+        self._running = True
+        self._extender._callbacks.registerHttpListener(self)
+
+        self._thread = threading.Thread(target=self._consume)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._extender._callbacks.removeHttpListener(self)
+        self._queue.clear()
+
+    # Implement IHttpListener. Runs on Burp's traffic threads.
+    def processHttpMessage(self, toolFlag, messageIsRequest, messageInfo):
+        if messageIsRequest or not self._running:
+            return
+        if toolFlag != IBurpExtenderCallbacks.TOOL_PROXY and not self.allTools:
+            return
+
+        if self._queue.offer(messageInfo):
+            self.captured.incrementAndGet()
+        else:
+            self.dropped.incrementAndGet()
+
+    def _consume(self):
+        minInterval = 1.0 / self.MAX_REFRESHES_PER_SECOND
+
+        # A consumer from an earlier start exits once it has been replaced
+        while self._running and threading.current_thread() is self._thread:
+            try:
+                first = self._queue.poll(self.POLL_TIMEOUT_MS, TimeUnit.MILLISECONDS)
+                if first is None:
+                    continue
+
+                batchStart = time.time()
+
+                messages = ArrayList()
+                messages.add(first)
+                self._queue.drainTo(messages)
+
+                requestFilter = self._extender._activeFilter
+                entries, matchedEntries, sources = self._extender._parseEntries(
+                    messages, requestFilter
+                )
+                SwingUtilities.invokeLater(
+                    LiveBatchRunnable(
+                        self._extender, entries, matchedEntries, requestFilter, sources
+                    )
+                )
+
+                # Let messages accumulate until the next refresh is allowed
+                remaining = minInterval - (time.time() - batchStart)
+                if remaining > 0:
+                    time.sleep(remaining)
+            except Exception as e:
+                self._extender._metrics.reportError("Error in live capture", e)
+
+
+# Applies one batch of live-captured entries on the EDT
+class LiveBatchRunnable(Runnable):
+    def __init__(self, extender, entries, matchedEntries, requestFilter, sources):
+        self._extender = extender
+        self._entries = entries
+        self._matchedEntries = matchedEntries
+        self._filter = requestFilter
+        self._sources = sources
+
+    def run(self):
+        self._extender._ingestEntries(
+            self._entries, self._matchedEntries, self._filter, sources=self._sources
+        )
+        self._extender._updateLiveStatus()
+
+
+# Loads viewer previews of the rows around the selection
+class PrefetchRunnable(Runnable):
+    def __init__(self, previewCache, entries, metrics):
+        self._previewCache = previewCache
+        self._entries = entries
+        self._metrics = metrics
+
+    def run(self):
+        for entry in self._entries:
+            try:
+                self._previewCache.get(entry)
+            except Exception as e:
+                self._metrics.reportError("Error prefetching request", e)
+
+
+# Indexes one batch of collected entries on the body index thread
+class BodyIndexRunnable(Runnable):
+    def __init__(self, bodyIndex, entries, messages, metrics):
+        self._bodyIndex = bodyIndex
+        self._entries = entries
+        self._messages = messages
+        self._metrics = metrics
+
+    def run(self):
+        try:
+            self._bodyIndex.indexEntries(self._entries, self._messages)
+        except Exception as e:
+            self._metrics.reportError("Error indexing request bodies", e)
+
+
+# Output stream wrapper that counts the bytes written through it
+class CountingOutputStream(object):
+    def __init__(self, stream):
+        self._stream = stream
+        self.count = 0
+
+    def write(self, data):
+        self._stream.write(data)
+        self.count += len(data)
+
+    def close(self):
+        self._stream.close()
+
+
+# Bulk export of entries to one file each. Filenames are allocated up
+# front, then slices of the entries are written on a bounded thread pool
+# while a progress monitor shows progress and offers a cancel button. An
+# incremental export (manifestKind set) keeps an ExportManifest in the
+# directory, reuses the recorded filenames and only writes files whose
+# content hash changed.
+class ExportWorker(SwingWorker):
+    MAX_THREADS = 8
+    SLICE_SIZE = 500
+    POLL_INTERVAL_MS = 200
+
+    def __init__(
+        self,
+        extender,
+        directory,
+        entries,
+        filenameFunc,
+        writeFunc,
+        label,
+        manifestKind=None,
+        removeStale=False,
+    ):
+        SwingWorker.__init__(self)
+        self._extender = extender
+        self._directory = directory
+        self._entries = entries
+        self._filenameFunc = filenameFunc
+        self._writeFunc = writeFunc
+        self._label = label
+        self._manifestKind = manifestKind
+        self._removeStale = removeStale
+        self._manifest = None
+        self._keys = []
+        self._hashes = []
+        self._filenames = []
+        self._processed = AtomicInteger()
+        self._saved = AtomicInteger()
+        self._unchanged = AtomicInteger()
+        self._removed = 0
+        self._errors = AtomicInteger()
+        self._bytesWritten = AtomicLong()
+        self._startTime = time.time()
+
+        self._monitor = ProgressMonitor(
+            extender._mainPanel,
+            "Saving {} {}".format(len(entries), label),
+            None,
+            0,
+            len(entries),
+        )
+        self._monitor.setMillisToDecideToPopup(200)
+
+    def doInBackground(self):
+        existingNames = self._directory.list() or []
+        if self._manifestKind is None:
+            self._filenames = allocateFilenames(
+                [self._filenameFunc(entry) for entry in self._entries],
+                existingNames,
+            )
+        else:
+            self._manifest = ExportManifest(
+                self._directory.getAbsolutePath(), self._manifestKind, existingNames
+            )
+            # Repeated identical requests would write the same file. Entries
+            # evicted since the export started count as errors, as they do
+            # when written.
+            entries = []
+            for i, entry in enumerate(self._entries):
+                try:
+                    key = exportKey(
+                        entry.method,
+                        entry.url,
+                        toByteString(entry.message.getRequest()),
+                    )
+                except Exception as e:
+                    self._extender._metrics.reportError(
+                        "Error saving {} {}".format(self._label, i), e
+                    )
+                    self._errors.incrementAndGet()
+                    self._processed.incrementAndGet()
+                    continue
+                filename = self._manifest.add(key, self._filenameFunc(entry))
+                if filename is not None:
+                    entries.append(entry)
+                    self._keys.append(key)
+                    self._filenames.append(filename)
+            self._entries = entries
+            self._hashes = [None] * len(entries)
+
+        threadCount = min(
+            self.MAX_THREADS, max(1, Runtime.getRuntime().availableProcessors())
+        )
+        pool = Executors.newFixedThreadPool(threadCount)
+        try:
+            for start in range(0, len(self._entries), self.SLICE_SIZE):
+                end = min(start + self.SLICE_SIZE, len(self._entries))
+                pool.submit(ExportSliceRunnable(self, start, end))
+            pool.shutdown()
+
+            while not pool.awaitTermination(
+                self.POLL_INTERVAL_MS, TimeUnit.MILLISECONDS
+            ):
+                self.publish(self._processed.get())
+        finally:
+            # Slices stop at their next cancel check; wait for them so the
+            # summary counts every file that was written
+            pool.shutdownNow()
+            while not pool.awaitTermination(
+                self.POLL_INTERVAL_MS, TimeUnit.MILLISECONDS
+            ):
+                pass
+
+        if self._manifest is not None:
+            self._updateManifest()
+        self._report()
+        return None
+
+    # Record the written files and drop stale ones. A cancelled export keeps
+    # the other records, as it didn't visit every entry.
+    def _updateManifest(self):
+        for key, filename, digest in zip(self._keys, self._filenames, self._hashes):
+            if digest is not None:
+                self._manifest.update(key, filename, digest)
+
+        if self._removeStale and not self.isCancelled():
+            for filename in self._manifest.removeStale():
+                if File(self._directory, filename).delete():
+                    self._removed += 1
+
+        try:
+            self._manifest.save()
+        except Exception as e:
+            self._extender._metrics.reportError("Error saving export manifest", e)
+
+    # Write entries [start, end) to their files. Runs on the pool threads.
+    def exportSlice(self, start, end):
+        for i in range(start, end):
+            if self.isCancelled():
+                return
+            try:
+                if self._manifest is None:
+                    self._writeFile(
+                        self._filenames[i],
+                        lambda out: self._writeFunc(self._entries[i], out),
+                    )
+                else:
+                    self._exportIfChanged(i)
+                self._saved.incrementAndGet()
+            except Exception as e:
+                self._extender._metrics.reportError(
+                    "Error saving {} {}".format(self._label, i), e
+                )
+                self._errors.incrementAndGet()
+            self._processed.incrementAndGet()
+
+    def _writeFile(self, filename, write):
+        out = CountingOutputStream(
+            BufferedOutputStream(FileOutputStream(File(self._directory, filename)))
+        )
+        try:
+            write(out)
+        finally:
+            out.close()
+            self._bytesWritten.addAndGet(out.count)
+
+    # Serialize an entry in memory and only write it when its hash differs
+    # from the manifest's or the file is gone
+    def _exportIfChanged(self, i):
+        buffer = ByteArrayOutputStream()
+        self._writeFunc(self._entries[i], buffer)
+        data = buffer.toByteArray()
+        digest = contentHash(toByteString(data))
+        self._hashes[i] = digest
+
+        filename = self._filenames[i]
+        if self._manifest.isCurrent(self._keys[i], filename, digest):
+            self._unchanged.incrementAndGet()
+        else:
+            self._writeFile(filename, lambda out: out.write(data))
+
+    def process(self, chunks):
+        self._monitor.setProgress(chunks.get(chunks.size() - 1))
+        if self._monitor.isCanceled():
+            self.cancel(False)
+
+    # A cancelled SwingWorker runs done() right away, while slices may still
+    # be writing, so the summary is reported by doInBackground
+    def done(self):
+        self._monitor.close()
+
+    def _report(self):
+        metrics = self._extender._metrics
+        metrics.record("export", time.time() - self._startTime)
+        metrics.count("requestsExported", self._saved.get())
+        metrics.count("bytesExported", self._bytesWritten.get())
+        unchanged = ""
+        if self._manifestKind is not None:
+            unchanged = " ({} unchanged, {} stale files removed)".format(
+                self._unchanged.get(), self._removed
+            )
+        print(
+            "Saved {} {} to {}{}. Errors: {}{}".format(
+                self._saved.get(),
+                self._label,
+                self._directory.getAbsolutePath(),
+                unchanged,
+                self._errors.get(),
+                " (cancelled)" if self.isCancelled() else "",
+            )
+        )
+
+
+# Export of entries into a single archive in one sequential write. Only
+# one request is held in memory at a time.
+class ArchiveExportWorker(SwingWorker):
+    def __init__(self, extender, path, writerClass, entries):
+        SwingWorker.__init__(self)
+        self._extender = extender
+        self._path = path
+        self._writerClass = writerClass
+        self._entries = entries
+        self._saved = 0
+        self._errors = 0
+        self._startTime = time.time()
+
+        self._monitor = ProgressMonitor(
+            extender._mainPanel,
+            "Saving {} requests to archive".format(len(entries)),
+            None,
+            0,
+            len(entries),
+        )
+        self._monitor.setMillisToDecideToPopup(200)
+
+    def doInBackground(self):
+        filenames = allocateFilenames(
+            [self._extender._getFilenameFromUrl(entry.url) for entry in self._entries],
+            [],
+        )
+
+        writer = self._writerClass(self._path)
+        try:
+            for i, entry in enumerate(self._entries):
+                if self.isCancelled():
+                    break
+                try:
+                    writer.add(
+                        filenames[i],
+                        toByteString(entry.message.getRequest()),
+                        {
+                            "id": entry.id,
+                            "method": entry.method,
+                            "url": entry.url,
+                            "status": entry.status,
+                            "length": entry.length,
+                        },
+                    )
+                    self._saved += 1
+                except Exception as e:
+                    self._extender._metrics.reportError(
+                        "Error archiving request {}".format(i), e
+                    )
+                    self._errors += 1
+                self.publish(i + 1)
+        finally:
+            writer.close()
+        self._report()
+        return None
+
+    def process(self, chunks):
+        self._monitor.setProgress(chunks.get(chunks.size() - 1))
+        if self._monitor.isCanceled():
+            self.cancel(False)
+
+    # A cancelled SwingWorker runs done() right away, before the archive is
+    # closed, so the summary is reported by doInBackground
+    def done(self):
+        self._monitor.close()
+
+    def _report(self):
+        metrics = self._extender._metrics
+        metrics.record("export", time.time() - self._startTime)
+        metrics.count("requestsExported", self._saved)
+        metrics.count("bytesExported", File(self._path).length())
+        print(
+            "Saved {} requests to {}. Errors: {}{}".format(
+                self._saved,
+                self._path,
+                self._errors,
+                " (cancelled)" if self.isCancelled() else "",
+            )
+        )
+
+
+# Loads the metadata of a project database page by page. Bodies stay in
+# the database, and each page is shown as soon as it has been read.
+class DatabaseLoadWorker(SwingWorker):
+    PAGE_SIZE = 5000
+
+    def __init__(self, extender, database):
+        SwingWorker.__init__(self)
+        self._extender = extender
+        self._database = database
+        self._loaded = 0
+
+    def doInBackground(self):
+        try:
+            lastId = -1
+            while not self.isCancelled() and self._extender._database is self._database:
+                rows = self._database.loadPage(lastId, self.PAGE_SIZE)
+                if not rows:
+                    break
+
+                entries = [self._database.entryFromRow(row) for row in rows]
+                lastId = entries[-1].id
+
+                requestFilter = self._extender._activeFilter
+                self.publish(
+                    LoadedPage(
+                        entries,
+                        [entry for entry in entries if requestFilter.matches(entry)],
+                        requestFilter,
+                    )
+                )
+        except Exception as e:
+            self._extender._metrics.reportError("Error loading the project DB", e)
+        return None
+
+    def process(self, chunks):
+        for page in chunks:
+            # The database may have been closed while pages were queued
+            if self._extender._database is not self._database:
+                return
+            self._extender._store.adopt(len(page.entries))
+            self._extender._ingestEntries(
+                page.entries, page.matchedEntries, page.requestFilter, False
+            )
+            self._loaded += len(page.entries)
+
+    def done(self):
+        print("Loaded {} requests from {}".format(self._loaded, self._database.path))
+
+
+# Counts the bytes read through a file object, for import progress
+class CountingStream(object):
+    def __init__(self, stream):
+        self._stream = stream
+        self.position = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.position += len(data)
+        return data
+
+
+# Import of a HAR or Burp XML file. Items are parsed incrementally on the
+# worker thread and parsed into entries in batches. The worker waits until
+# the EDT has ingested each batch, so memory stays flat however large the
+# file is.
+class ImportWorker(SwingWorker):
+    BATCH_SIZE = 500
+    PROGRESS_MAX = 1000
+
+    def __init__(self, extender, path):
+        SwingWorker.__init__(self)
+        self._extender = extender
+        self._path = path
+        self._size = max(File(path).length(), 1)
+        self.imported = 0
+
+        # The monitor is only read on the EDT, which copies its cancel state
+        # here for the worker thread
+        self._cancelled = AtomicBoolean(False)
+
+        self._monitor = ProgressMonitor(
+            extender._mainPanel,
+            "Importing {}".format(File(path).getName()),
+            None,
+            0,
+            self.PROGRESS_MAX,
+        )
+        self._monitor.setMillisToDecideToPopup(200)
+
+    def doInBackground(self):
+        captureFile = open(self._path, "rb")
+        stream = CountingStream(captureFile)
+        try:
+            messages = []
+            for url, request, response in iterCaptureItems(stream):
+                if self._cancelled.get():
+                    return None
+
+                messages.append(self._extender._importedMessage(url, request, response))
+                if len(messages) == self.BATCH_SIZE:
+                    self._ingest(messages, stream.position)
+                    messages = []
+
+            if messages:
+                self._ingest(messages, stream.position)
+        except Exception as e:
+            self._extender._metrics.reportError(
+                "Error importing {}".format(self._path), e
+            )
+        finally:
+            captureFile.close()
+        return None
+
+    def _ingest(self, messages, position):
+        requestFilter = self._extender._activeFilter
+        entries, matchedEntries, sources = self._extender._parseEntries(
+            messages, requestFilter
+        )
+        SwingUtilities.invokeAndWait(
+            ImportBatchRunnable(
+                self,
+                entries,
+                matchedEntries,
+                requestFilter,
+                sources,
+                position * self.PROGRESS_MAX // self._size,
+            )
+        )
+
+    # Called on the EDT by ImportBatchRunnable
+    def ingestBatch(self, entries, matchedEntries, requestFilter, sources, progress):
+        self._extender._ingestEntries(
+            entries, matchedEntries, requestFilter, sources=sources
+        )
+        self.imported += len(entries)
+        self._monitor.setProgress(progress)
+        self._monitor.setNote("{} requests".format(self.imported))
+        if self._monitor.isCanceled():
+            self._cancelled.set(True)
+
+    def done(self):
+        self._monitor.close()
+        print("Imported {} requests from {}".format(self.imported, self._path))
+
+
+# Applies one batch of imported entries on the EDT
+class ImportBatchRunnable(Runnable):
+    def __init__(
+        self, worker, entries, matchedEntries, requestFilter, sources, progress
+    ):
+        self._worker = worker
+        self._entries = entries
+        self._matchedEntries = matchedEntries
+        self._filter = requestFilter
+        self._sources = sources
+        self._progress = progress
+
+    def run(self):
+        self._worker.ingestBatch(
+            self._entries,
+            self._matchedEntries,
+            self._filter,
+            self._sources,
+            self._progress,
+        )
+
+
+# One page of entries read from the project database
+class LoadedPage(object):
+    __slots__ = ("entries", "matchedEntries", "requestFilter")
+
+    def __init__(self, entries, matchedEntries, requestFilter):
+        self.entries = entries
+        self.matchedEntries = matchedEntries
+        self.requestFilter = requestFilter
+
+
+# Runs one slice of an export on a pool thread
+class ExportSliceRunnable(Runnable):
+    def __init__(self, worker, start, end):
+        self._worker = worker
+        self._start = start
+        self._end = end
+
+    def run(self):
+        self._worker.exportSlice(self._start, self._end)
+
+
 # Listener for filter button
 class FilterListener(ActionListener):
     def __init__(self, extender):
@@ -765,19 +2936,121 @@ class TableSelectionListener(ListSelectionListener):
 
     def valueChanged(self, e):
         if not e.getValueIsAdjusting():
-            row = self._extender._table.getSelectedRow()
-            if row != -1:
-                # Get the request response object
-                reqRes = self._extender._filteredList.get(row)
+            self._extender._scheduleViewerUpdate()
 
-                # Update request/response viewers
-                self._extender._requestViewer.setMessage(reqRes.getRequest(), True)
 
-                response = reqRes.getResponse()
-                if response:
-                    self._extender._responseViewer.setMessage(response, False)
-                else:
-                    self._extender._responseViewer.setMessage(None, False)
+# Listener for the viewer debounce timer
+class ViewerTimerListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender._showSelectedEntry()
+
+
+# Listener for the load full message button
+class LoadFullMessageListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.loadFullMessage()
+
+
+# Listener for the preview limit field
+class PreviewLimitListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender._configurePreview()
+
+
+# Listener for selection in the Endpoints table
+class EndpointSelectionListener(ListSelectionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def valueChanged(self, e):
+        if not e.getValueIsAdjusting():
+            self._extender._showSelectedEndpoint()
+
+
+# Listener for the Show Requests button of the Endpoints tab
+class ShowEndpointRequestsListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.showEndpointRequests()
+
+
+# Listener for the Save One per Endpoint button
+class SaveEndpointsListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.saveOnePerEndpoint()
+
+
+# Listener for switching between the Requests and Endpoints tabs
+class TableTabListener(ChangeListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def stateChanged(self, e):
+        self._extender.setEndpointsActive(e.getSource().getSelectedIndex() == 1)
+
+
+# Listener for the stats panel toggle
+class StatsToggleListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.setStatsVisible(self._extender._statsButton.isSelected())
+
+
+# Listener for the stats panel refresh timer
+class StatsTimerListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender._refreshStats()
+
+
+# Listener for the stats dump button
+class StatsDumpListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.toggleStatsDump()
+
+
+# Listener for the stats dump timer
+class StatsDumpTimerListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender._dumpStats()
+
+
+# Listener for clicks on the table header
+class SortHeaderListener(MouseAdapter):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def mouseClicked(self, e):
+        table = self._extender._table
+        column = table.columnAtPoint(e.getPoint())
+        if column != -1:
+            self._extender.sortByColumn(
+                table.convertColumnIndexToModel(column), e.isShiftDown()
+            )
 
 
 # Listener for save button
@@ -814,17 +3087,30 @@ class SaveAllYamlListener(ActionListener):
         self._extender.saveAllAsYaml()
 
 
+class SaveArchiveListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.saveAllAsArchive()
+
+
+# Listener for the import button
+class ImportListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.importCapture()
+
+
 # Listener for clear button
 class ClearListener(ActionListener):
     def __init__(self, extender):
         self._extender = extender
 
     def actionPerformed(self, e):
-        self._extender._requestList.clear()
-        self._extender._filteredList.clear()
-        self._extender._updateTable()
-        self._extender._requestViewer.setMessage(None, True)
-        self._extender._responseViewer.setMessage(None, False)
+        self._extender.clearRequests()
 
 
 # Listener for "Send to Filter" context menu
@@ -834,8 +3120,7 @@ class SendToFilterListener(ActionListener):
         self._messages = messages
 
     def actionPerformed(self, e):
-        for message in self._messages:
-            self._extender.addRequest(message)
+        self._extender.sendToFilter(self._messages)
 
 
 # Listener for the Add URI Filter button
@@ -847,6 +3132,42 @@ class AddUriFilterListener(ActionListener):
         self._extender.addUriFilter()
 
 
+# Listener for the live capture checkbox
+class LiveCaptureToggleListener(ItemListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def itemStateChanged(self, e):
+        self._extender.setLiveCapture(e.getStateChange() == ItemEvent.SELECTED)
+
+
+# Listener for the live capture scope selector
+class LiveScopeListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.updateLiveScope()
+
+
+# Listener for the storage mode and limit fields
+class StorageSettingsListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender._configureStore()
+
+
+# Listener for the project DB button
+class DatabaseListener(ActionListener):
+    def __init__(self, extender):
+        self._extender = extender
+
+    def actionPerformed(self, e):
+        self._extender.toggleDatabase()
+
+
 # Listener for navigation buttons
 class NavigationListener(ActionListener):
     def __init__(self, extender, direction):
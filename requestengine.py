@@ -0,0 +1,2486 @@
+# Request Filter engine: request parsing, filter evaluation, indexes and
+# export formats shared by the Burp extension (requestcollector.py) and the
+# headless command line. Nothing here depends on Burp, Java or Swing, so it
+# runs under Jython inside Burp and under CPython on its own:
+#
+#   python requestengine.py capture.har --query "status:5xx" --format yaml -o out/
+#
+# Run with --help for every option.
+
+import array
+import base64
+import binascii
+import bisect
+import codecs
+import collections
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from xml.etree import ElementTree
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+# Filter choices offered by the UI; the command line uses the same defaults
+HTTP_METHODS = ["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS", "PATCH"]
+STATIC_FILE_TYPES = ["js", "gif", "jpg", "png", "css"]
+
+
+# Extract the lowercased file extension from a URL path ("" if there is none)
+def getPathExtension(path):
+    lastSegment = path.rsplit("/", 1)[-1]
+    dotIdx = lastSegment.rfind(".")
+    if dotIdx == -1:
+        return ""
+    return lastSegment[dotIdx + 1 :].lower()
+
+
+# Convert a Java byte[] (array('b') in Jython) to a Python byte string
+def toByteString(data):
+    if data is None or isinstance(data, bytes):
+        return data
+    if hasattr(data, "tobytes"):
+        return data.tobytes()
+    return data.tostring()
+
+
+# Convert a Python byte string to something Java accepts as a byte[]
+def toJavaBytes(data):
+    if data is None:
+        return None
+    return array.array("b", data)
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+# Protocol, host and port of an absolute URL, with the default port filled in
+def urlEndpoint(urlString):
+    url = urlsplit(urlString)
+    protocol = url.scheme.lower()
+    port = url.port if url.port is not None else DEFAULT_PORTS.get(protocol, 80)
+    return protocol, url.hostname or "", port
+
+
+# Fingerprint used to detect duplicate requests: method, normalized URL,
+# sorted query parameter names and a hash of the request body
+def requestFingerprint(method, protocol, host, port, path, query, body):
+    paramNames = sorted(
+        set(param.split("=", 1)[0] for param in (query or "").split("&") if param)
+    )
+    protocol = protocol.lower()
+    if port is None or port == -1:
+        port = DEFAULT_PORTS.get(protocol, -1)
+    normalizedUrl = u"{}://{}:{}{}?{}".format(
+        protocol, host.lower(), port, path or "/", "&".join(paramNames)
+    )
+
+    digest = hashlib.sha1()
+    digest.update(u"{} {}\n".format(method, normalizedUrl).encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+# Hands out unique filenames by adding -N suffixes. Names already present in
+# the target directory come from a single listing, so no file is probed.
+class FilenameAllocator(object):
+    def __init__(self, existingNames=()):
+        self._usedNames = set(existingNames)
+        self._nextCounters = {}
+
+    def allocate(self, baseName):
+        filename = baseName
+        if filename in self._usedNames:
+            nameParts = baseName.rsplit(".", 1)
+            counter = self._nextCounters.get(baseName, 1)
+            while filename in self._usedNames:
+                if len(nameParts) > 1:
+                    filename = "{}-{}.{}".format(nameParts[0], counter, nameParts[1])
+                else:
+                    filename = "{}-{}".format(baseName, counter)
+                counter += 1
+            self._nextCounters[baseName] = counter
+
+        self._usedNames.add(filename)
+        return filename
+
+
+# Make a list of filenames unique against each other and existing names
+def allocateFilenames(baseNames, existingNames):
+    allocator = FilenameAllocator(existingNames)
+    return [allocator.allocate(baseName) for baseName in baseNames]
+
+
+# Filename for a raw request export: the last path segment plus .http
+def filenameFromUrl(urlString):
+    try:
+        path = urlsplit(urlString).path
+
+        # Find last non-empty part
+        filename = "request"
+        for part in reversed(path.split("/")):
+            if part:
+                filename = part
+                break
+
+        if not filename.endswith(".http"):
+            filename += ".http"
+        return filename
+    except Exception:
+        return "request.http"
+
+
+# Filename for a YAML export: <host>_<last_2_or_3_path_segments>.yaml
+def yamlFilenameFromUrl(urlString):
+    try:
+        url = urlsplit(urlString)
+        segments = [s for s in url.path.split("/") if s]
+
+        # Take last 2 or 3 segments depending on how many are available
+        if len(segments) >= 3:
+            pathPart = "_".join(segments[-3:])
+        elif segments:
+            pathPart = "_".join(segments[-2:])
+        else:
+            pathPart = "root"
+
+        # Clean up special characters in path segments
+        pathPart = pathPart.replace("?", "").replace("&", "").replace("=", "_")
+
+        filename = "{}_{}".format(url.hostname or "", pathPart)
+        if not filename.endswith(".yaml"):
+            filename += ".yaml"
+        return filename
+    except Exception:
+        return "request.yaml"
+
+
+# Filename for an endpoint's export: <method>_<host>_<path template>, with
+# placeholders kept as plain words, e.g. GET_api.example.com_users_id.yaml
+def endpointFilename(endpoint, extension):
+    method, _, rest = endpoint.partition(" ")
+    rest = rest.partition("?")[0]
+    name = "_".join([method] + [part for part in rest.split("/") if part])
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name.replace("{", "").replace("}", ""))
+    return name.strip("_")[:150] + extension
+
+
+# Hash identifying the content of an exported file
+def contentHash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+# Identity of a request across exports: method, full URL with query values
+# and a hash of the raw request bytes. Independent of the export order.
+def exportKey(method, url, request):
+    digest = hashlib.sha1()
+    digest.update(u"{} {}\n".format(method, url).encode("utf-8"))
+    digest.update(request or b"")
+    return digest.hexdigest()
+
+
+# Record of the files a directory export wrote, kept in the directory as
+# JSON: for each exportKey, the file name and the hash of its content. A
+# repeated export reuses the names and skips files whose hash is
+# unchanged. Each kind of export (http, yaml, ...) has its own records.
+class ExportManifest(object):
+    FILENAME = ".requestfilter-manifest.json"
+    VERSION = 1
+
+    def __init__(self, directory, kind, existingNames):
+        self.path = os.path.join(directory, self.FILENAME)
+        self._exports = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as manifestFile:
+                    data = json.load(manifestFile)
+                if data.get("version") == self.VERSION:
+                    self._exports = data["exports"]
+            except (ValueError, KeyError, AttributeError) as e:
+                sys.stderr.write("Ignoring manifest {}: {}\n".format(self.path, e))
+        self._records = self._exports.setdefault(kind, {})
+
+        self._existingNames = set(existingNames)
+        reservedNames = set(self._existingNames)
+        for records in self._exports.values():
+            reservedNames.update(name for name, _ in records.values())
+        self._allocator = FilenameAllocator(reservedNames)
+        self._keys = set()
+        self._changed = False
+
+    # Add a request to this export and return its file name: the recorded
+    # one, or a new unique name. None if an identical request was already
+    # added, as it would write the same file.
+    def add(self, key, baseName):
+        if key in self._keys:
+            return None
+        self._keys.add(key)
+
+        record = self._records.get(key)
+        if record is not None:
+            return record[0]
+        return self._allocator.allocate(baseName)
+
+    # Whether the file is still on disk with the recorded content
+    def isCurrent(self, key, filename, digest):
+        return (
+            self._records.get(key) == [filename, digest]
+            and filename in self._existingNames
+        )
+
+    def update(self, key, filename, digest):
+        record = [filename, digest]
+        if self._records.get(key) != record:
+            self._records[key] = record
+            self._changed = True
+
+    # Forget entries that were not part of this export and return the names
+    # of their files
+    def removeStale(self):
+        staleKeys = [key for key in self._records if key not in self._keys]
+        if staleKeys:
+            self._changed = True
+        return [self._records.pop(key)[0] for key in staleKeys]
+
+    # Write the manifest if any record changed
+    def save(self):
+        if not self._changed:
+            return
+        self._changed = False
+        with open(self.path, "w") as manifestFile:
+            json.dump(
+                {"version": self.VERSION, "exports": self._exports},
+                manifestFile,
+                separators=(",", ":"),
+            )
+
+
+# Streams requests into one ZIP file, one member per request. A
+# manifest.json member lists each member with its local header offset so
+# a reader can seek to a single request without unpacking the others.
+class ZipArchiveWriter(object):
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self._manifest = []
+
+    def add(self, name, data, metadata):
+        self._zip.writestr(name, data)
+        info = self._zip.infolist()[-1]
+
+        record = dict(metadata)
+        record["name"] = name
+        record["offset"] = info.header_offset
+        record["size"] = info.file_size
+        record["compressedSize"] = info.compress_size
+        self._manifest.append(record)
+
+    def close(self):
+        self._zip.writestr(
+            self.MANIFEST_NAME, json.dumps({"entries": self._manifest}, indent=1)
+        )
+        self._zip.close()
+
+
+# Streams requests into a JSON Lines file, one object per request with the
+# raw request base64-encoded. A <path>.manifest.json sidecar lists the byte
+# offset and length of every line.
+class JsonLinesArchiveWriter(object):
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._offset = 0
+        self._manifest = []
+
+    def add(self, name, data, metadata):
+        record = dict(metadata)
+        record["name"] = name
+        record["request"] = base64.b64encode(data).decode("ascii")
+        line = (json.dumps(record, sort_keys=True) + "\n").encode("utf-8")
+        self._file.write(line)
+
+        self._manifest.append(
+            {"name": name, "offset": self._offset, "length": len(line)}
+        )
+        self._offset += len(line)
+
+    def close(self):
+        self._file.close()
+        manifestFile = open(self.path + ".manifest.json", "w")
+        try:
+            json.dump({"entries": self._manifest}, manifestFile, indent=1)
+        finally:
+            manifestFile.close()
+
+
+# Characters that must be escaped inside a double-quoted YAML scalar
+YAML_ESCAPE_PATTERN = re.compile(u'[\\\\"\x00-\x1f\x7f-\x9f\u2028\u2029\ufeff]')
+YAML_ESCAPES = {
+    u"\\": u"\\\\",
+    u'"': u'\\"',
+    u"\x00": u"\\0",
+    u"\t": u"\\t",
+    u"\n": u"\\n",
+    u"\r": u"\\r",
+}
+
+# Keys and tokens that can be written as plain scalars without quoting
+YAML_PLAIN_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_.-]*$")
+YAML_RESERVED_WORDS = frozenset(
+    ["true", "false", "yes", "no", "on", "off", "y", "n", "null"]
+)
+
+# Characters that rule out a literal block scalar for a body. Line breaks
+# other than LF would not survive, so bodies with CR are written as binary.
+YAML_NON_TEXT_PATTERN = re.compile(
+    u"[\x00-\x08\x0b-\x1f\x7f-\x9f\u2028\u2029\ufeff\ufffe\uffff]"
+)
+
+
+def _yamlEscape(match):
+    char = match.group(0)
+    if char in YAML_ESCAPES:
+        return YAML_ESCAPES[char]
+    if ord(char) <= 0xFF:
+        return u"\\x{:02X}".format(ord(char))
+    return u"\\u{:04X}".format(ord(char))
+
+
+# Quote a string as a double-quoted YAML scalar
+def yamlQuote(text):
+    return u'"' + YAML_ESCAPE_PATTERN.sub(_yamlEscape, text) + u'"'
+
+
+# Write a string plain if YAML would read it back unchanged, quoted otherwise
+def yamlScalar(text):
+    if YAML_PLAIN_PATTERN.match(text) and text.lower() not in YAML_RESERVED_WORDS:
+        return text
+    return yamlQuote(text)
+
+
+# Streams a request as YAML through write(bytes), one chunk of the body at
+# a time. UTF-8 text bodies become literal block scalars with explicit
+# indentation and chomping so they round-trip byte for byte; any other
+# body is written as base64 !!binary.
+class YamlRequestWriter(object):
+    CHUNK_SIZE = 57 * 1024  # a multiple of 57 bytes, one 76-character base64 line
+    BINARY_LINE_BYTES = 57
+
+    def __init__(self, write):
+        self._write = write
+
+    def _writeLine(self, text):
+        self._write((text + u"\n").encode("utf-8"))
+
+    def writeRequest(
+        self, method, host, path, protocol, port, headers, data, bodyOffset
+    ):
+        self._writeLine(u"method: " + yamlScalar(method))
+        self._writeLine(u"host: " + yamlScalar(host))
+        self._writeLine(u"path: " + yamlQuote(path))
+        self._writeLine(u"protocol: " + yamlScalar(protocol))
+
+        # Add port if non-standard
+        if port != -1 and port != 80 and port != 443:
+            self._writeLine(u"port: {}".format(port))
+
+        self._writeLine(u"headers:")
+        for key, value in headers:
+            self._writeLine(u"  {}: {}".format(yamlScalar(key), yamlQuote(value)))
+
+        # Add body if present
+        if bodyOffset < len(data):
+            if self._isText(data, bodyOffset):
+                self._writeTextBody(data, bodyOffset)
+            else:
+                self._writeBinaryBody(data, bodyOffset)
+
+    # Check chunk by chunk that the body is UTF-8 text a block scalar can hold
+    def _isText(self, data, start):
+        decoder = codecs.getincrementaldecoder("utf-8")("strict")
+        try:
+            for chunkStart in range(start, len(data), self.CHUNK_SIZE):
+                text = decoder.decode(data[chunkStart : chunkStart + self.CHUNK_SIZE])
+                if YAML_NON_TEXT_PATTERN.search(text):
+                    return False
+            decoder.decode(b"", True)
+        except UnicodeDecodeError:
+            return False
+        return True
+
+    def _writeTextBody(self, data, start):
+        # Count trailing line feeds to pick the chomping indicator
+        trailingNewlines = 0
+        end = len(data)
+        while end > start and data[end - 1 : end] == b"\n":
+            trailingNewlines += 1
+            end -= 1
+
+        if trailingNewlines == 0:
+            chomping = u"-"
+        elif trailingNewlines == 1 and end > start:
+            chomping = u""
+        else:
+            chomping = u"+"
+        self._writeLine(u"body: |2" + chomping)
+
+        decoder = codecs.getincrementaldecoder("utf-8")("strict")
+        pending = u""
+        for chunkStart in range(start, len(data), self.CHUNK_SIZE):
+            lines = (
+                pending
+                + decoder.decode(data[chunkStart : chunkStart + self.CHUNK_SIZE])
+            ).split(u"\n")
+            pending = lines.pop()
+            if lines:
+                self._write(
+                    u"".join(
+                        (u"  " + line + u"\n") if line else u"\n" for line in lines
+                    ).encode("utf-8")
+                )
+
+        # A body that does not end with a line feed leaves its last line here
+        if pending:
+            self._writeLine(u"  " + pending)
+
+    def _writeBinaryBody(self, data, start):
+        self._writeLine(u"body: !!binary |")
+        for chunkStart in range(start, len(data), self.CHUNK_SIZE):
+            chunk = data[chunkStart : chunkStart + self.CHUNK_SIZE]
+            self._write(
+                b"".join(
+                    b"  "
+                    + base64.b64encode(chunk[i : i + self.BINARY_LINE_BYTES])
+                    + b"\n"
+                    for i in range(0, len(chunk), self.BINARY_LINE_BYTES)
+                )
+            )
+
+
+# Path segments that identify an instance rather than an endpoint: numeric
+# IDs, UUIDs, dates, hex hashes and long tokens mixing letters and digits.
+# A file extension after the token is kept.
+ENDPOINT_SEGMENT_PATTERN = re.compile(
+    r"^(?:(?P<uuid>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+    r"|(?P<id>\d+)"
+    r"|(?P<date>\d{4}-\d{2}-\d{2})"
+    r"|(?P<hash>[0-9a-f]{16,})"
+    r"|(?P<token>(?=[\w-]*\d)(?=[\w-]*[a-z])[\w-]{20,}={0,2}))"
+    r"(?P<ext>\.[a-z0-9]{1,5})?$",
+    re.IGNORECASE,
+)
+ENDPOINT_PLACEHOLDERS = ("uuid", "id", "date", "hash", "token")
+
+
+def _endpointSegment(segment):
+    match = ENDPOINT_SEGMENT_PATTERN.match(segment)
+    if match is None:
+        return segment
+    for name in ENDPOINT_PLACEHOLDERS:
+        if match.group(name) is not None:
+            return "{" + name + "}" + (match.group("ext") or "")
+    return segment
+
+
+# Path with instance tokens replaced by placeholders: /users/123/avatar.png
+# becomes /users/{id}/avatar.png
+def endpointTemplate(path):
+    return "/".join(_endpointSegment(segment) for segment in path.split("/"))
+
+
+# Key shared by every request to the same endpoint: method, host, path
+# template and the sorted query parameter names, e.g.
+# "GET api.example.com/users/{id}?fields&page"
+def endpointKey(method, host, path, query):
+    key = "{} {}{}".format(method, (host or "").lower(), endpointTemplate(path or "/"))
+    if query:
+        names = sorted(set(part.partition("=")[0] for part in query.split("&") if part))
+        key += "?" + "&".join(names)
+    return key
+
+
+# Request metadata parsed once at ingestion and shared by every code path
+class RequestEntry(object):
+    __slots__ = (
+        "id",
+        "message",
+        "method",
+        "url",
+        "urlLower",
+        "path",
+        "extension",
+        "host",
+        "status",
+        "length",
+        "bodyOffset",
+        "fingerprint",
+        "hits",
+        "endpoint",
+    )
+
+    def __init__(
+        self,
+        entryId,
+        message,
+        method,
+        url,
+        host,
+        path,
+        status,
+        length,
+        bodyOffset,
+        fingerprint,
+    ):
+        self.id = entryId
+        self.message = message  # stored message, see MessageStore
+        self.method = method
+        self.url = url
+        self.urlLower = url.lower()
+        self.path = path
+        self.extension = getPathExtension(path)
+        self.host = host
+        self.status = status  # None if there is no response
+        self.length = length  # None if there is no response
+        self.bodyOffset = bodyOffset
+        self.fingerprint = fingerprint
+        self.hits = 1  # incremented for each duplicate dropped at ingestion
+        self.endpoint = endpointKey(
+            method, host, path, url.partition("?")[2].partition("#")[0]
+        )
+
+
+# Raised for a query that cannot be parsed or compiled
+class QueryError(ValueError):
+    pass
+
+
+# Tokens of the query language: parentheses, field terms such as
+# status>=500 or host:"api.*", and bare words
+QUERY_TOKEN_PATTERN = re.compile(
+    r'\s*(?:(?P<paren>[()])'
+    r'|(?P<field>[A-Za-z]+)(?P<op>>=|<=|!=|[:=<>~])'
+    r'(?P<value>"(?:[^"\\]|\\.)*"|[^\s()]*)'
+    r'|(?P<word>"(?:[^"\\]|\\.)*"|[^\s()]+))'
+)
+QUERY_KEYWORDS = frozenset(["AND", "OR", "NOT"])
+QUERY_FIELD_ALIASES = {
+    "length": "len",
+    "extension": "ext",
+    "response": "resp",
+    "uri": "url",
+}
+
+# Rough relative cost of evaluating a term, used to order AND/OR operands
+# so cached metadata is checked before message bytes are decompressed
+QUERY_FIELD_COSTS = {
+    "method": 1,
+    "ext": 1,
+    "status": 1,
+    "len": 1,
+    "hits": 1,
+    "host": 2,
+    "path": 2,
+    "url": 2,
+    "endpoint": 2,
+    "header": 20,
+    "body": 30,
+    "resp": 40,
+}
+QUERY_MESSAGE_FIELDS = frozenset(["header", "body", "resp"])
+BODY_QUERY_FIELDS = ("body", "resp")
+QUERY_NUMERIC_OPS = {
+    ":": lambda a, b: a == b,
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+# Split a query into (kind, ...) tokens
+def tokenizeQuery(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = QUERY_TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError("Unexpected input at: {}".format(text[position:]))
+        position = match.end()
+
+        if match.group("paren"):
+            tokens.append((match.group("paren"),))
+        elif match.group("field"):
+            tokens.append(
+                (
+                    "term",
+                    match.group("field").lower(),
+                    match.group("op"),
+                    _unquote(match.group("value")),
+                )
+            )
+        elif match.group("word").upper() in QUERY_KEYWORDS:
+            tokens.append((match.group("word").upper(),))
+        else:
+            tokens.append(("term", "url", ":", _unquote(match.group("word"))))
+    return tokens
+
+
+# Recursive descent parser producing an AST of tuples:
+# ("and", [nodes]), ("or", [nodes]), ("not", node) and
+# ("term", field, op, value). Adjacent terms are implicitly AND'ed.
+class QueryParser(object):
+    def __init__(self, text):
+        self._tokens = tokenizeQuery(text)
+        self._position = 0
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position][0]
+        return None
+
+    def _next(self):
+        token = self._tokens[self._position]
+        self._position += 1
+        return token
+
+    def parse(self):
+        if not self._tokens:
+            return None
+        node = self._parseOr()
+        if self._peek() is not None:
+            raise QueryError("Unexpected '{}'".format(self._peek()))
+        return node
+
+    def _parseOr(self):
+        nodes = [self._parseAnd()]
+        while self._peek() == "OR":
+            self._next()
+            nodes.append(self._parseAnd())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def _parseAnd(self):
+        nodes = [self._parseUnary()]
+        while self._peek() in ("AND", "NOT", "(", "term"):
+            if self._peek() == "AND":
+                self._next()
+            nodes.append(self._parseUnary())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def _parseUnary(self):
+        kind = self._peek()
+        if kind == "NOT":
+            self._next()
+            return ("not", self._parseUnary())
+        if kind == "(":
+            self._next()
+            node = self._parseOr()
+            if self._peek() != ")":
+                raise QueryError("Missing ')'")
+            self._next()
+            return node
+        if kind == "term":
+            _, field, op, value = self._next()
+            field = QUERY_FIELD_ALIASES.get(field, field)
+            if field not in QUERY_FIELD_COSTS:
+                raise QueryError("Unknown field '{}'".format(field))
+            return ("term", field, op, value)
+        if kind is None:
+            raise QueryError("Query ends unexpectedly")
+        raise QueryError("Unexpected '{}'".format(kind))
+
+
+# Estimated cost of evaluating a node
+def queryCost(node):
+    if node[0] == "term":
+        cost = QUERY_FIELD_COSTS[node[1]]
+        # Globs and regexes cost more than plain comparisons
+        return cost * 2 if node[2] == "~" or "*" in node[3] else cost
+    if node[0] == "in":
+        return QUERY_FIELD_COSTS[node[1]]
+    if node[0] == "not":
+        return queryCost(node[1])
+    return sum(queryCost(child) for child in node[1])
+
+
+# Simplify an AST: flatten nested AND/OR, drop double negation, turn OR'ed
+# method/ext equalities into one set lookup and order operands by cost so
+# short-circuit evaluation tries the cheap checks first
+def optimizeQuery(node):
+    kind = node[0]
+    if kind == "term":
+        return node
+    if kind == "not":
+        child = optimizeQuery(node[1])
+        return child[1] if child[0] == "not" else ("not", child)
+
+    children = []
+    for child in node[1]:
+        child = optimizeQuery(child)
+        if child[0] == kind:
+            children.extend(child[1])
+        else:
+            children.append(child)
+
+    if kind == "or":
+        setValues = {}
+        remaining = []
+        for child in children:
+            if (
+                child[0] == "term"
+                and child[1] in ("method", "ext")
+                and child[2] in (":", "=")
+            ):
+                setValues.setdefault(child[1], set()).add(child[3])
+            else:
+                remaining.append(child)
+        children = [
+            ("in", field, frozenset(values))
+            for field, values in sorted(setValues.items())
+        ] + remaining
+
+    children.sort(key=queryCost)
+    return children[0] if len(children) == 1 else (kind, tuple(children))
+
+
+# Check whether an AST reads message bytes
+def queryNeedsMessage(node):
+    if node[0] == "term":
+        return node[1] in QUERY_MESSAGE_FIELDS
+    if node[0] == "in":
+        return False
+    if node[0] == "not":
+        return queryNeedsMessage(node[1])
+    return any(queryNeedsMessage(child) for child in node[1])
+
+
+# Names of the fields an AST refers to
+def queryFields(node):
+    if node[0] in ("term", "in"):
+        return frozenset([node[1]])
+    if node[0] == "not":
+        return queryFields(node[1])
+    return frozenset().union(*[queryFields(child) for child in node[1]])
+
+
+# Text of a message body for searching: UTF-8 when it decodes as such,
+# otherwise one character per byte
+def messageText(data):
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+# Request and response text of an entry, decoded on first use and shared by
+# all terms evaluated for that entry
+class LazyMessage(object):
+    __slots__ = ("_entry", "_request", "_body", "_response", "_headers")
+
+    def __init__(self, entry):
+        self._entry = entry
+        self._request = None
+        self._body = None
+        self._response = None
+        self._headers = None
+
+    def _requestBytes(self):
+        if self._request is None:
+            self._request = toByteString(self._entry.message.getRequest())
+        return self._request
+
+    def body(self):
+        if self._body is None:
+            self._body = messageText(self._requestBytes()[self._entry.bodyOffset :])
+        return self._body
+
+    def response(self):
+        if self._response is None:
+            self._response = messageText(
+                toByteString(self._entry.message.getResponse()) or b""
+            )
+        return self._response
+
+    # Request headers as (lowercased name, value) pairs
+    def headers(self):
+        if self._headers is None:
+            headerBlock = self._requestBytes()[: self._entry.bodyOffset].decode(
+                "latin-1"
+            )
+            self._headers = []
+            for line in headerBlock.split("\r\n")[1:]:
+                colonIdx = line.find(":")
+                if colonIdx > 0:
+                    self._headers.append(
+                        (line[:colonIdx].strip().lower(), line[colonIdx + 1 :].strip())
+                    )
+        return self._headers
+
+
+# Build a text predicate: ~ is a regex search, = is an exact match, a value
+# with * or ? is a glob over the whole text, anything else is a substring
+def _textMatcher(op, value, ignoreCase):
+    flags = re.IGNORECASE if ignoreCase else 0
+    try:
+        if op == "~":
+            return re.compile(value, flags).search
+    except re.error as e:
+        raise QueryError("Invalid regex '{}': {}".format(value, e))
+    if ignoreCase:
+        value = value.lower()
+    if op == "=":
+        return (
+            (lambda text: text.lower() == value)
+            if ignoreCase
+            else (lambda text: text == value)
+        )
+    if op != ":":
+        raise QueryError("Operator '{}' is not supported for text".format(op))
+    if "*" in value or "?" in value:
+        return re.compile(fnmatch.translate(value), flags).match
+    if ignoreCase:
+        return lambda text: value in text.lower()
+    return lambda text: value in text
+
+
+def _numericTerm(getter, op, value):
+    compare = QUERY_NUMERIC_OPS.get(op)
+    if compare is None:
+        raise QueryError("Operator '{}' is not supported for numbers".format(op))
+    try:
+        number = int(value)
+    except ValueError:
+        raise QueryError("Expected a number, got '{}'".format(value))
+
+    def predicate(entry, message):
+        actual = getter(entry)
+        return actual is not None and compare(actual, number)
+
+    return predicate
+
+
+def _compileTerm(field, op, value):
+    negate = op == "!="
+    if negate:
+        op = "="
+
+    if field == "status" and op in (":", "=") and re.match(r"^[1-5]xx$", value, re.I):
+        statusClass = int(value[0])
+        predicate = lambda entry, message: (
+            entry.status is not None and entry.status // 100 == statusClass
+        )
+    elif field in ("status", "len", "hits"):
+        getter = {
+            "status": lambda entry: entry.status,
+            "len": lambda entry: entry.length,
+            "hits": lambda entry: entry.hits,
+        }[field]
+        predicate = _numericTerm(getter, "!=" if negate else op, value)
+        negate = False
+    elif field == "method":
+        method = value.upper()
+        predicate = lambda entry, message: entry.method == method
+    elif field == "ext":
+        extension = value.lower().lstrip(".")
+        predicate = lambda entry, message: entry.extension == extension
+    elif field == "host":
+        matcher = _textMatcher(op, value, True)
+        predicate = lambda entry, message: bool(matcher(entry.host))
+    elif field == "path":
+        matcher = _textMatcher(op, value, False)
+        predicate = lambda entry, message: bool(matcher(entry.path))
+    elif field == "url":
+        matcher = _textMatcher(op, value, False)
+        predicate = lambda entry, message: bool(matcher(entry.url))
+    elif field == "endpoint":
+        matcher = _textMatcher(op, value, False)
+        predicate = lambda entry, message: bool(matcher(entry.endpoint))
+    elif field == "header":
+        # header:Name checks presence, header:Name=text matches the value
+        name, _, headerValue = value.partition("=")
+        name = name.strip().lower()
+        valueMatcher = _textMatcher(":", headerValue, True) if headerValue else None
+        predicate = lambda entry, message: any(
+            headerName == name and (valueMatcher is None or valueMatcher(text))
+            for headerName, text in message.headers()
+        )
+    elif field == "body":
+        matcher = _textMatcher(op, value, False)
+        predicate = lambda entry, message: bool(matcher(message.body()))
+    else:
+        matcher = _textMatcher(op, value, False)
+        predicate = lambda entry, message: bool(matcher(message.response()))
+
+    if negate:
+        return lambda entry, message: not predicate(entry, message)
+    return predicate
+
+
+# Compile an optimized AST into nested predicate closures
+def compileQuery(node):
+    kind = node[0]
+    if kind == "term":
+        return _compileTerm(node[1], node[2], node[3])
+    if kind == "in":
+        field, values = node[1], node[2]
+        if field == "method":
+            methods = frozenset(value.upper() for value in values)
+            return lambda entry, message: entry.method in methods
+        extensions = frozenset(value.lower().lstrip(".") for value in values)
+        return lambda entry, message: entry.extension in extensions
+    if kind == "not":
+        child = compileQuery(node[1])
+        return lambda entry, message: not child(entry, message)
+
+    children = [compileQuery(child) for child in node[1]]
+    if kind == "and":
+
+        def evaluateAnd(entry, message):
+            for child in children:
+                if not child(entry, message):
+                    return False
+            return True
+
+        return evaluateAnd
+
+    def evaluateOr(entry, message):
+        for child in children:
+            if child(entry, message):
+                return True
+        return False
+
+    return evaluateOr
+
+
+# IDs of the entries that can match a node according to the body index, or
+# None when the node cannot be narrowed. Only plain body/resp substring
+# terms use the index; AND intersects and OR unions the child candidates.
+def queryCandidates(node, bodyIndex):
+    kind = node[0]
+    if kind == "term":
+        field, op, value = node[1:]
+        if field in BODY_QUERY_FIELDS and op == ":" and not re.search(r"[*?]", value):
+            return bodyIndex.lookup(field, value)
+        return None
+
+    if kind == "and":
+        candidates = [
+            entryIds
+            for entryIds in (queryCandidates(child, bodyIndex) for child in node[1])
+            if entryIds is not None
+        ]
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+    if kind == "or":
+        entryIds = set()
+        for child in node[1]:
+            childIds = queryCandidates(child, bodyIndex)
+            if childIds is None:
+                return None
+            entryIds.update(childIds)
+        return entryIds
+
+    return None
+
+
+# Bits of the entries that can match a node according to the categorical
+# bitmaps, or None when the node cannot be narrowed. Method, ext, status
+# class and exact host terms map onto bitmaps; AND intersects the children
+# it can resolve and OR needs all of them.
+def queryBitmap(node, bitmapIndex):
+    kind = node[0]
+    if kind == "in":
+        if node[1] == "method":
+            values = [value.upper() for value in node[2]]
+        else:
+            values = [value.lower().lstrip(".") for value in node[2]]
+        return bitmapIndex.valueBits(node[1], values)
+
+    if kind == "term":
+        field, op, value = node[1:]
+        if op not in (":", "="):
+            return None
+        if field == "method":
+            return bitmapIndex.valueBits("method", [value.upper()])
+        if field == "ext":
+            return bitmapIndex.valueBits("ext", [value.lower().lstrip(".")])
+        if field == "status" and re.match(r"^[1-5]xx$", value, re.I):
+            return bitmapIndex.valueBits("status", [int(value[0])])
+        if field == "host" and op == "=":
+            return bitmapIndex.valueBits("host", [value.lower()])
+        return None
+
+    if kind == "and":
+        bits = None
+        for child in node[1]:
+            childBits = queryBitmap(child, bitmapIndex)
+            if childBits is not None:
+                bits = childBits if bits is None else bits & childBits
+        return bits
+
+    if kind == "or":
+        bits = 0
+        for child in node[1]:
+            childBits = queryBitmap(child, bitmapIndex)
+            if childBits is None:
+                return None
+            bits |= childBits
+        return bits
+
+    return None
+
+
+# A query parsed once into an AST, optimized and compiled into an
+# execution plan. An empty query matches everything.
+class QueryPlan(object):
+    def __init__(self, text):
+        self.text = text.strip()
+        ast = QueryParser(self.text).parse()
+        self.ast = optimizeQuery(ast) if ast is not None else None
+        self._needsMessage = self.ast is not None and queryNeedsMessage(self.ast)
+        self.fields = queryFields(self.ast) if self.ast is not None else frozenset()
+        self._predicate = compileQuery(self.ast) if self.ast is not None else None
+
+    def isEmpty(self):
+        return self.ast is None
+
+    # IDs of the entries that can match according to the body index, or None
+    def candidateIds(self, bodyIndex):
+        if not self._needsMessage:
+            return None
+        return queryCandidates(self.ast, bodyIndex)
+
+    def matches(self, entry):
+        if self._predicate is None:
+            return True
+        message = LazyMessage(entry) if self._needsMessage else None
+        return self._predicate(entry, message)
+
+
+# Filter settings compiled into a single predicate over RequestEntry objects.
+# It holds plain values only, so it can be built and used without Swing.
+class CompiledFilter(object):
+    def __init__(self, methods, fileTypes, includeFileTypes, uriPatterns, query=""):
+        self.methods = frozenset(methods)
+        self.fileTypes = frozenset(ext.lower() for ext in fileTypes)
+        self.includeFileTypes = bool(includeFileTypes)
+        self.uriPatterns = tuple(pattern for pattern in uriPatterns if pattern)
+
+        # OR'ed URI substrings are matched by one combined regex
+        if self.uriPatterns:
+            self._uriMatcher = re.compile(
+                "|".join(re.escape(pattern) for pattern in self.uriPatterns)
+            ).search
+        else:
+            self._uriMatcher = None
+
+        # Optional structured query, checked after the cheaper settings
+        self.query = QueryPlan(query)
+
+        # Hit counts change after an entry was tested, so the result of a
+        # filter on them goes stale as duplicates arrive
+        self.usesHits = "hits" in self.query.fields
+
+    def _key(self):
+        return (
+            self.methods,
+            self.fileTypes,
+            self.includeFileTypes,
+            frozenset(self.uriPatterns),
+            self.query.ast,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledFilter) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def matches(self, entry):
+        # Methods outside the checkbox list never match
+        if entry.method not in self.methods:
+            return False
+
+        # Include mode keeps file type matches, exclude mode drops them
+        isFileTypeMatch = entry.extension in self.fileTypes
+        if self.includeFileTypes:
+            if self.fileTypes and not isFileTypeMatch:
+                return False
+        elif isFileTypeMatch:
+            return False
+
+        # Empty URI filters match everything, otherwise ANY pattern passes
+        if self._uriMatcher is not None and self._uriMatcher(entry.url) is None:
+            return False
+
+        return self.query.matches(entry)
+
+
+# Inverted index from URL tokens to the IDs of the entries whose URL contains
+# them. A URI filter is resolved by intersecting the posting lists of the
+# tokens it fully contains, so only those candidates need the substring test.
+class UrlTokenIndex(object):
+    TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+")
+    EMPTY_POSTING = frozenset()
+
+    def __init__(self):
+        self._postings = {}
+        self._entryIds = set()
+
+    def __len__(self):
+        return len(self._entryIds)
+
+    def add(self, entry):
+        self._entryIds.add(entry.id)
+        for token in set(self.TOKEN_PATTERN.findall(entry.url)):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+            posting.add(entry.id)
+
+    def remove(self, entry):
+        if entry.id not in self._entryIds:
+            return
+        self._entryIds.discard(entry.id)
+        for token in set(self.TOKEN_PATTERN.findall(entry.url)):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.discard(entry.id)
+                if not posting:
+                    del self._postings[token]
+
+    def clear(self):
+        self._postings.clear()
+        self._entryIds.clear()
+
+    # IDs of the entries that may contain the pattern, or None if the pattern
+    # has no token delimited on both sides. Such a token, e.g. "api" and "v2"
+    # in "/api/v2/", must appear as a whole token in every matching URL.
+    def lookup(self, pattern):
+        tokens = set(
+            match.group()
+            for match in self.TOKEN_PATTERN.finditer(pattern)
+            if match.start() > 0 and match.end() < len(pattern)
+        )
+        if not tokens:
+            return None
+
+        postings = sorted(
+            (self._postings.get(token, self.EMPTY_POSTING) for token in tokens),
+            key=len,
+        )
+        return postings[0].intersection(*postings[1:])
+
+    # IDs of the entries that may match ANY of the patterns, or None when a
+    # pattern cannot be resolved and every entry must be tested
+    def candidateIds(self, patterns):
+        if not patterns:
+            return None
+
+        entryIds = set()
+        for pattern in patterns:
+            matchedIds = self.lookup(pattern)
+            if matchedIds is None:
+                return None
+            entryIds.update(matchedIds)
+        return entryIds
+
+
+# Build an int with the given bit positions set. The bits are laid out in
+# a byte buffer first, so the cost is linear in the highest position.
+def bitsFromPositions(positions):
+    if not positions:
+        return 0
+
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    buffer.reverse()
+    return int(binascii.hexlify(bytes(buffer)), 16)
+
+
+# Bitmap per value of the low-cardinality entry fields: method, extension,
+# status class (2 for 2xx, None without a response) and lowercased host.
+# Bits are positions in the collection, so any checkbox combination is
+# resolved with whole-int AND/OR/ANDNOT instead of testing every entry.
+# Positions are those of the extender: evicted count + request list index.
+class CategoryBitmapIndex(object):
+    FIELDS = ("method", "ext", "status", "host")
+
+    # Bitmaps are shifted down once evicted bits outnumber the live ones
+    REBASE_THRESHOLD = 4096
+
+    def __init__(self):
+        self._bitmaps = dict((field, {}) for field in self.FIELDS)
+        self._base = 0  # position of bit 0
+        self._start = 0  # first live position
+        self._end = 0  # position after the last entry
+
+    @staticmethod
+    def _values(entry):
+        return (
+            ("method", entry.method),
+            ("ext", entry.extension),
+            ("status", entry.status // 100 if entry.status is not None else None),
+            ("host", entry.host.lower()),
+        )
+
+    # Index entries stored at consecutive positions from the given one
+    def add(self, entries, position):
+        if not entries:
+            return
+
+        groups = {}
+        for offset, entry in enumerate(entries):
+            bit = position + offset - self._base
+            for key in self._values(entry):
+                bits = groups.get(key)
+                if bits is None:
+                    bits = groups[key] = []
+                bits.append(bit)
+
+        for (field, value), bits in groups.items():
+            low = bits[0]
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] = bitmaps.get(value, 0) | (
+                bitsFromPositions([bit - low for bit in bits]) << low
+            )
+        self._end = position + len(entries)
+
+    # Forget every position before the given one
+    def evict(self, position):
+        self._start = position
+        shift = self._start - self._base
+        if shift < max(self._end - self._start, self.REBASE_THRESHOLD):
+            return
+
+        for bitmaps in self._bitmaps.values():
+            for value in list(bitmaps):
+                bitmaps[value] >>= shift
+                if not bitmaps[value]:
+                    del bitmaps[value]
+        self._base = self._start
+
+    def clear(self, position):
+        for bitmaps in self._bitmaps.values():
+            bitmaps.clear()
+        self._base = self._start = self._end = position
+
+    def valueBits(self, field, values):
+        bitmaps = self._bitmaps[field]
+        bits = 0
+        for value in values:
+            bits |= bitmaps.get(value, 0)
+        return bits
+
+    def _liveBits(self):
+        return ((1 << (self._end - self._base)) - 1) ^ (
+            (1 << (self._start - self._base)) - 1
+        )
+
+    # Bits of the entries passing the method and file type checkboxes and
+    # the categorical terms of the filter's query
+    def select(self, requestFilter):
+        bits = self.valueBits("method", requestFilter.methods)
+        if requestFilter.fileTypes:
+            fileTypeBits = self.valueBits("ext", requestFilter.fileTypes)
+            if requestFilter.includeFileTypes:
+                bits &= fileTypeBits
+            else:
+                bits &= ~fileTypeBits
+
+        if requestFilter.query.ast is not None:
+            queryBits = queryBitmap(requestFilter.query.ast, self)
+            if queryBits is not None:
+                bits &= queryBits
+        return bits & self._liveBits()
+
+    # Collection positions of the set bits, in ascending order
+    def positions(self, bits):
+        digits = bin(bits)[:1:-1]
+        index = digits.find("1")
+        while index >= 0:
+            yield self._base + index
+            index = digits.find("1", index + 1)
+
+
+# Trigram index over request bodies and whole responses. A body/resp
+# substring search is narrowed to the entries containing every trigram of
+# the text; the query still verifies each candidate. Entries are queued
+# first and indexed by indexEntries, which the extender runs on a
+# background thread. Indexing is off until maxBodyBytes is set. Bodies over
+# maxBodyBytes, and every entry once the index holds maxPostings postings,
+# are not indexed and are always candidates, which bounds the index size.
+class BodyIndex(object):
+    PARTS = BODY_QUERY_FIELDS
+    DEFAULT_MAX_POSTINGS = 500000
+
+    # Postings of removed entries are dropped once they outnumber live ones
+    COMPACT_THRESHOLD = 1000
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self.maxBodyBytes = 0
+        self.maxPostings = self.DEFAULT_MAX_POSTINGS
+        self._lock = threading.Lock()
+        self._postings = dict((part, {}) for part in self.PARTS)
+        self._postingCount = 0
+        self._pending = set()
+        self._skipped = set()
+        self._indexed = set()
+        self._removed = set()
+
+    def isEnabled(self):
+        return self.maxBodyBytes > 0
+
+    def pendingCount(self):
+        return len(self._pending)
+
+    def postingCount(self):
+        return self._postingCount
+
+    # Mark entries as waiting for indexEntries; until then they are always
+    # candidates
+    def queue(self, entries):
+        with self._lock:
+            self._pending.update(entry.id for entry in entries)
+
+    def remove(self, entries):
+        with self._lock:
+            for entry in entries:
+                self._pending.discard(entry.id)
+                self._skipped.discard(entry.id)
+                if entry.id in self._indexed:
+                    self._indexed.discard(entry.id)
+                    self._removed.add(entry.id)
+
+    def clear(self):
+        with self._lock:
+            for postings in self._postings.values():
+                postings.clear()
+            self._postingCount = 0
+            self._pending.clear()
+            self._skipped.clear()
+            self._indexed.clear()
+            self._removed.clear()
+
+    def _trigrams(self, text):
+        return set(text[i : i + 3] for i in range(len(text) - 2))
+
+    # Whether adding that many postings would exceed maxPostings
+    def _isFull(self, added=1):
+        return self.maxPostings and self._postingCount + added > self.maxPostings
+
+    # Leave entries out of the index; they are always candidates
+    def skip(self, entries):
+        with self._lock:
+            self._skipped.update(entry.id for entry in entries)
+
+    # Index queued entries, skipping those removed since they were queued.
+    # The bytes are read from messages, if given, instead of entry.message.
+    def indexEntries(self, entries, messages=None):
+        for i, entry in enumerate(entries):
+            message = entry.message if messages is None else messages[i]
+            if entry.message is None or entry.id not in self._pending:
+                continue
+
+            parts = None
+            try:
+                request = toByteString(message.getRequest())[entry.bodyOffset :]
+                response = toByteString(message.getResponse()) or b""
+                if (
+                    max(len(request), len(response)) <= self.maxBodyBytes
+                    and not self._isFull()
+                ):
+                    parts = (
+                        ("body", self._trigrams(messageText(request))),
+                        ("resp", self._trigrams(messageText(response))),
+                    )
+            except Exception as e:
+                self._metrics.reportError("Error indexing request body", e)
+
+            with self._lock:
+                # Skip entries removed while their trigrams were computed
+                if entry.id not in self._pending:
+                    continue
+                self._pending.discard(entry.id)
+                if parts is None or self._isFull(
+                    sum(len(trigrams) for part, trigrams in parts)
+                ):
+                    self._skipped.add(entry.id)
+                    continue
+                for part, trigrams in parts:
+                    postings = self._postings[part]
+                    for trigram in trigrams:
+                        posting = postings.get(trigram)
+                        if posting is None:
+                            posting = postings[trigram] = set()
+                        posting.add(entry.id)
+                    self._postingCount += len(trigrams)
+                self._indexed.add(entry.id)
+
+        self._compact()
+
+    def _compact(self):
+        with self._lock:
+            if len(self._removed) < max(len(self._indexed), self.COMPACT_THRESHOLD):
+                return
+            for postings in self._postings.values():
+                for trigram in list(postings):
+                    posting = postings[trigram]
+                    size = len(posting)
+                    posting.difference_update(self._removed)
+                    self._postingCount -= size - len(posting)
+                    if not posting:
+                        del postings[trigram]
+            self._removed.clear()
+
+    # IDs of the entries whose body ("body") or response ("resp") may
+    # contain the text, or None if the index cannot narrow the search
+    def lookup(self, part, text):
+        if not self.isEnabled() or len(text) < 3:
+            return None
+
+        trigrams = self._trigrams(text)
+        with self._lock:
+            postings = self._postings[part]
+            candidates = sorted(
+                (postings.get(trigram, ()) for trigram in trigrams), key=len
+            )
+            entryIds = set(candidates[0]).intersection(*candidates[1:])
+            entryIds.update(self._pending)
+            entryIds.update(self._skipped)
+        return entryIds
+
+
+# Sort key wrapper that inverts the order of the wrapped value
+class _Descending(object):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+
+# Sort orders of the filtered entries by one or more table columns, given
+# as ((column, ascending), ...) with the primary column first. Typed keys
+# come from the entry metadata and are computed once per entry and order.
+# Orders and their keys are memoized per sort specification until the
+# filtered set is replaced; new entries are merged into every memoized
+# order with binary search instead of re-sorting.
+class EntrySorter(object):
+    COLUMN_KEYS = (
+        lambda entry: entry.id,
+        lambda entry: entry.method,
+        lambda entry: entry.url,
+        lambda entry: -1 if entry.status is None else entry.status,
+        lambda entry: -1 if entry.length is None else entry.length,
+        lambda entry: entry.hits,
+    )
+    HITS_COLUMN = 5
+    MAX_ORDERS = 4
+
+    def __init__(self):
+        self.sortKeys = ()
+        self.view = None  # entries in view order, None when unsorted
+        self._orders = collections.OrderedDict()
+
+    def isSorted(self):
+        return bool(self.sortKeys)
+
+    def _keyFunction(self, sortKeys):
+        getters = [
+            (self.COLUMN_KEYS[column], ascending) for column, ascending in sortKeys
+        ]
+
+        def key(entry):
+            return tuple(
+                getter(entry) if ascending else _Descending(getter(entry))
+                for getter, ascending in getters
+            )
+
+        return key
+
+    def _sort(self, entries, sortKeys):
+        keyFunction = self._keyFunction(sortKeys)
+        decorated = [(keyFunction(entry), index) for index, entry in enumerate(entries)]
+        decorated.sort()
+        return (
+            [entries[index] for key, index in decorated],
+            [key for key, index in decorated],
+        )
+
+    # Switch to another sort specification over the given model entries
+    def setSortKeys(self, sortKeys, entries):
+        self.sortKeys = tuple(sortKeys)
+        if not self.sortKeys:
+            self.view = None
+            return
+
+        memo = self._orders.pop(self.sortKeys, None)
+        if memo is None:
+            memo = self._sort(list(entries), self.sortKeys)
+        self._orders[self.sortKeys] = memo
+        while len(self._orders) > self.MAX_ORDERS:
+            self._orders.popitem(last=False)
+        self.view = memo[0]
+
+    # Forget memoized orders once the filtered set is replaced
+    def reset(self):
+        self._orders.clear()
+        if self.sortKeys:
+            self._orders[self.sortKeys] = ([], [])
+            self.view = self._orders[self.sortKeys][0]
+
+    # Hit counts changed, so only the current order can be kept
+    def invalidateHits(self):
+        for sortKeys in list(self._orders):
+            if sortKeys != self.sortKeys and any(
+                column == self.HITS_COLUMN for column, ascending in sortKeys
+            ):
+                del self._orders[sortKeys]
+
+    # Merge entries appended to the model into every order. Returns the
+    # view rows they were inserted at, in ascending order.
+    def add(self, entries):
+        insertedRows = None
+        for sortKeys in list(self._orders):
+            order, keys = self._orders[sortKeys]
+            batch, batchKeys = self._sort(entries, sortKeys)
+
+            mergedOrder = []
+            mergedKeys = []
+            rows = []
+            previous = 0
+            for offset, key in enumerate(batchKeys):
+                # Equal keys keep model order, so new entries go last
+                point = bisect.bisect_right(keys, key, previous)
+                mergedOrder.extend(order[previous:point])
+                mergedKeys.extend(keys[previous:point])
+                rows.append(point + offset)
+                mergedOrder.append(batch[offset])
+                mergedKeys.append(key)
+                previous = point
+            mergedOrder.extend(order[previous:])
+            mergedKeys.extend(keys[previous:])
+
+            self._orders[sortKeys] = (mergedOrder, mergedKeys)
+            if sortKeys == self.sortKeys:
+                self.view = mergedOrder
+                insertedRows = rows
+        return insertedRows
+
+    # Drop evicted entries from every order. Returns the view rows they
+    # were removed from, in ascending order.
+    def removeEvicted(self):
+        removedRows = None
+        for sortKeys in list(self._orders):
+            order, keys = self._orders[sortKeys]
+            kept = [
+                index for index, entry in enumerate(order) if entry.message is not None
+            ]
+            if len(kept) == len(order):
+                continue
+
+            if sortKeys == self.sortKeys:
+                keptRows = set(kept)
+                removedRows = [row for row in range(len(order)) if row not in keptRows]
+            self._orders[sortKeys] = (
+                [order[index] for index in kept],
+                [keys[index] for index in kept],
+            )
+            if sortKeys == self.sortKeys:
+                self.view = self._orders[sortKeys][0]
+        return removedRows
+
+
+# Requests sharing an endpoint key, oldest first, with a count per status
+# code and a representative sample: the oldest request with a 2xx
+# response, or the oldest request if none has one
+class EndpointGroup(object):
+    __slots__ = (
+        "key",
+        "method",
+        "host",
+        "template",
+        "entries",
+        "statusCounts",
+        "sample",
+    )
+
+    # Requests looked at for a new sample when the sample is removed
+    SAMPLE_SCAN = 64
+
+    def __init__(self, key, entry):
+        self.key = key
+        self.method = entry.method
+        self.host = entry.host
+        self.template = key.partition(" ")[2][len(entry.host or "") :]
+        self.entries = collections.deque()
+        self.statusCounts = {}
+        self.sample = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        self.entries.append(entry)
+        self.statusCounts[entry.status] = self.statusCounts.get(entry.status, 0) + 1
+        if self.sample is None or (not _isSuccess(self.sample) and _isSuccess(entry)):
+            self.sample = entry
+
+    def remove(self, entry):
+        if self.entries and self.entries[0] is entry:
+            self.entries.popleft()
+        else:
+            self.entries.remove(entry)
+
+        count = self.statusCounts[entry.status] - 1
+        if count:
+            self.statusCounts[entry.status] = count
+        else:
+            del self.statusCounts[entry.status]
+
+        if entry is self.sample:
+            self.sample = None
+            for i, candidate in enumerate(self.entries):
+                if i == self.SAMPLE_SCAN:
+                    break
+                if _isSuccess(candidate):
+                    self.sample = candidate
+                    break
+            if self.sample is None and self.entries:
+                self.sample = self.entries[0]
+
+    # Status codes by frequency, e.g. "200 x41, 404 x2, none x1"
+    def statusSummary(self):
+        counts = sorted(
+            self.statusCounts.items(), key=lambda item: (-item[1], item[0] or 0)
+        )
+        return ", ".join(
+            "{} x{}".format("none" if status is None else status, count)
+            for status, count in counts
+        )
+
+
+def _isSuccess(entry):
+    return entry.status is not None and entry.status // 100 == 2
+
+
+# Groups of entries by endpoint key, kept up to date as entries are added
+# and removed. Groups are listed in the order their endpoint was first
+# seen, so existing rows keep their position as entries arrive.
+class EndpointGroupIndex(object):
+    def __init__(self):
+        self.groups = []
+        self._groupsByKey = {}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def clear(self):
+        self.groups = []
+        self._groupsByKey = {}
+
+    # Add entries; returns the number of new groups appended to groups
+    def add(self, entries):
+        groupCount = len(self.groups)
+        for entry in entries:
+            group = self._groupsByKey.get(entry.endpoint)
+            if group is None:
+                group = EndpointGroup(entry.endpoint, entry)
+                self._groupsByKey[entry.endpoint] = group
+                self.groups.append(group)
+            group.add(entry)
+        return len(self.groups) - groupCount
+
+    # Remove entries; returns the ascending indexes of the groups that were
+    # emptied and dropped from groups
+    def remove(self, entries):
+        emptied = False
+        for entry in entries:
+            group = self._groupsByKey.get(entry.endpoint)
+            if group is None:
+                continue
+            group.remove(entry)
+            if not group.entries:
+                del self._groupsByKey[entry.endpoint]
+                emptied = True
+        if not emptied:
+            return []
+
+        removedRows = [
+            row for row, group in enumerate(self.groups) if not group.entries
+        ]
+        self.groups = [group for group in self.groups if group.entries]
+        return removedRows
+
+
+# Latency distribution of one phase over its most recent samples. Each
+# sample falls into a bucket by its upper bound in milliseconds; bucket
+# counts are kept in step with a ring of the last WINDOW samples, so adding
+# a sample is O(1). Totals cover every sample since the start.
+class LatencyHistogram(object):
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+    WINDOW = 1024
+
+    def __init__(self, window=WINDOW):
+        self._window = window
+        self._samples = []
+        self._next = 0
+        self.buckets = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.totalMs = 0.0
+        self.maxMs = 0.0
+
+    def _bucket(self, ms):
+        return bisect.bisect_left(self.BOUNDS_MS, ms)
+
+    def add(self, ms):
+        if len(self._samples) < self._window:
+            self._samples.append(ms)
+        else:
+            self.buckets[self._bucket(self._samples[self._next])] -= 1
+            self._samples[self._next] = ms
+            self._next = (self._next + 1) % self._window
+        self.buckets[self._bucket(ms)] += 1
+
+        self.count += 1
+        self.totalMs += ms
+        if ms > self.maxMs:
+            self.maxMs = ms
+
+    def snapshot(self):
+        recent = sorted(self._samples)
+
+        def percentile(fraction):
+            if not recent:
+                return None
+            return recent[min(int(len(recent) * fraction), len(recent) - 1)]
+
+        return {
+            "count": self.count,
+            "totalMs": self.totalMs,
+            "meanMs": self.totalMs / self.count if self.count else None,
+            "maxMs": self.maxMs,
+            "window": len(recent),
+            "p50Ms": percentile(0.5),
+            "p95Ms": percentile(0.95),
+            "p99Ms": percentile(0.99),
+            "buckets": list(self.buckets),
+        }
+
+
+# Timers and counters for the hot paths. Phases are timed by the caller
+# and recorded here with their duration; counters only ever grow. Safe to
+# use from any thread, and cheap enough to stay on all the time: phases are
+# recorded once per batch, never per request.
+class Metrics(object):
+    PHASES = ("parse", "ingest", "filter", "table", "viewer", "export")
+    COUNTERS = (
+        "requestsParsed",
+        "requestsExported",
+        "bytesExported",
+        "errors",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.startTime = time.time()
+        self._histograms = dict((phase, LatencyHistogram()) for phase in self.PHASES)
+        self._counters = dict((name, 0) for name in self.COUNTERS)
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self._histograms[phase].add(seconds * 1000.0)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    # Count an error that is handled by logging it and carrying on
+    def reportError(self, message, error):
+        print("{}: {}".format(message, error))
+        self.count("errors")
+
+    def snapshot(self, gauges=None):
+        with self._lock:
+            phases = dict(
+                (phase, histogram.snapshot())
+                for phase, histogram in self._histograms.items()
+            )
+            counters = dict(self._counters)
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.startTime,
+            "boundsMs": list(LatencyHistogram.BOUNDS_MS),
+            "phases": phases,
+            "counters": counters,
+            "gauges": dict(gauges or {}),
+        }
+
+
+# Append a metrics snapshot to a JSON Lines file
+def appendMetrics(path, snapshot):
+    with open(path, "a") as metricsFile:
+        metricsFile.write(json.dumps(snapshot, sort_keys=True) + "\n")
+
+
+# Stream an entry's request as YAML through write(bytes)
+def writeRequestYaml(entry, write):
+    requestBytes = toByteString(entry.message.getRequest())
+
+    url = urlsplit(entry.url)
+    path = url.path
+    if url.query:
+        path = "{}?{}".format(path, url.query)
+
+    # Extract headers (skip the first line which is the request line)
+    headers = []
+    headerBlock = requestBytes[: entry.bodyOffset].decode("latin-1")
+    for headerLine in headerBlock.split("\r\n")[1:]:
+        colonIdx = headerLine.find(":")
+        if colonIdx > 0:
+            headers.append(
+                (headerLine[:colonIdx].strip(), headerLine[colonIdx + 1 :].strip())
+            )
+
+    YamlRequestWriter(write).writeRequest(
+        entry.method,
+        entry.host,
+        path,
+        url.scheme,
+        url.port if url.port is not None else -1,
+        headers,
+        requestBytes,
+        entry.bodyOffset,
+    )
+
+
+# Request/response pair read from a capture file, held as plain bytes
+class MemoryMessage(object):
+    __slots__ = ("_request", "_response")
+
+    def __init__(self, request, response):
+        self._request = request
+        self._response = response
+
+    def getRequest(self):
+        return self._request
+
+    def getResponse(self):
+        return self._response
+
+
+# Parse raw request/response bytes into an entry, the headless counterpart
+# of the extension's IExtensionHelpers based parsing
+def parseEntry(entryId, url, request, response, message):
+    bodyOffset = request.find(b"\r\n\r\n")
+    if bodyOffset != -1:
+        bodyOffset += 4
+    else:
+        bodyOffset = request.find(b"\n\n")
+        bodyOffset = bodyOffset + 2 if bodyOffset != -1 else len(request)
+
+    method = request.split(b" ", 1)[0].decode("latin-1")
+    parts = urlsplit(url)
+    fingerprint = requestFingerprint(
+        method,
+        parts.scheme,
+        parts.hostname or "",
+        parts.port,
+        parts.path,
+        parts.query,
+        request[bodyOffset:],
+    )
+
+    status = None
+    length = None
+    if response:
+        length = len(response)
+        statusLine = response.split(b"\n", 1)[0].split()
+        if len(statusLine) > 1 and statusLine[1].isdigit():
+            status = int(statusLine[1])
+
+    return RequestEntry(
+        entryId,
+        message,
+        method,
+        url,
+        parts.hostname or "",
+        parts.path,
+        status,
+        length,
+        bodyOffset,
+        fingerprint,
+    )
+
+
+# Headers that describe an encoding HAR content has already been decoded from
+HAR_DROPPED_HEADERS = frozenset(["content-encoding", "transfer-encoding"])
+
+
+def _harText(content):
+    text = content.get("text") or u""
+    if content.get("encoding") == "base64":
+        return base64.b64decode(text)
+    return text.encode("utf-8")
+
+
+def _harHeaderBlock(startLine, headers):
+    lines = [startLine]
+    for header in headers:
+        name = header.get("name", u"")
+        # HTTP/2 pseudo headers have no HTTP/1 equivalent
+        if name and not name.startswith(":"):
+            lines.append(u"{}: {}".format(name, header.get("value", u"")))
+    return (u"\r\n".join(lines) + u"\r\n\r\n").encode("utf-8")
+
+
+def _harVersion(version):
+    if version and version.upper().startswith("HTTP/1"):
+        return version.upper()
+    return u"HTTP/1.1"
+
+
+# Rebuild raw HTTP/1 messages from one HAR entry as (url, request, response)
+def harEntryToItem(harEntry):
+    request = harEntry["request"]
+    url = request["url"]
+    parts = urlsplit(url)
+
+    target = parts.path or u"/"
+    if parts.query:
+        target += u"?" + parts.query
+    headers = request.get("headers", [])
+    if not any(header.get("name", u"").lower() == "host" for header in headers):
+        headers = [{"name": u"Host", "value": parts.netloc}] + headers
+    requestBytes = _harHeaderBlock(
+        u"{} {} {}".format(
+            request.get("method", u"GET"),
+            target,
+            _harVersion(request.get("httpVersion")),
+        ),
+        headers,
+    ) + _harText(request.get("postData") or {})
+
+    responseBytes = None
+    response = harEntry.get("response") or {}
+    if response.get("status"):
+        responseBytes = _harHeaderBlock(
+            u"{} {} {}".format(
+                _harVersion(response.get("httpVersion")),
+                response["status"],
+                response.get("statusText", u""),
+            ).rstrip(),
+            [
+                header
+                for header in response.get("headers", [])
+                if header.get("name", u"").lower() not in HAR_DROPPED_HEADERS
+            ],
+        ) + _harText(response.get("content") or {})
+
+    return url, requestBytes, responseBytes
+
+
+# Incremental reader for the log.entries array of a HAR file. Only the
+# entry being decoded is held in memory, so the file size does not matter.
+class HarReader(object):
+    ENTRIES_PATTERN = re.compile(r'"entries"\s*:\s*\[')
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._textDecoder = codecs.getincrementaldecoder("utf-8")()
+        self._jsonDecoder = json.JSONDecoder()
+        self._buffer = u""
+        self._position = 0
+
+    # Append at least one more chunk to the buffer. Reads grow with the
+    # pending text, so an entry spanning many chunks is decoded a few times
+    # rather than once per chunk.
+    def _read(self):
+        pending = len(self._buffer) - self._position
+        data = self._stream.read(max(self.CHUNK_SIZE, pending))
+        self._buffer = self._buffer[self._position :] + self._textDecoder.decode(
+            data, not data
+        )
+        self._position = 0
+        return bool(data)
+
+    def __iter__(self):
+        # Skip everything before the entries array
+        while True:
+            match = self.ENTRIES_PATTERN.search(self._buffer, self._position)
+            if match is not None:
+                self._position = match.end()
+                break
+            self._position = max(self._position, len(self._buffer) - 32)
+            if not self._read():
+                return
+
+        while True:
+            while (
+                self._position < len(self._buffer)
+                and self._buffer[self._position] in u" \t\r\n,"
+            ):
+                self._position += 1
+            if self._position == len(self._buffer):
+                if not self._read():
+                    raise ValueError("HAR file ends inside the entries array")
+                continue
+            if self._buffer[self._position] == u"]":
+                return
+
+            try:
+                harEntry, end = self._jsonDecoder.raw_decode(
+                    self._buffer, self._position
+                )
+            except ValueError:
+                # The entry continues in the next chunk
+                if not self._read():
+                    raise
+                continue
+            self._position = end
+            yield harEntryToItem(harEntry)
+
+
+def _burpXmlBytes(element):
+    if element is None or not element.text:
+        return None
+    if element.get("base64") == "true":
+        return base64.b64decode(element.text)
+    try:
+        return element.text.encode("latin-1")
+    except UnicodeError:
+        return element.text.encode("utf-8")
+
+
+# Yield (url, request, response) for every item of a Burp "Save items" XML
+# file. Each item is dropped from the tree once read to keep memory flat.
+def iterBurpXmlItems(stream):
+    root = None
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = element
+        elif event == "end" and element.tag == "item":
+            request = _burpXmlBytes(element.find("request"))
+            if request:
+                yield (
+                    element.findtext("url"),
+                    request,
+                    _burpXmlBytes(element.find("response")),
+                )
+            root.clear()
+
+
+# Yield (url, request, response) for every message of a HAR or Burp XML
+# file, detected from its first non-blank character
+def iterCaptureItems(stream):
+    head = b""
+    while not head.strip():
+        chunk = stream.read(64)
+        if not chunk:
+            return iter(())
+        head += chunk
+    stream = PrefixedStream(head, stream)
+
+    if head.lstrip()[:1] == b"<":
+        return iterBurpXmlItems(stream)
+    return iter(HarReader(stream))
+
+
+# File-like object that replays bytes already read from a stream
+class PrefixedStream(object):
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        if self._prefix:
+            if size is None or size < 0:
+                data, self._prefix = self._prefix + self._stream.read(), b""
+                return data
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            if len(data) < size:
+                data += self._stream.read(size - len(data))
+            return data
+        return self._stream.read(size)
+
+
+# Output formats of the command line and the filename function they use
+EXPORT_FORMATS = {
+    "list": None,
+    "http": filenameFromUrl,
+    "yaml": yamlFilenameFromUrl,
+    "zip": filenameFromUrl,
+    "jsonl": filenameFromUrl,
+}
+
+
+# Per-process state of a headless run, set by initBatchProcess
+_batchState = {}
+
+
+def initBatchProcess(filterSettings, outputFormat):
+    _batchState["filter"] = CompiledFilter(*filterSettings)
+    _batchState["format"] = outputFormat
+
+
+# Parse, filter and serialize one batch of (url, request, response) items.
+# Runs in a worker process and returns plain tuples for the matches:
+# (entry ID, method, status, length, url, export key, filename, data).
+def processBatch(batch):
+    firstId, items = batch
+    requestFilter = _batchState["filter"]
+    outputFormat = _batchState["format"]
+    filenameFunc = EXPORT_FORMATS[outputFormat]
+
+    results = []
+    for offset, (url, request, response) in enumerate(items):
+        try:
+            entry = parseEntry(
+                firstId + offset,
+                url,
+                request,
+                response,
+                MemoryMessage(request, response),
+            )
+            if not requestFilter.matches(entry):
+                continue
+
+            data = None
+            if outputFormat == "yaml":
+                buffer = io.BytesIO()
+                writeRequestYaml(entry, buffer.write)
+                data = buffer.getvalue()
+            elif outputFormat != "list":
+                data = request
+            results.append(
+                (
+                    entry.id,
+                    entry.method,
+                    entry.status,
+                    entry.length,
+                    entry.url,
+                    exportKey(entry.method, entry.url, request),
+                    filenameFunc(entry.url) if filenameFunc else None,
+                    data,
+                )
+            )
+        except Exception as e:
+            sys.stderr.write("Error processing {}: {}\n".format(url, e))
+    return results
+
+
+def _batches(items, batchSize):
+    batch = []
+    firstId = 0
+    for item in items:
+        batch.append(item)
+        if len(batch) == batchSize:
+            yield firstId, batch
+            firstId += len(batch)
+            batch = []
+    if batch:
+        yield firstId, batch
+
+
+# Writes the matches of a headless run in one of the EXPORT_FORMATS. An
+# incremental directory export only writes files whose content changed
+# since the last export into the same directory.
+class ExportSink(object):
+    def __init__(self, outputFormat, output, incremental=False, removeStale=False):
+        self._format = outputFormat
+        self._output = output
+        self._writer = None
+        self._allocator = None
+        self._manifest = None
+        self._removeStale = removeStale
+        self.count = 0
+        self.written = 0
+        self.removed = 0
+
+        if outputFormat in ("http", "yaml"):
+            if not os.path.isdir(output):
+                os.makedirs(output)
+            if incremental:
+                self._manifest = ExportManifest(
+                    output, outputFormat, os.listdir(output)
+                )
+            else:
+                self._allocator = FilenameAllocator(os.listdir(output))
+        elif outputFormat == "zip":
+            self._writer = ZipArchiveWriter(output)
+            self._allocator = FilenameAllocator()
+        elif outputFormat == "jsonl":
+            self._writer = JsonLinesArchiveWriter(output)
+            self._allocator = FilenameAllocator()
+
+    def add(self, result):
+        entryId, method, status, length, url, key, baseName, data = result
+        self.count += 1
+
+        if self._format == "list":
+            line = u"{}\t{}\t{}\t{}\n".format(
+                entryId, method, "" if status is None else status, url
+            )
+            self._output.write(line)
+            return
+
+        if self._manifest is not None:
+            filename = self._manifest.add(key, baseName)
+            if filename is None:
+                return
+            digest = contentHash(data)
+            if self._manifest.isCurrent(key, filename, digest):
+                return
+            self._manifest.update(key, filename, digest)
+        else:
+            filename = self._allocator.allocate(baseName)
+
+        self.written += 1
+        if self._writer is not None:
+            self._writer.add(
+                filename,
+                data,
+                {
+                    "id": entryId,
+                    "method": method,
+                    "url": url,
+                    "status": status,
+                    "length": length,
+                },
+            )
+        else:
+            outputFile = open(os.path.join(self._output, filename), "wb")
+            try:
+                outputFile.write(data)
+            finally:
+                outputFile.close()
+
+    # Remove the files of entries the last export had and this one hasn't.
+    # Only called once every match was added.
+    def finish(self):
+        if self._manifest is not None and self._removeStale:
+            for filename in self._manifest.removeStale():
+                path = os.path.join(self._output, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+                    self.removed += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._manifest is not None:
+            self._manifest.save()
+
+
+# Filter the items of capture files and export the matches. Batches are
+# processed on a pool of worker processes with at most two batches per
+# worker in flight, so memory stays flat for captures of any size.
+# Returns the ExportSink with the counts of the run.
+def runHeadless(
+    paths,
+    filterSettings,
+    outputFormat,
+    output,
+    workers=None,
+    batchSize=500,
+    incremental=False,
+    removeStale=False,
+):
+    def items():
+        for path in paths:
+            captureFile = open(path, "rb")
+            try:
+                for item in iterCaptureItems(captureFile):
+                    yield item
+            finally:
+                captureFile.close()
+
+    sink = ExportSink(outputFormat, output, incremental, removeStale)
+    try:
+        if workers == 1:
+            initBatchProcess(filterSettings, outputFormat)
+            for batch in _batches(items(), batchSize):
+                for result in processBatch(batch):
+                    sink.add(result)
+            sink.finish()
+            return sink
+
+        import multiprocessing
+
+        pool = multiprocessing.Pool(
+            workers, initBatchProcess, (filterSettings, outputFormat)
+        )
+        try:
+            maxPending = 2 * (workers or multiprocessing.cpu_count())
+            pending = collections.deque()
+            for batch in _batches(items(), batchSize):
+                pending.append(pool.apply_async(processBatch, (batch,)))
+                if len(pending) >= maxPending:
+                    for result in pending.popleft().get():
+                        sink.add(result)
+            while pending:
+                for result in pending.popleft().get():
+                    sink.add(result)
+        finally:
+            pool.terminate()
+        sink.finish()
+        return sink
+    finally:
+        sink.close()
+
+
+def _splitList(text):
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+# Command line arguments are byte strings under Python 2, while message text
+# is unicode; decode them with the encoding the shell passed them in
+def _argText(value):
+    if not isinstance(value, bytes):
+        return value
+    try:
+        return value.decode(sys.getfilesystemencoding() or "utf-8")
+    except (UnicodeDecodeError, LookupError):
+        return value.decode("utf-8", "replace")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Filter HAR or Burp XML captures with the Request Filter"
+        " engine and export the matching requests."
+    )
+    parser.add_argument("inputs", nargs="+", help="HAR or Burp 'Save items' XML files")
+    parser.add_argument(
+        "--methods",
+        default=",".join(HTTP_METHODS),
+        help="comma-separated methods to keep (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--file-types",
+        default=",".join(STATIC_FILE_TYPES),
+        help="comma-separated extensions, excluded unless --include-file-types"
+        " is given; empty for none (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--include-file-types",
+        action="store_true",
+        help="keep only the --file-types instead of excluding them",
+    )
+    parser.add_argument(
+        "--uri",
+        action="append",
+        default=[],
+        help="URL substring, may be repeated; ANY pattern matches",
+    )
+    parser.add_argument("--query", default="", help="structured query, as in the UI")
+    parser.add_argument(
+        "--format",
+        choices=sorted(EXPORT_FORMATS),
+        default="list",
+        help="list matches on stdout, or export them (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o", "--output", help="output directory (http, yaml) or archive file"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes (default: one per core, 1 to run in-process)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="with http or yaml, only write files that are new or changed since"
+        " the last --incremental export into the same directory",
+    )
+    parser.add_argument(
+        "--remove-stale",
+        action="store_true",
+        help="with --incremental, delete files of requests that are no longer"
+        " exported",
+    )
+    args = parser.parse_args(argv)
+
+    if args.format != "list" and not args.output:
+        parser.error("--output is required for --format {}".format(args.format))
+    if args.incremental and args.format not in ("http", "yaml"):
+        parser.error("--incremental needs --format http or yaml")
+    if args.remove_stale and not args.incremental:
+        parser.error("--remove-stale needs --incremental")
+
+    filterSettings = (
+        _splitList(args.methods.upper()),
+        _splitList(args.file_types),
+        args.include_file_types,
+        [_argText(pattern) for pattern in args.uri],
+        _argText(args.query),
+    )
+    try:
+        # Report query errors before any worker starts
+        CompiledFilter(*filterSettings)
+    except QueryError as e:
+        parser.error("invalid query: {}".format(e))
+
+    output = sys.stdout if args.format == "list" else args.output
+    sink = runHeadless(
+        args.inputs,
+        filterSettings,
+        args.format,
+        output,
+        args.workers,
+        incremental=args.incremental,
+        removeStale=args.remove_stale,
+    )
+    if args.incremental:
+        sys.stderr.write(
+            "{} matching requests, {} files written, {} removed\n".format(
+                sink.count, sink.written, sink.removed
+            )
+        )
+    else:
+        sys.stderr.write("{} matching requests\n".format(sink.count))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,681 @@
+# Tests for the Burp-independent engine in requestengine.py. Results are
+# checked against brute force over synthetic entries.
+# Runs under Python 2 and 3: python -m unittest discover tests
+
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from requestengine import (  # noqa: E402
+    BodyIndex,
+    CategoryBitmapIndex,
+    CompiledFilter,
+    EndpointGroupIndex,
+    EntrySorter,
+    ExportManifest,
+    LazyMessage,
+    MemoryMessage,
+    Metrics,
+    QueryError,
+    QueryParser,
+    QueryPlan,
+    UrlTokenIndex,
+    compileQuery,
+    contentHash,
+    exportKey,
+    messageText,
+    parseEntry,
+    queryCandidates,
+    writeRequestYaml,
+)
+
+METHODS = ["GET", "POST", "PUT", "DELETE"]
+HOSTS = ["api.example.com", "www.example.com", "cdn.example.net"]
+PATHS = [
+    "/api/v1/users/{n}",
+    "/api/v1/orders/{n}/items",
+    "/static/app.js",
+    "/img/logo.png",
+    "/login",
+    "/search",
+]
+BODIES = [b"", b'{"token": "secret"}', b"name=caf\xc3\xa9"]
+RESPONSE_BODIES = [b"ok", b"error: boom"]
+STATUSES = [200, 201, 302, 404, 500, None]
+
+
+# Deterministic entries over a small set of methods, hosts and paths
+def makeEntries(count, seed=1):
+    rng = random.Random(seed)
+    entries = []
+    for entryId in range(count):
+        method = rng.choice(METHODS)
+        host = rng.choice(HOSTS)
+        path = rng.choice(PATHS).replace("{n}", str(rng.randint(1, 50)))
+        query = rng.choice(["", "?q=abc", "?page=%d" % rng.randint(1, 3)])
+        headers = "Host: %s\r\n" % host
+        if rng.random() < 0.3:
+            headers += "Authorization: Bearer x\r\n"
+        body = b"" if method == "GET" else rng.choice(BODIES)
+        request = (
+            "%s %s%s HTTP/1.1\r\n%s\r\n" % (method, path, query, headers)
+        ).encode("latin-1") + body
+
+        status = rng.choice(STATUSES)
+        response = None
+        if status is not None:
+            response = ("HTTP/1.1 %d X\r\n\r\n" % status).encode(
+                "latin-1"
+            ) + rng.choice(RESPONSE_BODIES)
+
+        url = "https://%s%s%s" % (host, path, query)
+        entry = parseEntry(
+            entryId, url, request, response, MemoryMessage(request, response)
+        )
+        entry.hits = rng.choice([1, 1, 1, 2, 5])
+        entries.append(entry)
+    return entries
+
+
+def requestBody(entry):
+    return messageText(entry.message.getRequest()[entry.bodyOffset :])
+
+
+def responseText(entry):
+    return messageText(entry.message.getResponse() or b"")
+
+
+def hasHeader(entry, name):
+    headerBlock = entry.message.getRequest()[: entry.bodyOffset].decode("latin-1")
+    return any(
+        line.lower().startswith(name.lower() + ":")
+        for line in headerBlock.split("\r\n")[1:]
+    )
+
+
+def statusClass(entry):
+    return None if entry.status is None else entry.status // 100
+
+
+# Queries with an equivalent plain Python predicate
+QUERIES = [
+    ("method:POST", lambda e: e.method == "POST"),
+    ("host:API.*", lambda e: e.host.startswith("api.")),
+    ("host=www.example.com", lambda e: e.host == "www.example.com"),
+    ("status:5xx", lambda e: statusClass(e) == 5),
+    (
+        "status>=300 AND status<500",
+        lambda e: e.status is not None and 300 <= e.status < 500,
+    ),
+    (
+        "NOT path:/static/ AND len>20",
+        lambda e: "/static/" not in e.path and e.length is not None and e.length > 20,
+    ),
+    (
+        "method:GET OR method:DELETE OR ext:js",
+        lambda e: e.method in ("GET", "DELETE") or e.extension == "js",
+    ),
+    ('body:"secret"', lambda e: "secret" in requestBody(e)),
+    (u'body:"caf\xe9"', lambda e: u"caf\xe9" in requestBody(e)),
+    (
+        "resp:boom AND NOT method:GET",
+        lambda e: "boom" in responseText(e) and e.method != "GET",
+    ),
+    ("header:Authorization", lambda e: hasHeader(e, "Authorization")),
+    (
+        r"path~^/api/v1/users/\d+$",
+        lambda e: re.match(r"^/api/v1/users/\d+$", e.path) is not None,
+    ),
+    (
+        "(method:PUT OR host=www.example.com) AND NOT status:2xx",
+        lambda e: (e.method == "PUT" or e.host == "www.example.com")
+        and statusClass(e) != 2,
+    ),
+    ('endpoint:"users/{id}"', lambda e: "users/{id}" in e.endpoint),
+    ("hits>1 AND url:page=", lambda e: e.hits > 1 and "page=" in e.url),
+    ("status!=200", lambda e: e.status is not None and e.status != 200),
+]
+
+
+def bruteForce(entries, predicate):
+    return [entry.id for entry in entries if predicate(entry)]
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = makeEntries(600)
+
+    def test_plans_match_brute_force(self):
+        for query, predicate in QUERIES:
+            plan = QueryPlan(query)
+            self.assertEqual(
+                [entry.id for entry in self.entries if plan.matches(entry)],
+                bruteForce(self.entries, predicate),
+                query,
+            )
+
+    def test_optimizer_keeps_results(self):
+        for query, predicate in QUERIES:
+            plan = QueryPlan(query)
+            unoptimized = compileQuery(QueryParser(plan.text).parse())
+            for entry in self.entries:
+                self.assertEqual(
+                    plan.matches(entry),
+                    bool(unoptimized(entry, LazyMessage(entry))),
+                    query,
+                )
+
+    def test_referenced_fields(self):
+        self.assertEqual(
+            QueryPlan("hits>1 OR NOT (method:GET OR method:PUT)").fields,
+            frozenset(["hits", "method"]),
+        )
+        self.assertEqual(QueryPlan("").fields, frozenset())
+
+    def test_invalid_queries(self):
+        for query in [
+            "status>abc",
+            "path~(",
+            "(method:GET",
+            "method:GET AND",
+            "body>1",
+        ]:
+            self.assertRaises(QueryError, QueryPlan, query)
+
+
+# Filter settings as (methods, file types, include file types, URI patterns,
+# query) with an equivalent predicate
+FILTERS = [
+    (
+        (["GET", "POST"], ["js", "png"], False, [], ""),
+        lambda e: e.method in ("GET", "POST") and e.extension not in ("js", "png"),
+    ),
+    (
+        (METHODS, ["js"], True, [], ""),
+        lambda e: e.extension == "js",
+    ),
+    (
+        (METHODS, [], False, ["/api/v1/", "login"], ""),
+        lambda e: "/api/v1/" in e.url or "login" in e.url,
+    ),
+    (
+        (["PUT", "DELETE"], ["png"], False, ["/orders/", "app"], ""),
+        lambda e: e.method in ("PUT", "DELETE")
+        and e.extension != "png"
+        and ("/orders/" in e.url or "app" in e.url),
+    ),
+    (
+        (["PUT", "DELETE"], [], False, ["/orders/"], "status:4xx OR status:5xx"),
+        lambda e: e.method in ("PUT", "DELETE")
+        and "/orders/" in e.url
+        and statusClass(e) in (4, 5),
+    ),
+    (
+        (METHODS, ["png"], False, ["app"], "host=cdn.example.net AND NOT method:GET"),
+        lambda e: e.extension != "png"
+        and "app" in e.url
+        and e.host == "cdn.example.net"
+        and e.method != "GET",
+    ),
+    (([], [], False, [], ""), lambda e: False),
+]
+
+
+class CompiledFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = makeEntries(600, seed=2)
+
+    def test_filters_match_brute_force(self):
+        for settings, predicate in FILTERS:
+            requestFilter = CompiledFilter(*settings)
+            self.assertEqual(
+                [entry.id for entry in self.entries if requestFilter.matches(entry)],
+                bruteForce(self.entries, predicate),
+                settings,
+            )
+
+    def test_equal_settings_are_equal_filters(self):
+        first = CompiledFilter(["GET"], ["js"], False, ["a", "b"], "")
+        second = CompiledFilter(["GET"], ["JS"], False, ["b", "a"], "")
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(first, CompiledFilter(["GET"], ["js"], True, ["a"], ""))
+
+    def test_equal_queries_are_equal_filters(self):
+        first = CompiledFilter(["GET"], [], False, [], "method:GET  OR ext:js")
+        second = CompiledFilter(["GET"], [], False, [], "ext:js OR method:GET")
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(first, CompiledFilter(["GET"], [], False, [], "ext:js"))
+
+    def test_hits_filters_are_flagged(self):
+        self.assertTrue(CompiledFilter(METHODS, [], False, [], "hits>1").usesHits)
+        self.assertFalse(CompiledFilter(METHODS, [], False, [], "len>1").usesHits)
+
+
+def yamlBytes(url, request):
+    entry = parseEntry(1, url, request, None, MemoryMessage(request, None))
+    output = io.BytesIO()
+    writeRequestYaml(entry, output.write)
+    return output.getvalue()
+
+
+class YamlTest(unittest.TestCase):
+    TEXT_REQUEST = (
+        b"POST /api/v1/users?id=7&x=%20 HTTP/1.1\r\n"
+        b"Host: api.example.com\r\n"
+        b"Content-Type: application/json\r\n"
+        b'X-Quote: a "b": c\r\n'
+        b"\r\n"
+        b'{"name": "caf\xc3\xa9",\n "n": 1}'
+    )
+
+    def test_text_body(self):
+        self.assertEqual(
+            yamlBytes(
+                "https://api.example.com/api/v1/users?id=7&x=%20", self.TEXT_REQUEST
+            ),
+            b"method: POST\n"
+            b"host: api.example.com\n"
+            b'path: "/api/v1/users?id=7&x=%20"\n'
+            b"protocol: https\n"
+            b"headers:\n"
+            b'  Host: "api.example.com"\n'
+            b'  Content-Type: "application/json"\n'
+            b'  X-Quote: "a \\"b\\": c"\n'
+            b"body: |2-\n"
+            b'  {"name": "caf\xc3\xa9",\n'
+            b'   "n": 1}\n',
+        )
+
+    def test_binary_body_and_port(self):
+        self.assertEqual(
+            yamlBytes(
+                "http://h:8080/bin", b"PUT /bin HTTP/1.1\r\nHost: h\r\n\r\n\x00\x01\xff"
+            ),
+            b"method: PUT\n"
+            b"host: h\n"
+            b'path: "/bin"\n'
+            b"protocol: http\n"
+            b"port: 8080\n"
+            b"headers:\n"
+            b'  Host: "h"\n'
+            b"body: !!binary |\n"
+            b"  AAH/\n",
+        )
+
+    def test_no_body(self):
+        self.assertEqual(
+            yamlBytes("http://h/", b"GET / HTTP/1.1\r\nHost: h\r\n\r\n"),
+            b"method: GET\n"
+            b"host: h\n"
+            b'path: "/"\n'
+            b"protocol: http\n"
+            b"headers:\n"
+            b'  Host: "h"\n',
+        )
+
+    def test_round_trip(self):
+        try:
+            import yaml
+        except ImportError:
+            self.skipTest("PyYAML is not installed")
+
+        for entry in makeEntries(200, seed=6):
+            output = io.BytesIO()
+            writeRequestYaml(entry, output.write)
+            document = yaml.safe_load(output.getvalue().decode("utf-8"))
+            request = entry.message.getRequest()
+            self.assertEqual(document["method"], entry.method)
+            self.assertEqual(document["host"], entry.host)
+            self.assertEqual(document["path"], entry.url.split(entry.host, 1)[1])
+            body = request[entry.bodyOffset :]
+            if body:
+                self.assertEqual(document["body"].encode("utf-8"), body)
+            else:
+                self.assertNotIn("body", document)
+
+
+class UrlTokenIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = makeEntries(1500, seed=3)
+
+    def test_url_index_candidates(self):
+        index = UrlTokenIndex()
+        for entry in self.entries:
+            index.add(entry)
+        for entry in self.entries[:300]:
+            index.remove(entry)
+        live = self.entries[300:]
+
+        for patterns in [
+            ["/api/v1/"],
+            ["/login?"],
+            ["/users/", "/static/"],
+            ["?page=2"],
+        ]:
+            candidateIds = index.candidateIds(patterns)
+            self.assertIsNotNone(candidateIds, patterns)
+            expected = [
+                entry.id
+                for entry in live
+                if any(pattern in entry.url for pattern in patterns)
+            ]
+            self.assertEqual(
+                [
+                    entry.id
+                    for entry in live
+                    if entry.id in candidateIds
+                    and any(pattern in entry.url for pattern in patterns)
+                ],
+                expected,
+                patterns,
+            )
+        self.assertIsNone(index.candidateIds(["api"]))
+
+
+class CategoryBitmapIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = makeEntries(1500, seed=3)
+
+    def test_bitmap_selection(self):
+        index = CategoryBitmapIndex()
+        for start in range(0, len(self.entries), 100):
+            index.add(self.entries[start : start + 100], start)
+        evicted = 500
+        index.evict(evicted)
+        live = self.entries[evicted:]
+
+        filters = [CompiledFilter(*settings) for settings, predicate in FILTERS]
+        filters += [
+            CompiledFilter(METHODS, [], False, [], query) for query, _ in QUERIES
+        ]
+        for requestFilter in filters:
+            selected = [
+                self.entries[position]
+                for position in index.positions(index.select(requestFilter))
+            ]
+            self.assertEqual(
+                [entry.id for entry in selected if requestFilter.matches(entry)],
+                [entry.id for entry in live if requestFilter.matches(entry)],
+                requestFilter.query.text,
+            )
+
+
+class EntrySorterTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = makeEntries(400, seed=4)
+
+    def expectedOrder(self, entries, sortKeys):
+        order = list(entries)
+        for column, ascending in reversed(sortKeys):
+            getter = EntrySorter.COLUMN_KEYS[column]
+            order.sort(key=getter, reverse=not ascending)
+        return [entry.id for entry in order]
+
+    def test_incremental_sort_matches_full_sort(self):
+        sortKeys = ((3, False), (2, True))
+        sorter = EntrySorter()
+        sorter.setSortKeys(sortKeys, self.entries[:100])
+        model = list(self.entries[:100])
+        for start in range(100, len(self.entries), 75):
+            batch = self.entries[start : start + 75]
+            rows = sorter.add(batch)
+            model.extend(batch)
+            self.assertEqual(rows, sorted(rows))
+            self.assertEqual(
+                sorted(sorter.view[row].id for row in rows),
+                sorted(entry.id for entry in batch),
+            )
+        self.assertEqual(
+            [entry.id for entry in sorter.view], self.expectedOrder(model, sortKeys)
+        )
+
+    def test_memoized_orders_and_eviction(self):
+        sorter = EntrySorter()
+        first = ((1, True),)
+        second = ((4, False), (0, True))
+        sorter.setSortKeys(first, self.entries)
+        sorter.setSortKeys(second, self.entries)
+        sorter.setSortKeys(first, self.entries)
+
+        for entry in self.entries[:50]:
+            entry.message = None
+        removedRows = sorter.removeEvicted()
+        self.assertEqual(len(removedRows), 50)
+        live = self.entries[50:]
+        self.assertEqual(
+            [entry.id for entry in sorter.view], self.expectedOrder(live, first)
+        )
+        sorter.setSortKeys(second, live)
+        self.assertEqual(
+            [entry.id for entry in sorter.view], self.expectedOrder(live, second)
+        )
+        sorter.setSortKeys((), live)
+        self.assertIsNone(sorter.view)
+
+
+class EndpointGroupIndexTest(unittest.TestCase):
+    def test_groups_match_brute_force(self):
+        entries = makeEntries(800, seed=5)
+        index = EndpointGroupIndex()
+        for start in range(0, len(entries), 120):
+            index.add(entries[start : start + 120])
+        index.remove(entries[:200])
+        live = entries[200:]
+
+        expected = {}
+        for entry in live:
+            expected.setdefault(entry.endpoint, []).append(entry)
+        self.assertEqual(len(index), len(expected))
+        for group in index.groups:
+            members = expected[group.key]
+            self.assertEqual(len(group), len(members))
+            self.assertEqual(sum(group.statusCounts.values()), len(members))
+            successes = [entry for entry in members if statusClass(entry) == 2]
+            self.assertIs(group.sample, (successes or members)[0])
+
+
+class ExportManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="requestengine-test-")
+        self.entries = makeEntries(300, seed=7)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # Export entries the way ExportSink does. Returns the names written.
+    def export(self, entries, removeStale=False):
+        manifest = ExportManifest(self.directory, "http", os.listdir(self.directory))
+        written = []
+        for entry in entries:
+            request = entry.message.getRequest()
+            filename = manifest.add(
+                exportKey(entry.method, entry.url, request), "request.http"
+            )
+            if filename is None:
+                continue
+            key = exportKey(entry.method, entry.url, request)
+            digest = contentHash(request)
+            if not manifest.isCurrent(key, filename, digest):
+                with open(os.path.join(self.directory, filename), "wb") as output:
+                    output.write(request)
+                written.append(filename)
+                manifest.update(key, filename, digest)
+        if removeStale:
+            for filename in manifest.removeStale():
+                os.remove(os.path.join(self.directory, filename))
+        manifest.save()
+        return written
+
+    def contents(self):
+        result = {}
+        for name in os.listdir(self.directory):
+            if name != ExportManifest.FILENAME:
+                with open(os.path.join(self.directory, name), "rb") as exported:
+                    result[name] = exported.read()
+        return result
+
+    def test_repeated_export_writes_nothing(self):
+        unique = len(
+            set(
+                exportKey(entry.method, entry.url, entry.message.getRequest())
+                for entry in self.entries
+            )
+        )
+        self.assertEqual(len(self.export(self.entries)), unique)
+        before = self.contents()
+        self.assertEqual(len(before), unique)
+
+        # Order does not matter
+        shuffled = list(self.entries)
+        random.Random(1).shuffle(shuffled)
+        self.assertEqual(self.export(shuffled), [])
+        self.assertEqual(self.contents(), before)
+
+    def test_subset_keeps_names_and_removes_stale(self):
+        self.export(self.entries)
+        before = self.contents()
+        subset = [entry for entry in self.entries if entry.method == "POST"]
+        self.assertEqual(self.export(subset, removeStale=True), [])
+
+        after = self.contents()
+        self.assertTrue(0 < len(after) < len(before))
+        for name, data in after.items():
+            self.assertEqual(before[name], data)
+        self.assertTrue(all(data.startswith(b"POST ") for data in after.values()))
+
+    def test_missing_file_is_rewritten(self):
+        self.export(self.entries)
+        name = sorted(self.contents())[0]
+        os.remove(os.path.join(self.directory, name))
+        self.assertEqual(self.export(self.entries), [name])
+
+    def test_unreadable_manifest_is_ignored(self):
+        with open(os.path.join(self.directory, ExportManifest.FILENAME), "w") as output:
+            output.write("not json")
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        try:
+            written = self.export(self.entries[:10])
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(len(written), len(self.contents()))
+        with open(os.path.join(self.directory, ExportManifest.FILENAME)) as saved:
+            self.assertEqual(json.load(saved)["version"], ExportManifest.VERSION)
+
+
+# Exact body index: every substring lookup is answered by scanning, so the
+# candidate sets only depend on how queryCandidates combines them
+class ScanningBodyIndex(object):
+    def __init__(self, entries):
+        self._entries = entries
+
+    def lookup(self, field, value):
+        text = requestBody if field == "body" else responseText
+        return set(entry.id for entry in self._entries if value in text(entry))
+
+
+# Body searches with an equivalent plain Python predicate
+BODY_SEARCHES = [
+    ("body", "secret"),
+    ("body", "oken"),
+    ("body", u"caf\xe9"),
+    ("resp", "boom"),
+    ("resp", "HTTP/1.1 404"),
+    ("resp", "nothing like this"),
+]
+
+
+class BodyIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.entries = makeEntries(1500, seed=3)
+
+    def buildIndex(self, entries, maxBodyBytes=64 * 1024, maxPostings=None):
+        index = BodyIndex(Metrics())
+        index.maxBodyBytes = maxBodyBytes
+        if maxPostings is not None:
+            index.maxPostings = maxPostings
+        index.queue(entries)
+        index.indexEntries(entries)
+        return index
+
+    def assertCandidates(self, index, entries):
+        exact = ScanningBodyIndex(entries)
+        for part, text in BODY_SEARCHES:
+            candidateIds = index.lookup(part, text)
+            self.assertIsNotNone(candidateIds, text)
+            self.assertTrue(exact.lookup(part, text) <= candidateIds, text)
+
+    def test_lookup_finds_every_match(self):
+        index = self.buildIndex(self.entries)
+        index.remove(self.entries[:1200])
+        self.assertCandidates(index, self.entries[1200:])
+        self.assertTrue(index.lookup("body", "secret") < set(range(1500)))
+        self.assertIsNone(index.lookup("body", "ab"))
+
+        # Compaction drops the postings of removed entries
+        index.indexEntries([])
+        self.assertEqual(
+            index.postingCount(), self.buildIndex(self.entries[1200:]).postingCount()
+        )
+
+    def test_disabled_until_configured(self):
+        index = BodyIndex(Metrics())
+        index.queue(self.entries)
+        index.indexEntries(self.entries)
+        self.assertEqual(index.postingCount(), 0)
+        self.assertIsNone(index.lookup("body", "secret"))
+
+    def test_pending_and_unindexed_entries_are_candidates(self):
+        index = BodyIndex(Metrics())
+        index.maxBodyBytes = 64 * 1024
+        index.queue(self.entries)
+        self.assertCandidates(index, self.entries)
+
+        index = self.buildIndex(self.entries, maxBodyBytes=12)
+        self.assertCandidates(index, self.entries)
+
+    def test_posting_limit(self):
+        full = self.buildIndex(self.entries).postingCount()
+        index = self.buildIndex(self.entries, maxPostings=full // 3)
+        self.assertTrue(0 < index.postingCount() <= full // 3)
+        self.assertCandidates(index, self.entries)
+
+    def test_query_candidates(self):
+        bodyIndex = ScanningBodyIndex(self.entries)
+        bodyIndex = ScanningBodyIndex(self.entries)
+        for query in [
+            'body:"secret"',
+            'body:"secret" AND status:2xx',
+            "body:token OR resp:boom",
+            'NOT body:"secret"',
+            "resp:boom AND (body:caf OR method:GET)",
+        ]:
+            plan = QueryPlan(query)
+            candidateIds = plan.candidateIds(bodyIndex)
+            expected = [entry.id for entry in self.entries if plan.matches(entry)]
+            if candidateIds is None:
+                continue
+            self.assertEqual(
+                [
+                    entry.id
+                    for entry in self.entries
+                    if entry.id in candidateIds and plan.matches(entry)
+                ],
+                expected,
+                query,
+            )
+        self.assertIsNone(queryCandidates(QueryPlan("method:GET").ast, bodyIndex))
+
+
+if __name__ == "__main__":
+    unittest.main()